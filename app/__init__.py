@@ -10,7 +10,14 @@ __author__ = "BugSigDB Team"
 __description__ = "A comprehensive tool for analyzing and curating microbiome signature data"
 
 # Import main components for easy access
-from .api.app import app
 from .utils.config import *
 
-__all__ = ["app"] + [name for name in dir() if not name.startswith('_')] 
\ No newline at end of file
+__all__ = ["app"] + [name for name in dir() if not name.startswith('_')]
+
+def __getattr__(name):
+    # Import the FastAPI app lazily, so importing a submodule does not load the API
+    if name == "app":
+        from .api.app import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+ 
\ No newline at end of file
@@ -1,36 +1,47 @@
-from fastapi import FastAPI, WebSocket, HTTPException, Request, UploadFile, File, Form, Body, Query
+from fastapi import FastAPI, WebSocket, HTTPException, Request, UploadFile, File, Form, Body, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.websockets import WebSocketDisconnect
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 import json
-import torch
 from pathlib import Path
 from datetime import datetime
 import pytz
-from app.models.config import ModelConfig
+from app.core.registry import registry
 from app.models.unified_qa import UnifiedQA
 from app.services.data_retrieval import PubMedRetriever
-from app.utils.text_processing import AdvancedTextProcessor
 from app.utils.config import (
     NCBI_API_KEY, 
     GEMINI_API_KEY, 
     DEFAULT_MODEL,
-    AVAILABLE_MODELS
+    AVAILABLE_MODELS,
+    WARMUP_COMPONENTS,
+    ADMIN_TOKEN,
+    DEBUG_PROFILE_MAX_SECONDS,
+    LOOP_BLOCKING_DEBUG,
+    WS_MAX_CONCURRENT_ANALYSES,
+    WS_MAX_PENDING_MESSAGES
 )
+from app.utils.utils import config
 from app.utils.methods_scorer import MethodsScorer
+from app.utils.keyword_index import KeywordHits, keyword_index
 from app.utils.field_validator import FieldExtractionEnhancer
 from app.utils.performance_logger import perf_logger
-import re
+from app.utils.tracing import TracingMiddleware, tracer, run_in_executor
+from app.utils.profiler import profiler, collapsed_text, top_frames, dump_tasks
+from app.utils.loop_monitor import loop_monitor, install_blocking_guards
+from app.utils.conversation_memory import ConversationMemory, approximate_tokens
+import time
 import asyncio
 import logging
 import sys
 import os
+import secrets
 from bs4 import BeautifulSoup
-import csv
 from app.services.cache_manager import CacheManager
+from app.services.curated_papers import CuratedPapers, suggest_fields
 
 # Add the project root to Python path
 # sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -111,10 +122,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Root span per request; stages below open child spans (see app.utils.tracing)
+app.add_middleware(TracingMiddleware)
+
+# Heavy ML components (torch, transformers, tiktoken) are built on first use
+def _build_text_processor():
+    from app.utils.text_processing import AdvancedTextProcessor
+    return AdvancedTextProcessor()
+
+def _build_preprocessor():
+    from app.services.preprocessing import TextPreprocessor
+    return TextPreprocessor()
+
+def _build_classification_service():
+    from app.services.classification_service import ClassificationService
+    return ClassificationService.from_model_path(
+        preprocessor=registry.get("preprocessor"),
+        retriever=retriever
+    )
+
+registry.register("text_processor", _build_text_processor)
+registry.register("preprocessor", _build_preprocessor)
+registry.register("classification_service", _build_classification_service)
+
+def _build_similarity_index():
+    from app.services.similarity_index import SimilarityIndex
+    return SimilarityIndex(config.SIMILARITY_INDEX_DIR, backend=config.SIMILARITY_BACKEND)
+
+registry.register("similarity_index", _build_similarity_index)
+
 # Initialize components
-text_processor = AdvancedTextProcessor()
 model = None
 if GEMINI_API_KEY:
     print("Model Status: Using gemini as primary model")
@@ -127,8 +167,9 @@ qa_system = UnifiedQA(
     gemini_api_key=GEMINI_API_KEY
 )
 
-# Initialize cache manager and field enhancer
+# Initialize cache manager, curated paper lookup and field enhancer
 cache_manager = CacheManager()
+curated_papers = CuratedPapers(config.CURATED_CSV_PATH)
 field_enhancer = FieldExtractionEnhancer()
 
 # Mount static files after API routes
@@ -151,7 +192,7 @@ async def process_message(message):
 
     # If the user is discussing a paper, include its context
     if current_paper:
-        metadata = retriever.get_paper_metadata(current_paper)
+        metadata = await retriever.get_paper_metadata_async(current_paper)
         context = f"Title: {metadata['title']}\nAbstract: {metadata['abstract']}\n"
         prompt = f"{context}\nUser question: {content}"
     else:
@@ -166,115 +207,193 @@ async def process_message(message):
         # ... other fields as needed
     }
 
+def count_chat_tokens(text: str) -> int:
+    """Token count of chat text: tiktoken once the text processor is loaded, an estimate before."""
+    # Loading the text processor imports torch, which the chat path should not wait for
+    if registry.is_loaded("text_processor"):
+        return registry.get("text_processor").count_tokens(text)
+    return approximate_tokens(text)
+
+def build_chat_context(message: Dict, memory: ConversationMemory) -> str:
+    """Prompt for a websocket chat message, with the paper or conversation it refers to."""
+    user_message = message.get('content', '')
+    paper_ctx = message.get('paperContext')
+    if paper_ctx and paper_ctx.get('pmid'):
+        # Prepend paper metadata to prompt
+        return f"You are discussing the following paper:\nTitle: {paper_ctx.get('title','')}\nAuthors: {paper_ctx.get('authors','')}\nJournal: {paper_ctx.get('journal','')}\nYear: {paper_ctx.get('year','')}\nPMID: {paper_ctx.get('pmid','')}\nAbstract: {paper_ctx.get('abstract','')}\n\nUser question: {user_message}"
+    chat_history = message.get('chatHistory') or []
+    if not memory and isinstance(chat_history, list):
+        # The connection's memory is authoritative; the client's history only seeds a new one
+        for msg in chat_history[-memory.max_history:]:
+            if isinstance(msg, dict) and msg.get('role') in ('user', 'assistant'):
+                memory.add_message(msg['role'], str(msg.get('content', '')))
+    history = memory.get_formatted_context()
+    if history:
+        return f"{history}\nUser: {user_message}"
+    return user_message
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     **WebSocket endpoint for real-time communication.**
     
     This endpoint handles WebSocket connections for:
-    - Real-time paper analysis
+    - Real-time paper analysis (`analyze_paper`, `analyze_paper_stream`)
     - Chat functionality
     - Live updates
     
+    Each message is handled as its own task, so a slow paper does not hold up chat
+    on the same socket. At most WS_MAX_CONCURRENT_ANALYSES analyses run at once per
+    connection and at most WS_MAX_PENDING_MESSAGES messages are in progress; pending
+    work is cancelled when the client disconnects. A message may carry an `id`,
+    which is echoed in every reply to it; `{"type": "cancel", "id": ...}` cancels it.
+    
+    Chat history is kept per connection within CHAT_HISTORY_MAX_TOKENS, with older
+    turns folded into a short summary; a `chatHistory` sent by the client only seeds
+    the history of a new connection.
+    
+    Analyses use the cached pipeline of `/analyze_stream` and report progress as
+    `analysis_progress` messages with `stage` fetched, full_text, llm_started and
+    fields_ready.
+    
     **Note:** This is a WebSocket endpoint and cannot be tested in the Swagger UI.
     Use a WebSocket client to connect to `/ws`.
     """
     await websocket.accept()
-    print("WebSocket connection accepted")
-    try:
-        while True:
-            data = await websocket.receive_text()
+    logger.info("WebSocket connection accepted")
+    send_lock = asyncio.Lock()
+    analysis_slots = asyncio.Semaphore(WS_MAX_CONCURRENT_ANALYSES)
+    pending: Dict[asyncio.Task, Optional[str]] = {}
+    memory = ConversationMemory(count_tokens=count_chat_tokens)
+    
+    async def send(payload: Dict, request_id: Optional[str] = None):
+        if request_id is not None:
+            payload = {**payload, "id": request_id}
+        # Replies of concurrent tasks go out one whole message at a time
+        async with send_lock:
+            await websocket.send_json(payload)
+    
+    async def analyze(message: Dict, request_id: Optional[str], stream_fields: bool):
+        pmid = message.get('pmid')
+        if not pmid:
+            await send({"error": "No PMID provided"}, request_id)
+            return
+        
+        async with analysis_slots:
+            metadata = {}
             try:
-                message = json.loads(data)
-                if message.get('type') == 'analyze_paper':
-                    # Handle paper analysis request
-                    pmid = message.get('pmid')
-                    if not pmid:
-                        await websocket.send_json({"error": "No PMID provided"})
-                        continue
-                    
-                    try:
-                        # Get paper metadata
-                        metadata = retriever.get_paper_metadata(pmid)
-                        if not metadata:
-                            await websocket.send_json({"error": f"Paper with PMID {pmid} not found"})
-                            continue
-                        
-                        # Get full text if available
-                        full_text = ""
-                        try:
-                            full_text = retriever.get_pmc_fulltext(pmid)
-                        except Exception as e:
-                            print(f"Warning: Could not retrieve full text for PMID {pmid}: {str(e)}")
-                        
-                        # Analyze paper using Gemini
-                        if GEMINI_API_KEY:
-                            response = await qa_system.analyze_paper(
-                                {"title": metadata["title"], "abstract": metadata["abstract"], "full_text": full_text}
-                            )
-                            
-                            analysis_text = response.get("key_findings", [])
-                            analysis_result = {
+                async for event, data in enhanced_analysis_events(pmid):
+                    if event == "metadata":
+                        metadata = data["metadata"]
+                        await send({"type": "analysis_progress", "pmid": pmid, "stage": "fetched",
+                                    "title": metadata.get("title", "")}, request_id)
+                        await send({"type": "analysis_progress", "pmid": pmid, "stage": "full_text",
+                                    "found": data["has_full_text"]}, request_id)
+                    elif event == "llm_started":
+                        await send({"type": "analysis_progress", "pmid": pmid, "stage": "llm_started"}, request_id)
+                    elif event == "field" and stream_fields:
+                        await send({"type": "analysis_field", "pmid": pmid, "field": data["field"],
+                                    "data": data["data"]}, request_id)
+                    elif event == "complete":
+                        await send({"type": "analysis_progress", "pmid": pmid, "stage": "fields_ready"}, request_id)
+                        metadata = data.get("metadata") or metadata
+                        if stream_fields:
+                            await send({
+                                "type": "analysis_complete",
+                                "pmid": pmid,
+                                "title": metadata.get("title", ""),
+                                "enhanced_analysis": data["enhanced_analysis"],
+                                "curation_ready": data["curation_ready"],
+                                "cached": data["cached"]
+                            }, request_id)
+                        else:
+                            await send({
                                 "type": "analysis_result",
-                                "title": metadata["title"],
+                                "pmid": pmid,
+                                "title": metadata.get("title", ""),
                                 "authors": metadata.get("authors", "N/A"),
                                 "journal": metadata.get("journal", "N/A"),
                                 "date": metadata.get("publication_date", "N/A"),
                                 "doi": metadata.get("doi", "N/A"),
-                                "abstract": metadata["abstract"],
-                                "key_findings": analysis_text,
-                                "confidence": 0.8,
-                                "status": "success",
-                                "suggested_topics": [],
-                                "found_terms": {},
-                                "category_scores": {},
-                                "num_tokens": len(analysis_text)
-                            }
-                            print("Sending analysis result to frontend:", analysis_result)
-                            await websocket.send_json(analysis_result)
-                        else:
-                            await websocket.send_json({"error": "No AI models available for analysis"})
-                    except Exception as e:
-                        print(f"Error analyzing paper: {str(e)}")
-                        await websocket.send_json({"error": f"Error analyzing paper: {str(e)}"})
-                else:
-                    # Handle chat messages
-                    user_message = message.get('content', '')
-                    paper_ctx = message.get('paperContext')
-                    chat_history = message.get('chatHistory', [])
-                    if paper_ctx and paper_ctx.get('pmid'):
-                        # Prepend paper metadata to prompt
-                        context = f"You are discussing the following paper:\nTitle: {paper_ctx.get('title','')}\nAuthors: {paper_ctx.get('authors','')}\nJournal: {paper_ctx.get('journal','')}\nYear: {paper_ctx.get('year','')}\nPMID: {paper_ctx.get('pmid','')}\nAbstract: {paper_ctx.get('abstract','')}\n\nUser question: {user_message}"
-                    elif chat_history:
-                        # Build conversation context
-                        history_str = ''
-                        for msg in chat_history:
-                            if msg.get('role') == 'user':
-                                history_str += f"User: {msg.get('content','')}\n"
-                            elif msg.get('role') == 'assistant':
-                                history_str += f"Assistant: {msg.get('content','')}\n"
-                        context = history_str + f"User: {user_message}"
-                    else:
-                        context = user_message
-                    response = await qa_system.chat(context)
-                    print("Sending chat response to frontend:", response)
-                    await websocket.send_json({
-                        "response": response["text"],
-                        "confidence": response.get("confidence")
-                    })
+                                "abstract": metadata.get("abstract", ""),
+                                "enhanced_analysis": data["enhanced_analysis"],
+                                "curation_ready": data["curation_ready"],
+                                "cached": data["cached"],
+                                "status": "success"
+                            }, request_id)
+            except HTTPException as he:
+                await send({"error": he.detail, "pmid": pmid}, request_id)
+    
+    async def chat(message: Dict, request_id: Optional[str]):
+        response = await qa_system.chat(build_chat_context(message, memory))
+        # Both turns are recorded together, so concurrent chats cannot interleave them
+        memory.add_message('user', message.get('content', ''))
+        memory.add_message('assistant', response["text"])
+        await send({
+            "response": response["text"],
+            "confidence": response.get("confidence")
+        }, request_id)
+    
+    async def handle(message: Dict, request_id: Optional[str]):
+        try:
+            if message.get('type') == 'analyze_paper':
+                await analyze(message, request_id, stream_fields=False)
+            elif message.get('type') == 'analyze_paper_stream':
+                # Stream the 6-field analysis, sending each field as soon as it completes
+                await analyze(message, request_id, stream_fields=True)
+            else:
+                await chat(message, request_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing WebSocket message: {str(e)}")
+            try:
+                await send({"error": str(e)}, request_id)
+            except Exception:
+                pass  # the client is gone
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message = json.loads(data)
             except json.JSONDecodeError:
-                await websocket.send_json({"error": "Invalid JSON format"})
-            except Exception as e:
-                print(f"Error processing message: {str(e)}")
-                await websocket.send_json({"error": str(e)})
+                await send({"error": "Invalid JSON format"})
+                continue
+            if not isinstance(message, dict):
+                await send({"error": "Invalid message format"})
+                continue
+            
+            request_id = message.get('id')
+            if message.get('type') == 'cancel':
+                cancelled = [task for task, task_id in pending.items() if request_id is not None and task_id == request_id]
+                for task in cancelled:
+                    task.cancel()
+                await send({"type": "cancelled", "found": bool(cancelled)}, request_id)
+                continue
+            
+            if len(pending) >= WS_MAX_PENDING_MESSAGES:
+                await send({"error": "Too many requests in progress, please wait"}, request_id)
+                continue
+            task = asyncio.create_task(handle(message, request_id))
+            pending[task] = request_id
+            task.add_done_callback(lambda done: pending.pop(done, None))
     except WebSocketDisconnect:
-        print("WebSocket disconnected")
+        logger.info("WebSocket disconnected")
     except Exception as e:
-        print(f"WebSocket error: {str(e)}")
+        logger.error(f"WebSocket error: {str(e)}")
         try:
-            await websocket.send_json({"error": str(e)})
-        except:
+            await send({"error": str(e)})
+        except Exception:
             pass
+    finally:
+        # Nobody is left to receive the results
+        tasks = list(pending)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Cancelled {len(tasks)} pending WebSocket requests")
 
 @app.post("/ask_question/{pmid}", tags=["Paper Analysis"])
 async def ask_question(pmid: str, question: Question):
@@ -723,158 +842,110 @@ async def upload_csv(file: UploadFile = File(...)):
 
 
 
-def extract_taxa(text):
+# Common bacterial genera
+COMMON_GENERA = [
+    "Bacteroides", "Prevotella", "Faecalibacterium", "Bifidobacterium",
+    "Lactobacillus", "Escherichia", "Streptococcus", "Staphylococcus",
+    "Clostridium", "Ruminococcus", "Akkermansia", "Pseudomonas"
+]
+keyword_index.register("taxa_genera", {"genus": [genus.lower() for genus in COMMON_GENERA]})
+
+def extract_taxa(text, hits: Optional[KeywordHits] = None):
     """Extract potential taxa from text"""
     # This is a simplified implementation
     # In a real system, this would use a more sophisticated approach
+    if hits is None:
+        hits = keyword_index.scan(text)
     
-    # Common bacterial genera
-    common_genera = [
-        "Bacteroides", "Prevotella", "Faecalibacterium", "Bifidobacterium",
-        "Lactobacillus", "Escherichia", "Streptococcus", "Staphylococcus",
-        "Clostridium", "Ruminococcus", "Akkermansia", "Pseudomonas"
-    ]
-    
-    found_taxa = []
-    for genus in common_genera:
-        if re.search(r'\b' + genus + r'\b', text, re.IGNORECASE):
-            found_taxa.append(genus)
-    
-    return found_taxa
+    return [genus for genus in COMMON_GENERA if hits.whole_words(genus.lower())]
 
-@app.get("/", tags=["System"])
-async def root():
-    """Redirect to the frontend application."""
-    return RedirectResponse(url="/static/index.html")
-
-@app.get("/analyze/{pmid}", tags=["Paper Analysis"])
-async def analyze_paper(pmid: str, request: Request):
+async def fetch_paper_inputs(pmid: str):
     """
-    **Analyze a single paper for BugSigDB curation readiness.**
+    Retrieve metadata and extracted full text for a paper, storing both in the cache.
     
-    This endpoint analyzes a scientific paper using AI to determine if it's ready for BugSigDB curation.
-    It focuses on extracting and validating 6 essential fields required for curation.
-    
-    **Parameters:**
-    - `pmid`: PubMed ID of the paper to analyze
-    
-    **Returns:**
-    - **enhanced_analysis**: Detailed analysis of the 6 essential fields
-    - **curation_ready**: Boolean indicating if the paper is ready for curation
-    - **metadata**: Paper metadata (title, abstract, authors, etc.)
-    
-    **6 Essential Fields Analyzed:**
-    1. **host_species**: Host organism being studied
-    2. **body_site**: Microbiome sample collection location
-    3. **condition**: Disease/treatment/exposure studied
-    4. **sequencing_type**: Molecular method used
-    5. **taxa_level**: Taxonomic level analyzed
-    6. **sample_size**: Number of samples analyzed
-    
-    **Field Status Values:**
-    - **PRESENT**: Information is complete and clear
-    - **PARTIALLY_PRESENT**: Some information available but incomplete
-    - **ABSENT**: Information is missing with reasons and suggestions
-    
-    **Curation Readiness:**
-    A paper is considered ready for curation when ALL 6 fields have status "PRESENT".
+    Args:
+        pmid: PubMed ID of the paper
+        
+    Returns:
+        Tuple of (metadata, full_text); full_text is empty when PMC has no article
+        
+    Raises:
+        HTTPException: If retrieval fails or times out
     """
-    import time
-    start_time = time.time()
-    
-    # Log query start with client information
-    client_ip = request.client.host if request.client else "Unknown"
-    user_agent = request.headers.get("user-agent", "Unknown")
-    
-    perf_logger.log_pmid_query_start(pmid, user_agent, client_ip)
-    logger.info(f"=== Starting analysis for PMID: {pmid} ===")
-    
+    # Get paper metadata and full text concurrently for better performance
     try:
-        # Check cache first for analysis results
-        cache_start = time.time()
-        cached_result = await cache_manager.get_analysis_result_async(pmid)
-        cache_duration = time.time() - cache_start
+        # Log data retrieval start
+        data_retrieval_start = time.time()
         
-        if cached_result and cache_manager.is_cache_valid(cached_result["timestamp"]):
-            total_duration = time.time() - start_time
-            perf_logger.log_pmid_query_end(pmid, total_duration, True, cached=True)
-            perf_logger.log_cache_operation("GET", pmid, "analysis", cache_duration, True)
-            
-            logger.info(f"Returning cached analysis for PMID: {pmid}")
-            return {
-                "pmid": pmid,
-                "metadata": cached_result["metadata"],
-                "enhanced_analysis": cached_result["analysis_data"],
-                "curation_ready": cached_result["curation_ready"],
-                "timestamp": cached_result["timestamp"],
-                "source": cached_result["source"],
-                "cached": True
-            }
+        # Use asyncio.gather to run operations concurrently
+        metadata_task = retriever.get_paper_metadata_async(pmid)
+        full_text_task = retriever.get_pmc_fulltext_async(pmid)
         
-        # Get paper metadata and full text concurrently for better performance
+        # Wait for both operations with timeout
+        retrieval = asyncio.gather(metadata_task, full_text_task, return_exceptions=True)
         try:
-            # Log data retrieval start
-            data_retrieval_start = time.time()
-            
-            # Use asyncio.gather to run operations concurrently
-            metadata_task = retriever.get_paper_metadata_async(pmid)
-            full_text_task = retriever.get_pmc_fulltext_async(pmid)
-            
-            # Wait for both operations with timeout
-            metadata, full_text = await asyncio.wait_for(
-                asyncio.gather(metadata_task, full_text_task, return_exceptions=True),
-                timeout=45.0  # 45 second timeout for the entire operation
-            )
-            
-            # Log data retrieval completion
-            data_retrieval_duration = time.time() - data_retrieval_start
-            perf_logger.log_analysis_step(pmid, "data_retrieval", data_retrieval_duration, {
-                "metadata_success": not isinstance(metadata, Exception),
-                "fulltext_success": not isinstance(full_text, Exception)
-            })
-            
-            # Handle exceptions from concurrent operations
-            if isinstance(metadata, Exception):
-                logger.error(f"Metadata retrieval failed for PMID {pmid}: {str(metadata)}")
-                raise HTTPException(status_code=500, detail=f"Metadata retrieval failed: {str(metadata)}")
-            
-            if isinstance(full_text, Exception):
-                logger.warning(f"Full text retrieval failed for PMID {pmid}: {str(full_text)}")
-                full_text = ""
-            
-            # Get CSV metadata if available
-            csv_metadata = get_paper_metadata_from_csv(pmid)
-            if csv_metadata:
-                metadata.update(csv_metadata)
-            
-            if not metadata:
-                raise HTTPException(status_code=404, detail=f"Paper not found: {pmid}")
-            
-            # Store metadata in cache
-            await cache_manager.store_metadata_async(pmid, metadata, "pubmed")
-            
-            # Process full text if available
-            if isinstance(full_text, str):
-                try:
+            metadata, full_text = await asyncio.wait_for(retrieval, timeout=45.0)  # 45 second timeout for the entire operation
+        except asyncio.CancelledError:
+            # The caller went away (e.g. a WebSocket client disconnected); consume the
+            # cancelled gather's outcome so asyncio does not log it as never retrieved
+            if retrieval.done() and not retrieval.cancelled():
+                retrieval.exception()
+            raise
+        
+        # Log data retrieval completion
+        data_retrieval_duration = time.time() - data_retrieval_start
+        perf_logger.log_analysis_step(pmid, "data_retrieval", data_retrieval_duration, {
+            "metadata_success": not isinstance(metadata, Exception),
+            "fulltext_success": not isinstance(full_text, Exception)
+        })
+        
+        # Handle exceptions from concurrent operations
+        if isinstance(metadata, Exception):
+            logger.error(f"Metadata retrieval failed for PMID {pmid}: {str(metadata)}")
+            raise HTTPException(status_code=500, detail=f"Metadata retrieval failed: {str(metadata)}")
+        
+        if isinstance(full_text, Exception):
+            logger.warning(f"Full text retrieval failed for PMID {pmid}: {str(full_text)}")
+            full_text = ""
+        
+        # Get CSV metadata if available
+        csv_metadata = get_paper_metadata_from_csv(pmid)
+        if csv_metadata:
+            metadata.update(csv_metadata)
+        
+        if not metadata:
+            raise HTTPException(status_code=404, detail=f"Paper not found: {pmid}")
+        
+        # Store metadata in cache
+        await cache_manager.store_metadata_async(pmid, metadata, "pubmed")
+        
+        # Process full text if available
+        if isinstance(full_text, str):
+            try:
+                with tracer.span("pmc.extract_text", pmid=pmid):
                     soup = BeautifulSoup(full_text, 'lxml')
                     full_text = retriever._extract_text_from_pmc_xml(soup)
-                except Exception as e:
-                    logger.warning(f"Failed to parse PMC XML for PMID {pmid}: {str(e)}")
-                    full_text = ""
-            
-            # Store full text in cache
-            if full_text:
-                await cache_manager.store_fulltext_async(pmid, full_text, "pmc")
-                
-        except asyncio.TimeoutError:
-            logger.error(f"Analysis timeout for PMID {pmid} after 45 seconds")
-            raise HTTPException(status_code=408, detail="Analysis request timed out. Please try again.")
-        except Exception as e:
-            logger.error(f"Error retrieving data for PMID {pmid}: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Data retrieval failed: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Failed to parse PMC XML for PMID {pmid}: {str(e)}")
+                full_text = ""
         
-        # Create enhanced prompt for specific analysis - same as enhanced endpoints
-        enhanced_prompt = f"""
+        # Store full text in cache
+        if full_text:
+            await cache_manager.store_fulltext_async(pmid, full_text, "pmc")
+            
+    except asyncio.TimeoutError:
+        logger.error(f"Analysis timeout for PMID {pmid} after 45 seconds")
+        raise HTTPException(status_code=408, detail="Analysis request timed out. Please try again.")
+    except Exception as e:
+        logger.error(f"Error retrieving data for PMID {pmid}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Data retrieval failed: {str(e)}")
+    
+    return metadata, full_text
+
+@tracer.traced("prompt.build")
+def build_enhanced_prompt(metadata: Dict, full_text: str) -> str:
+    """Build the 6-field BugSigDB curation prompt for a paper."""
+    return f"""
         You are a specialized AI assistant for BugSigDB curation. Your task is to carefully analyze this scientific paper and extract specific information about 6 essential fields required for microbial signature curation.
 
         PAPER INFORMATION:
@@ -992,67 +1063,231 @@ async def analyze_paper(pmid: str, request: Request):
         - Use proper JSON syntax with double quotes for strings
         - Include all required sub-fields for each main field
         """
+
+def process_enhanced_analysis(pmid: str, analysis: Dict, metadata: Dict, full_text: str):
+    """
+    Validate an enhanced Gemini analysis against the full text and cache the result.
+    
+    Args:
+        pmid: PubMed ID of the paper
+        analysis: Result of qa_system.analyze_paper_enhanced
+        metadata: Paper metadata
+        full_text: Extracted full text used for field validation
         
-        # Run enhanced analysis using Gemini
-        try:
-            analysis = await qa_system.analyze_paper_enhanced(enhanced_prompt)
-            
-            # Parse the JSON response from Gemini
-            try:
-                parsed_analysis = json.loads(analysis.get("key_findings", "{}"))
-                
-                # Enhanced field validation and normalization using the field enhancer
-                required_fields = ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]
-                
-                # Use the field enhancer to validate and improve extraction accuracy
-                enhanced_analysis = field_enhancer.enhance_extraction(parsed_analysis, full_text)
-                
-                # Ensure all required fields exist with proper structure
-                missing_fields = []
-                for field in required_fields:
-                    if field not in enhanced_analysis:
+    Returns:
+        Tuple of (enhanced_analysis, curation_ready)
+    """
+    # Parse the JSON response from Gemini
+    try:
+        with tracer.span("analysis.validate_json", pmid=pmid):
+            parsed_analysis = json.loads(analysis.get("key_findings", "{}"))
+        
+        # Enhanced field validation and normalization using the field enhancer
+        required_fields = ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]
+        
+        # Use the field enhancer to validate and improve extraction accuracy
+        with tracer.span("analysis.enhance_fields", pmid=pmid):
+            enhanced_analysis = field_enhancer.enhance_extraction(parsed_analysis, full_text)
+        
+        # Ensure all required fields exist with proper structure
+        missing_fields = []
+        for field in required_fields:
+            if field not in enhanced_analysis:
+                missing_fields.append(field)
+                enhanced_analysis[field] = create_default_field_structure(field)
+            else:
+                # Validate existing field structure
+                field_data = enhanced_analysis[field]
+                if not isinstance(field_data, dict):
+                    missing_fields.append(field)
+                    enhanced_analysis[field] = create_default_field_structure(field)
+                else:
+                    # Ensure all required sub-fields exist
+                    if not validate_field_structure(field_data, field):
                         missing_fields.append(field)
                         enhanced_analysis[field] = create_default_field_structure(field)
-                    else:
-                        # Validate existing field structure
-                        field_data = enhanced_analysis[field]
-                        if not isinstance(field_data, dict):
-                            missing_fields.append(field)
-                            enhanced_analysis[field] = create_default_field_structure(field)
-                        else:
-                            # Ensure all required sub-fields exist
-                            if not validate_field_structure(field_data, field):
-                                missing_fields.append(field)
-                                enhanced_analysis[field] = create_default_field_structure(field)
-                
-                # Determine curation readiness based on enhanced validation
-                curation_ready = enhanced_analysis.get("curation_ready", False)
-                
-                # Update missing fields from enhanced analysis
-                missing_fields = enhanced_analysis.get("missing_fields", missing_fields)
-                
-                # Ensure we have the final structure
-                enhanced_analysis["missing_fields"] = missing_fields
-                enhanced_analysis["curation_ready"] = curation_ready
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing failed for PMID {pmid}: {str(e)}")
-                logger.error(f"Raw analysis response: {analysis.get('key_findings', '{}')[:500]}...")
-                
-                # Create comprehensive fallback structure
-                enhanced_analysis = create_comprehensive_fallback_analysis()
-                missing_fields = ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]
-                curation_ready = False
+        
+        # Determine curation readiness based on enhanced validation
+        curation_ready = enhanced_analysis.get("curation_ready", False)
+        
+        # Update missing fields from enhanced analysis
+        missing_fields = enhanced_analysis.get("missing_fields", missing_fields)
+        
+        # Ensure we have the final structure
+        enhanced_analysis["missing_fields"] = missing_fields
+        enhanced_analysis["curation_ready"] = curation_ready
+        
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing failed for PMID {pmid}: {str(e)}")
+        logger.error(f"Raw analysis response: {analysis.get('key_findings', '{}')[:500]}...")
+        
+        # Create comprehensive fallback structure
+        enhanced_analysis = create_comprehensive_fallback_analysis()
+        missing_fields = ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]
+        curation_ready = False
+    
+    # Store analysis results in cache
+    with tracer.span("cache.write", pmid=pmid, cache_type="analysis"):
+        cache_manager.store_analysis_result(
+            pmid, 
+            enhanced_analysis, 
+            metadata, 
+            "gemini_enhanced", 
+            analysis.get("confidence", 0.0), 
+            curation_ready
+        )
+    
+    return enhanced_analysis, curation_ready
+
+async def enhanced_analysis_events(pmid: str):
+    """
+    Run the cached enhanced analysis of a paper as a stream of events.
+    
+    Shared by `/analyze_stream` and the WebSocket; a valid cached result is
+    returned as a single "complete" event.
+    
+    Args:
+        pmid: PubMed ID of the paper
+        
+    Yields:
+        (event, data) tuples:
+        - ("metadata", {"pmid", "metadata", "has_full_text"}) once retrieval completes
+        - ("llm_started", {"pmid"}) when the Gemini request is sent
+        - ("field", {"field", "data"}) for each completed field
+        - ("complete", {...}) with the final validated result
+        
+    Raises:
+        HTTPException: If retrieval or the analysis fails
+    """
+    start_time = time.time()
+    try:
+        cached_result = await cache_manager.get_analysis_result_async(pmid)
+        if cached_result and cache_manager.is_cache_valid(cached_result["timestamp"]):
+            perf_logger.log_pmid_query_end(pmid, time.time() - start_time, True, cached=True)
+            yield "complete", {
+                "pmid": pmid,
+                "metadata": cached_result["metadata"],
+                "enhanced_analysis": cached_result["analysis_data"],
+                "curation_ready": cached_result["curation_ready"],
+                "timestamp": cached_result["timestamp"],
+                "source": cached_result["source"],
+                "cached": True
+            }
+            return
+        
+        metadata, full_text = await fetch_paper_inputs(pmid)
+        yield "metadata", {"pmid": pmid, "metadata": metadata, "has_full_text": bool(full_text)}
+        
+        prompt = build_enhanced_prompt(metadata, full_text)
+        yield "llm_started", {"pmid": pmid}
+        analysis = None
+        async for event in qa_system.analyze_paper_enhanced_stream(prompt):
+            if event["type"] == "field":
+                yield "field", {"field": event["field"], "data": event["data"]}
+            elif event["type"] == "complete":
+                analysis = event["analysis"]
+        
+        # Field validation and the cache write run off the event loop
+        enhanced_analysis, curation_ready = await run_in_executor(
+            process_enhanced_analysis, pmid, analysis or {}, metadata, full_text
+        )
+        perf_logger.log_pmid_query_end(pmid, time.time() - start_time, True, cached=False)
+        yield "complete", {
+            "pmid": pmid,
+            "title": metadata.get("title", ""),
+            "enhanced_analysis": enhanced_analysis,
+            "curation_ready": curation_ready,
+            "timestamp": datetime.now().isoformat(),
+            "source": "gemini_enhanced_analysis",
+            "cached": False
+        }
+        
+    except HTTPException as he:
+        perf_logger.log_pmid_query_end(pmid, time.time() - start_time, False, error=str(he.detail))
+        raise
+    except Exception as e:
+        perf_logger.log_pmid_query_end(pmid, time.time() - start_time, False, error=str(e))
+        logger.error(f"Error in enhanced analysis for PMID {pmid}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@app.get("/", tags=["System"])
+async def root():
+    """Redirect to the frontend application."""
+    return RedirectResponse(url="/static/index.html")
+
+@app.get("/analyze/{pmid}", tags=["Paper Analysis"])
+async def analyze_paper(pmid: str, request: Request):
+    """
+    **Analyze a single paper for BugSigDB curation readiness.**
+    
+    This endpoint analyzes a scientific paper using AI to determine if it's ready for BugSigDB curation.
+    It focuses on extracting and validating 6 essential fields required for curation.
+    
+    **Parameters:**
+    - `pmid`: PubMed ID of the paper to analyze
+    
+    **Returns:**
+    - **enhanced_analysis**: Detailed analysis of the 6 essential fields
+    - **curation_ready**: Boolean indicating if the paper is ready for curation
+    - **metadata**: Paper metadata (title, abstract, authors, etc.)
+    
+    **6 Essential Fields Analyzed:**
+    1. **host_species**: Host organism being studied
+    2. **body_site**: Microbiome sample collection location
+    3. **condition**: Disease/treatment/exposure studied
+    4. **sequencing_type**: Molecular method used
+    5. **taxa_level**: Taxonomic level analyzed
+    6. **sample_size**: Number of samples analyzed
+    
+    **Field Status Values:**
+    - **PRESENT**: Information is complete and clear
+    - **PARTIALLY_PRESENT**: Some information available but incomplete
+    - **ABSENT**: Information is missing with reasons and suggestions
+    
+    **Curation Readiness:**
+    A paper is considered ready for curation when ALL 6 fields have status "PRESENT".
+    """
+    import time
+    start_time = time.time()
+    
+    # Log query start with client information
+    client_ip = request.client.host if request.client else "Unknown"
+    user_agent = request.headers.get("user-agent", "Unknown")
+    
+    perf_logger.log_pmid_query_start(pmid, user_agent, client_ip)
+    logger.info(f"=== Starting analysis for PMID: {pmid} ===")
+    
+    try:
+        # Check cache first for analysis results
+        cache_start = time.time()
+        cached_result = await cache_manager.get_analysis_result_async(pmid)
+        cache_duration = time.time() - cache_start
+        
+        if cached_result and cache_manager.is_cache_valid(cached_result["timestamp"]):
+            total_duration = time.time() - start_time
+            perf_logger.log_pmid_query_end(pmid, total_duration, True, cached=True)
+            perf_logger.log_cache_operation("GET", pmid, "analysis", cache_duration, True)
             
-            # Store analysis results in cache
-            cache_manager.store_analysis_result(
-                pmid, 
-                enhanced_analysis, 
-                metadata, 
-                "gemini_enhanced", 
-                analysis.get("confidence", 0.0), 
-                curation_ready
-            )
+            logger.info(f"Returning cached analysis for PMID: {pmid}")
+            return {
+                "pmid": pmid,
+                "metadata": cached_result["metadata"],
+                "enhanced_analysis": cached_result["analysis_data"],
+                "curation_ready": cached_result["curation_ready"],
+                "timestamp": cached_result["timestamp"],
+                "source": cached_result["source"],
+                "cached": True
+            }
+        
+        metadata, full_text = await fetch_paper_inputs(pmid)
+        
+        # Create enhanced prompt for specific analysis - same as enhanced endpoints
+        enhanced_prompt = build_enhanced_prompt(metadata, full_text)
+        
+        # Run enhanced analysis using Gemini
+        try:
+            analysis = await qa_system.analyze_paper_enhanced(enhanced_prompt)
+            enhanced_analysis, curation_ready = process_enhanced_analysis(pmid, analysis, metadata, full_text)
             
             # Compose the enhanced response
             response = {
@@ -1083,6 +1318,43 @@ async def analyze_paper(pmid: str, request: Request):
         logger.error(f"Error in analyze_paper endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/analyze_stream/{pmid}", tags=["Paper Analysis"])
+async def analyze_paper_stream(pmid: str):
+    """
+    **Stream the analysis of a single paper as Server-Sent Events.**
+    
+    Runs the same analysis as `/analyze/{pmid}`, but streams the Gemini response and
+    emits each of the 6 essential fields as soon as the model has finished writing it,
+    instead of waiting for the complete response.
+    
+    **Parameters:**
+    - `pmid`: PubMed ID of the paper to analyze
+    
+    **Events:**
+    - **metadata**: Paper metadata, sent once retrieval completes
+    - **field**: `{"field": name, "data": {...}}` for each completed field
+    - **complete**: Final validated result, same body as `/analyze/{pmid}`
+    - **error**: `{"status_code": ..., "detail": ...}` if the analysis fails
+    
+    **Note:** Cached results are returned immediately as a single `complete` event.
+    """
+    def sse(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    async def event_stream():
+        try:
+            async for event, data in enhanced_analysis_events(pmid):
+                if event != "llm_started":
+                    yield sse(event, data)
+        except HTTPException as he:
+            yield sse("error", {"status_code": he.status_code, "detail": he.detail})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Helper functions for field structure creation and validation
 def create_default_field_structure(field_name: str) -> Dict:
     """Create a default structure for a missing field."""
@@ -1457,43 +1729,11 @@ async def analyze_batch(pmids: list = Body(...), page: int = Query(1), page_size
     
     return results
 
-def get_paper_metadata_from_csv(pmid, csv_path='data/full_dump.csv'):
-    with open(csv_path, newline='', encoding='utf-8') as csvfile:
-        # Skip comment lines (starting with #) or skip first 2 lines
-        while True:
-            pos = csvfile.tell()
-            line = csvfile.readline()
-            if not line:
-                return None  # End of file, not found
-            if isinstance(line, str) and not line.startswith('#'):
-                csvfile.seek(pos)
-                break
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row.get('PMID') == pmid:
-                # Combine both group sample sizes if present
-                group0 = row.get('Group 0 sample size', '')
-                group1 = row.get('Group 1 sample size', '')
-                sample_size = f"Group 0: {group0}, Group 1: {group1}" if group0 or group1 else ''
-                return {
-                    'pmid': row.get('PMID', ''),
-                    'title': row.get('Title', ''),
-                    'authors': row.get('Authors list', ''),
-                    'journal': row.get('Journal', ''),
-                    'year': row.get('Year', ''),
-                    'host': row.get('Host species', ''),
-                    'body_site': row.get('Body site', ''),
-                    'condition': row.get('Condition', ''),
-                    'sequencing_type': row.get('Sequencing type', ''),
-                    'in_bugsigdb': row.get('In BugSigDB', ''),
-                    'sample_size': sample_size,
-                    'taxa_level': row.get('Taxa Level', ''),
-                    'statistical_method': row.get('Statistical test', ''),
-                    'doi': row.get('DOI', ''),
-                    'publication_date': row.get('Publication Date', ''),
-                    'signature_probability': row.get('Signature Probability', ''),
-                }
-    return None
+def get_paper_metadata_from_csv(pmid, csv_path=None):
+    """Curated BugSigDB metadata of a paper from the CSV export, if present."""
+    if csv_path is not None and Path(csv_path) != curated_papers.csv_path:
+        return CuratedPapers(csv_path).get(pmid)
+    return curated_papers.get(pmid)
 
 @app.get("/list_pmids", tags=["Batch Processing"])
 def list_pmids():
@@ -1506,29 +1746,30 @@ def list_pmids():
     **Returns:**
     - List of PMIDs as strings
     
-    **Note:** This endpoint reads from the local CSV file and may take time for large datasets.
+    **Note:** The CSV file is parsed once and re-read only when it changes.
     """
-    pmids = []
     try:
-        with open('data/full_dump.csv', newline='', encoding='utf-8') as csvfile:
-            # Skip comment lines and header
-            while True:
-                pos = csvfile.tell()
-                line = csvfile.readline()
-                if not line:
-                    break
-                if isinstance(line, str) and not line.startswith('#'):
-                    csvfile.seek(pos)
-                    break
-            import csv as pycsv
-            reader = pycsv.DictReader(csvfile)
-            for row in reader:
-                pmid = row.get('PMID')
-                if pmid and pmid != 'NA':
-                    pmids.append(pmid)
+        return curated_papers.pmids()
     except Exception as e:
         return {"error": str(e)}
-    return pmids
+
+@app.on_event("startup")
+async def warm_up_components():
+    """Build the components listed in WARMUP_COMPONENTS in the background."""
+    if WARMUP_COMPONENTS:
+        logger.info(f"Warming up components: {', '.join(WARMUP_COMPONENTS)}")
+        asyncio.get_event_loop().run_in_executor(None, registry.warm_up, WARMUP_COMPONENTS)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Measure event loop lag; with LOOP_BLOCKING_DEBUG, report blocking calls made on the loop."""
+    if LOOP_BLOCKING_DEBUG:
+        install_blocking_guards(LOOP_BLOCKING_DEBUG)
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
 
 @app.get("/health", tags=["System"])
 async def health_check():
@@ -1546,7 +1787,8 @@ async def health_check():
                 "cache_manager": "operational",
                 "data_retrieval": "operational",
                 "qa_system": "operational" if qa_system else "not_configured"
-            }
+            },
+            "components": registry.status()
         }
         
         return health_status
@@ -1603,8 +1845,11 @@ async def get_metrics():
             "performance": {
                 "cache_hit_rate": cache_stats.get("curation_readiness_rate", 0.0),
                 "total_analyzed": cache_stats.get("total_curation_analyzed", 0),
-                "recent_activity": cache_stats.get("recent_analysis_24h", 0)
-            }
+                "recent_activity": cache_stats.get("recent_analysis_24h", 0),
+                "log_records_dropped": perf_logger.dropped,
+                "trace_spans_dropped": tracer.dropped
+            },
+            "event_loop": loop_monitor.stats()
         }
         
         return metrics
@@ -1613,6 +1858,73 @@ async def get_metrics():
         logger.error(f"Metrics collection failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Metrics collection failed: {str(e)}")
 
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Allow debug endpoints only with the configured ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        # Debug endpoints do not exist unless a token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/debug/profile", tags=["System"], dependencies=[Depends(require_admin_token)])
+async def debug_profile(seconds: float = Query(10.0, gt=0), format: str = Query("collapsed")):
+    """
+    **Sample the stacks of all threads for a while (admin only).**
+    
+    A background thread records the stack of the event loop, executor workers and
+    other threads every 10 ms; requests keep being served while it runs.
+    
+    **Parameters:**
+    - `seconds`: Profile duration (capped at DEBUG_PROFILE_MAX_SECONDS)
+    - `format`: `collapsed` (default) returns collapsed stacks for flamegraph.pl or
+      speedscope as a download; `json` returns sample counts and the top frames
+    
+    **Headers:** `X-Admin-Token` must match ADMIN_TOKEN.
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+    seconds = min(seconds, DEBUG_PROFILE_MAX_SECONDS)
+    try:
+        result = await profiler.profile(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(f"Profiled {result['samples']} samples over {result['duration']:.1f}s")
+    if format == "json":
+        return {
+            "samples": result["samples"],
+            "duration": round(result["duration"], 3),
+            "interval": profiler.interval,
+            "threads": result["threads"],
+            "top_frames": top_frames(result["stacks"])
+        }
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+    return PlainTextResponse(
+        collapsed_text(result["stacks"]),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/debug/tasks", tags=["System"], dependencies=[Depends(require_admin_token)])
+async def debug_tasks(stack_limit: int = Query(10, ge=1, le=100)):
+    """
+    **Dump pending asyncio tasks and the default executor's queue depth (admin only).**
+    
+    **Headers:** `X-Admin-Token` must match ADMIN_TOKEN.
+    """
+    return dump_tasks(stack_limit=stack_limit)
+
+@app.get("/debug/loop", tags=["System"], dependencies=[Depends(require_admin_token)])
+async def debug_loop():
+    """
+    **Event loop lag, executor queues and recent stalls with their stacks (admin only).**
+    
+    A stall is a heartbeat delayed by more than LOOP_LAG_THRESHOLD; its stack and
+    task are captured while the loop is still blocked.
+    
+    **Headers:** `X-Admin-Token` must match ADMIN_TOKEN.
+    """
+    return loop_monitor.stats(include_stalls=True)
+
 @app.get("/enhanced_analysis/{pmid}", tags=["Paper Analysis"])
 async def enhanced_analysis(pmid: str):
     """
@@ -2167,6 +2479,112 @@ async def enhanced_analysis_batch(pmids: List[str] = Body(...), max_concurrent:
         logger.error(f"Error in batch enhanced analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
 
+@app.post("/classify_batch", tags=["Batch Processing"])
+async def classify_batch(pmids: List[str] = Body(...), stream: bool = Query(False)):
+    """
+    **Batch classification endpoint for triaging many candidate papers.**
+    
+    Runs the trained MicrobeSigClassifier over the papers: retrieval is concurrent,
+    embeddings are reused from the embedding store, and inference is micro-batched
+    across papers (and across concurrent requests).
+    
+    **Parameters:**
+    - `pmids`: List of PubMed IDs to classify
+    - `stream`: Return newline-delimited JSON, one prediction per line as it completes (default: false)
+    
+    **Returns:**
+    - **results**: Per-paper predictions in input order, each containing:
+        - **signature_probability** / **has_signature**: Likelihood the paper reports a microbial signature
+        - **sequencing_type**: Predicted sequencing type
+        - **metadata.body_site**: Predicted body site
+        - **status**: Success/error status
+    - **summary**: Processing statistics
+    """
+    if not pmids:
+        raise HTTPException(status_code=400, detail="No PMIDs provided")
+    if len(pmids) > config.CLASSIFY_MAX_PMIDS:
+        raise HTTPException(status_code=400, detail=f"Maximum {config.CLASSIFY_MAX_PMIDS} PMIDs allowed per batch")
+    
+    try:
+        # The first request loads SciBERT and the classifier; keep that off the event loop
+        loop = asyncio.get_event_loop()
+        service = await loop.run_in_executor(None, registry.get, "classification_service")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"Classifier not available: {str(e)}")
+    except Exception as e:
+        logger.error(f"Failed to load classification service: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load classifier: {str(e)}")
+    
+    if stream:
+        async def prediction_stream():
+            async for result in service.classify_many(pmids):
+                yield json.dumps(result) + "\n"
+        
+        return StreamingResponse(prediction_stream(), media_type="application/x-ndjson")
+    
+    start_time = time.time()
+    results = await service.classify_all(pmids)
+    successful = sum(1 for result in results if result.get("status") == "success")
+    
+    return {
+        "results": results,
+        "summary": {
+            "total_pmids": len(pmids),
+            "successful": successful,
+            "errors": len(pmids) - successful,
+            "processing_time": time.time() - start_time,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+@app.get("/similar/{pmid}", tags=["Paper Analysis"])
+async def similar_papers(pmid: str, k: int = Query(10, ge=1, le=100)):
+    """
+    **Find BugSigDB-curated papers similar to a paper.**
+    
+    Looks the paper up in the similarity index built over the curated papers
+    (see `scripts/build_similarity_index.py`); papers not in the index are embedded
+    on the fly from their PubMed metadata.
+    
+    **Parameters:**
+    - `pmid`: PubMed ID of the query paper
+    - `k`: Number of similar papers to return (default: 10)
+    
+    **Returns:**
+    - **similar_papers**: Curated papers with their similarity and curated fields
+    - **field_suggestions**: Curated field values voted by the similar papers, weighted by similarity
+    """
+    loop = asyncio.get_event_loop()
+    index = await loop.run_in_executor(None, registry.get, "similarity_index")
+    if len(index) == 0:
+        raise HTTPException(status_code=503, detail="Similarity index has not been built")
+    
+    start_time = time.time()
+    query = index.vector(pmid)
+    if query is None:
+        try:
+            metadata = await retriever.get_paper_metadata_async(pmid)
+        except Exception as e:
+            logger.error(f"Metadata retrieval failed for PMID {pmid}: {str(e)}")
+            raise HTTPException(status_code=404, detail=f"Paper not found: {pmid}")
+        from app.services.similarity_index import paper_embeddings
+        preprocessor = await loop.run_in_executor(None, registry.get, "preprocessor")
+        embeddings = await loop.run_in_executor(None, paper_embeddings, preprocessor, [metadata])
+        query = embeddings[0]
+    
+    neighbors = index.search(query, k=k, exclude=pmid)
+    similar = []
+    for neighbor_pmid, similarity in neighbors:
+        curated = curated_papers.get(neighbor_pmid) or {"pmid": neighbor_pmid}
+        similar.append({**curated, "similarity": round(similarity, 4)})
+    
+    return {
+        "pmid": pmid,
+        "similar_papers": similar,
+        "field_suggestions": suggest_fields([(paper, paper["similarity"]) for paper in similar]),
+        "search_time": time.time() - start_time
+    }
+
 @app.get("/cache/stats", tags=["Cache Management"])
 async def get_cache_stats():
     """Get cache statistics and information."""
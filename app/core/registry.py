@@ -0,0 +1,113 @@
+"""
+Lazy Component Registry
+=======================
+
+Heavy components (ML models, tokenizers) are registered as factories and only
+built on first use, so importing the API does not pay for torch, transformers or
+tiktoken. Each component is built at most once, even under concurrent first
+requests, and can be built ahead of time with warm_up().
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentRegistry:
+    """Registry of lazily constructed, process-wide singleton components."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._load_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register a factory for a component.
+
+        Args:
+            name: Component name
+            factory: Zero-argument callable building the component; heavy imports
+                belong inside it
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Get a component, building it on first use.
+
+        Args:
+            name: Component name
+
+        Returns:
+            The component instance
+
+        Raises:
+            KeyError: If no factory is registered under the name
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No component registered as '{name}'")
+            factory = self._factories[name]
+            lock = self._locks[name]
+
+        # Per-component lock: concurrent first uses wait for a single build
+        with lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.time()
+                instance = factory()
+                self._load_times[name] = time.time() - start
+                self._instances[name] = instance
+                logger.info(f"Loaded component '{name}' in {self._load_times[name]:.2f}s")
+        return instance
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether a component has already been built."""
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """
+        Build components ahead of their first use.
+
+        Args:
+            names: Components to build (defaults to all registered components)
+
+        Returns:
+            Mapping of component name to whether it was built successfully
+        """
+        results = {}
+        for name in list(names if names is not None else self._factories):
+            try:
+                self.get(name)
+                results[name] = True
+            except Exception as e:
+                logger.error(f"Failed to warm up component '{name}': {str(e)}")
+                results[name] = False
+        return results
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Load state and build time of every registered component."""
+        return {
+            name: {
+                "loaded": name in self._instances,
+                "load_time": self._load_times.get(name)
+            }
+            for name in self._factories
+        }
+
+
+# Global component registry
+registry = ComponentRegistry()
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Optional
 
+INFERENCE_BACKENDS = ("torch", "quantized", "onnx")
+
 @dataclass
 class ModelConfig:
     """Configuration for the microbial signature model"""
@@ -42,6 +44,11 @@ class ModelConfig:
     device: str = "cuda"  # or "cpu"
     fp16: bool = False    # Mixed precision training
     
+    # CPU inference
+    inference_backend: str = "torch"   # "torch" (fp32), "quantized" (dynamic int8) or "onnx"
+    parity_tolerance: float = 0.05     # Max relative error vs fp32 before falling back
+    onnx_dir: str = "models/onnx"
+    
     # Logging and checkpointing
     logging_steps: int = 100
     save_steps: int = 1000
@@ -52,4 +59,6 @@ class ModelConfig:
         assert self.hidden_size % self.num_attention_heads == 0, \
             "Hidden size must be divisible by number of attention heads"
         assert self.max_position_embeddings <= 512, \
-            "Position embeddings limited to 512 for efficiency" 
\ No newline at end of file
+            "Position embeddings limited to 512 for efficiency"
+        assert self.inference_backend in INFERENCE_BACKENDS, \
+            f"Unknown inference backend: {self.inference_backend}" 
\ No newline at end of file
@@ -1,14 +1,32 @@
 import logging
-from typing import Dict, List, Optional, Union
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Union
 from pathlib import Path
 from datetime import datetime
 import pytz
 import google.generativeai as genai
 import os
 import json
+from app.utils.json_stream import IncrementalJSONParser, parse_llm_json
+from app.utils.performance_logger import perf_logger
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+@contextmanager
+def _log_gemini_call(operation: str, pmid: Optional[str] = None):
+    """Record the duration and outcome of a Gemini API call in the performance log and as a trace span."""
+    start_time = time.time()
+    with tracer.span(f"gemini.{operation}", pmid=pmid):
+        try:
+            yield
+        except Exception as e:
+            perf_logger.log_api_call("Gemini", operation, pmid, time.time() - start_time, False, str(e) or type(e).__name__)
+            raise
+        perf_logger.log_api_call("Gemini", operation, pmid, time.time() - start_time, True)
+
 class GeminiQA:
     """Enhanced QA system using Gemini's API for biomedical paper analysis."""
 
@@ -443,7 +461,8 @@ CRITICAL: If the paper contains ANY specific microbial taxa identification, abun
 
             # Use Gemini API to generate the analysis
             model = genai.GenerativeModel(self.model)
-            response = await model.generate_content_async(f"{prompt}\n\nAnalyze this paper:\n{content}")
+            with _log_gemini_call("analyze_paper", paper_content.get('pmid')):
+                response = await model.generate_content_async(f"{prompt}\n\nAnalyze this paper:\n{content}")
             analysis_text = response.text.strip()
 
             # Save results if directory is specified
@@ -507,26 +526,120 @@ CRITICAL: If the paper contains ANY specific microbial taxa identification, abun
         try:
             if not self.api_key:
                 logger.error("No Gemini API key provided")
-                return {
-                    "error": "No Gemini API key available. Please set the GEMINI_API_KEY environment variable.",
-                    "error_type": "MissingAPIKey",
-                    "key_findings": "{}",
-                    "confidence": 0.0,
-                    "status": "error",
-                    "debug_info": {
-                        "issue": "Missing API key",
-                        "solution": "Set GEMINI_API_KEY environment variable",
-                        "timestamp": datetime.now().isoformat()
+                return self._missing_api_key_response()
+            
+            # Configure the model for structured output
+            model = genai.GenerativeModel('gemini-1.5-pro-latest')
+            
+            # Enhanced structured prompt for better field extraction accuracy
+            enhanced_structured_prompt = self._build_enhanced_structured_prompt(prompt)
+            
+            # Generate response with enhanced prompt and timeout
+            try:
+                # Use asyncio.wait_for to add timeout to the API call
+                loop = asyncio.get_event_loop()
+                with _log_gemini_call("analyze_paper_enhanced"):
+                    response = await asyncio.wait_for(
+                        loop.run_in_executor(None, model.generate_content, enhanced_structured_prompt),
+                        timeout=30.0  # 30 second timeout for Gemini API
+                    )
+                
+                if not response or not response.text:
+                    return {
+                        "error": "No response generated",
+                        "key_findings": "{}",
+                        "confidence": 0.0
                     }
-                }
+                    
+            except asyncio.TimeoutError:
+                logger.error("Gemini API call timed out after 30 seconds")
+                return self._timeout_response()
             
+            return self._finalize_enhanced_response(response.text)
+                
+        except Exception as e:
+            return self._error_response(e)
 
+    async def analyze_paper_enhanced_stream(self, prompt: str) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of analyze_paper_enhanced.
+        
+        Generation is streamed from Gemini and parsed incrementally, so each of the
+        6 curation fields is yielded as soon as the model has finished writing it.
+        
+        Args:
+            prompt: Paper analysis prompt
             
-            # Configure the model for structured output
+        Yields:
+            {"type": "field", "field": name, "data": {...}} for every completed field,
+            followed by a single {"type": "complete", "analysis": {...}} event whose
+            analysis has the same shape as the analyze_paper_enhanced result
+        """
+        if not self.api_key:
+            logger.error("No Gemini API key provided")
+            yield {"type": "complete", "analysis": self._missing_api_key_response()}
+            return
+        
+        parser = IncrementalJSONParser()
+        default_fields = self._default_field_structures()
+        try:
             model = genai.GenerativeModel('gemini-1.5-pro-latest')
+            enhanced_structured_prompt = self._build_enhanced_structured_prompt(prompt)
             
-            # Enhanced structured prompt for better field extraction accuracy
-            enhanced_structured_prompt = f"""
+            loop = asyncio.get_event_loop()
+            deadline = loop.time() + 30.0  # same overall budget as the blocking call
+            
+            with _log_gemini_call("analyze_paper_enhanced_stream"):
+                response = await asyncio.wait_for(
+                    model.generate_content_async(enhanced_structured_prompt, stream=True),
+                    timeout=max(0.0, deadline - loop.time())
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                
+                    try:
+                        text = chunk.text or ""
+                    except ValueError:
+                        # The SDK raises instead of returning "" for blocked or empty chunks
+                        logger.warning("Skipping a Gemini stream chunk without text")
+                        continue
+                    for field_name, value in parser.feed(text):
+                        if field_name not in default_fields:
+                            continue
+                        yield {
+                            "type": "field",
+                            "field": field_name,
+                            "data": self._normalize_field(field_name, value, default_fields[field_name])
+                        }
+                    
+        except asyncio.TimeoutError:
+            if not parser.fields:
+                logger.error("Gemini API call timed out after 30 seconds")
+                yield {"type": "complete", "analysis": self._timeout_response()}
+                return
+            # Keep whatever fields were completed before the deadline
+            logger.warning(f"Gemini stream timed out after {len(parser.fields)} completed fields; using partial response")
+        except Exception as e:
+            yield {"type": "complete", "analysis": self._error_response(e)}
+            return
+        
+        if not parser.text.strip():
+            yield {"type": "complete", "analysis": {
+                "error": "No response generated",
+                "key_findings": "{}",
+                "confidence": 0.0
+            }}
+            return
+        
+        yield {"type": "complete", "analysis": self._finalize_enhanced_response(parser.text)}
+
+    def _build_enhanced_structured_prompt(self, prompt: str) -> str:
+        """Wrap an analysis prompt with the structured extraction guidelines."""
+        return f"""
             You are a specialized AI assistant for BugSigDB curation with expertise in microbial signature analysis. Your task is to analyze scientific papers and extract specific information in a structured JSON format with high accuracy.
 
             {prompt}
@@ -585,135 +698,129 @@ CRITICAL: If the paper contains ANY specific microbial taxa identification, abun
 
             Focus on accuracy and provide confidence scores based on how clearly the information is stated in the text.
             """
+
+    def _finalize_enhanced_response(self, response_text: str) -> Dict[str, Union[str, float, List[str]]]:
+        """
+        Parse, validate and score a raw enhanced-analysis response.
+        
+        Malformed output (code fences, trailing commas, truncation) is repaired before
+        falling back to the all-ABSENT structure.
+        """
+        response_text = response_text.strip()
+        
+        try:
+            parsed_json = parse_llm_json(response_text)
+            if not isinstance(parsed_json, dict):
+                raise json.JSONDecodeError("Expected a JSON object", response_text, 0)
             
-            # Generate response with enhanced prompt and timeout
-            try:
-                # Use asyncio.wait_for to add timeout to the API call
-                loop = asyncio.get_event_loop()
-                response = await asyncio.wait_for(
-                    loop.run_in_executor(None, model.generate_content, enhanced_structured_prompt),
-                    timeout=30.0  # 30 second timeout for Gemini API
-                )
-                
-                if not response or not response.text:
-                    return {
-                        "error": "No response generated",
-                        "key_findings": "{}",
-                        "confidence": 0.0
-                    }
-                    
-            except asyncio.TimeoutError:
-                logger.error("Gemini API call timed out after 30 seconds")
-                return {
-                    "error": "Gemini API request timed out after 30 seconds. This may indicate: 1) API service is slow, 2) Network connectivity issues, 3) API quota limits, or 4) IP restrictions.",
-                    "error_type": "TimeoutError",
-                    "key_findings": "{}",
-                    "confidence": 0.0,
-                    "status": "timeout",
-                    "debug_info": {
-                        "timeout_duration": "30 seconds",
-                        "timestamp": datetime.now().isoformat(),
-                        "suggestions": [
-                            "Check your internet connection",
-                            "Verify Gemini API key is valid",
-                            "Check if your IP is whitelisted",
-                            "Monitor API quota usage"
-                        ]
-                    }
-                }
-            
-            # Clean the response text to extract just the JSON
-            response_text = response.text.strip()
-            
-            # Try to find JSON in the response with improved extraction
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+            # Validate and normalize the structure
+            validated_json = self._validate_and_normalize_json(parsed_json)
             
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-            else:
-                json_text = response_text
+            # Calculate enhanced confidence
+            confidence = self._calculate_enhanced_confidence(validated_json)
             
-            # Validate and clean JSON structure
-            try:
-                # First attempt to parse the JSON
-                parsed_json = json.loads(json_text)
-                
-                # Validate and normalize the structure
-                validated_json = self._validate_and_normalize_json(parsed_json)
-                
-                # Calculate enhanced confidence
-                confidence = self._calculate_enhanced_confidence(validated_json)
-                
-                return {
-                    "key_findings": json.dumps(validated_json, indent=2),
-                    "confidence": confidence,
-                    "status": "success"
-                }
-                
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse JSON response: {e}")
-                logger.warning(f"Raw response: {response_text[:500]}...")
-                
-                # Return a structured fallback with proper field structure
-                fallback_json = self._create_fallback_json()
-                
-                return {
-                    "key_findings": json.dumps(fallback_json, indent=2),
-                    "confidence": 0.0,
-                    "status": "fallback",
-                    "error": f"JSON parsing failed: {str(e)}"
-                }
-                
-        except Exception as e:
-            # Enhanced error logging with specific error detection
-            error_msg = str(e)
-            error_type = type(e).__name__
+            return {
+                "key_findings": json.dumps(validated_json, indent=2),
+                "confidence": confidence,
+                "status": "success"
+            }
             
-            # Detect specific error types
-            if "quota" in error_msg.lower() or "quota exceeded" in error_msg.lower():
-                error_detail = "Gemini API quota exceeded. Please check your API usage limits."
-                logger.error(f"Gemini API quota exceeded: {error_msg}")
-            elif "permission" in error_msg.lower() or "access" in error_msg.lower():
-                error_detail = "Gemini API access denied. Check API key permissions and IP restrictions."
-                logger.error(f"Gemini API access denied: {error_msg}")
-            elif "authentication" in error_msg.lower() or "invalid" in error_msg.lower():
-                error_detail = "Gemini API authentication failed. Check your API key."
-                logger.error(f"Gemini API authentication failed: {error_msg}")
-            elif "network" in error_msg.lower() or "connection" in error_msg.lower():
-                error_detail = "Network connectivity issue. Check your internet connection."
-                logger.error(f"Network connectivity issue: {error_msg}")
-            elif "timeout" in error_msg.lower():
-                error_detail = "Gemini API request timed out. The service may be slow or unavailable."
-                logger.error(f"Gemini API timeout: {error_msg}")
-            else:
-                error_detail = f"Unexpected error: {error_msg}"
-                logger.error(f"Unexpected error in Gemini API: {error_msg}")
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse JSON response: {e}")
+            logger.warning(f"Raw response: {response_text[:500]}...")
             
-            # Log detailed error information
-            logger.error(f"Error type: {error_type}")
-            logger.error(f"Error details: {error_detail}")
-            logger.error(f"Full error: {error_msg}")
+            # Return a structured fallback with proper field structure
+            fallback_json = self._create_fallback_json()
             
             return {
-                "error": error_detail,
-                "error_type": error_type,
-                "key_findings": "{}",
+                "key_findings": json.dumps(fallback_json, indent=2),
                 "confidence": 0.0,
-                "status": "error",
-                "debug_info": {
-                    "original_error": error_msg,
-                    "error_type": error_type,
-                    "timestamp": datetime.now().isoformat()
-                }
+                "status": "fallback",
+                "error": f"JSON parsing failed: {str(e)}"
             }
-    
-    def _validate_and_normalize_json(self, parsed_json: Dict) -> Dict:
-        """
-        Validate and normalize the JSON structure to ensure all required fields are present.
-        """
-        # Define the required field structure
-        required_fields = {
+
+    def _missing_api_key_response(self) -> Dict:
+        """Error result returned when no Gemini API key is configured."""
+        return {
+            "error": "No Gemini API key available. Please set the GEMINI_API_KEY environment variable.",
+            "error_type": "MissingAPIKey",
+            "key_findings": "{}",
+            "confidence": 0.0,
+            "status": "error",
+            "debug_info": {
+                "issue": "Missing API key",
+                "solution": "Set GEMINI_API_KEY environment variable",
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+
+    def _timeout_response(self) -> Dict:
+        """Error result returned when the Gemini call exceeds its timeout."""
+        return {
+            "error": "Gemini API request timed out after 30 seconds. This may indicate: 1) API service is slow, 2) Network connectivity issues, 3) API quota limits, or 4) IP restrictions.",
+            "error_type": "TimeoutError",
+            "key_findings": "{}",
+            "confidence": 0.0,
+            "status": "timeout",
+            "debug_info": {
+                "timeout_duration": "30 seconds",
+                "timestamp": datetime.now().isoformat(),
+                "suggestions": [
+                    "Check your internet connection",
+                    "Verify Gemini API key is valid",
+                    "Check if your IP is whitelisted",
+                    "Monitor API quota usage"
+                ]
+            }
+        }
+
+    def _error_response(self, e: Exception) -> Dict:
+        """Classify a Gemini API exception and build the error result."""
+        # Enhanced error logging with specific error detection
+        error_msg = str(e)
+        error_type = type(e).__name__
+        
+        # Detect specific error types
+        if "quota" in error_msg.lower() or "quota exceeded" in error_msg.lower():
+            error_detail = "Gemini API quota exceeded. Please check your API usage limits."
+            logger.error(f"Gemini API quota exceeded: {error_msg}")
+        elif "permission" in error_msg.lower() or "access" in error_msg.lower():
+            error_detail = "Gemini API access denied. Check API key permissions and IP restrictions."
+            logger.error(f"Gemini API access denied: {error_msg}")
+        elif "authentication" in error_msg.lower() or "invalid" in error_msg.lower():
+            error_detail = "Gemini API authentication failed. Check your API key."
+            logger.error(f"Gemini API authentication failed: {error_msg}")
+        elif "network" in error_msg.lower() or "connection" in error_msg.lower():
+            error_detail = "Network connectivity issue. Check your internet connection."
+            logger.error(f"Network connectivity issue: {error_msg}")
+        elif "timeout" in error_msg.lower():
+            error_detail = "Gemini API request timed out. The service may be slow or unavailable."
+            logger.error(f"Gemini API timeout: {error_msg}")
+        else:
+            error_detail = f"Unexpected error: {error_msg}"
+            logger.error(f"Unexpected error in Gemini API: {error_msg}")
+        
+        # Log detailed error information
+        logger.error(f"Error type: {error_type}")
+        logger.error(f"Error details: {error_detail}")
+        logger.error(f"Full error: {error_msg}")
+        
+        return {
+            "error": error_detail,
+            "error_type": error_type,
+            "key_findings": "{}",
+            "confidence": 0.0,
+            "status": "error",
+            "debug_info": {
+                "original_error": error_msg,
+                "error_type": error_type,
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+        
+    def _default_field_structures(self) -> Dict[str, Dict]:
+        """Default (ABSENT) structure for each of the 6 required curation fields."""
+        return {
             "host_species": {
                 "primary": "Unknown",
                 "confidence": 0.0,
@@ -757,21 +864,27 @@ CRITICAL: If the paper contains ANY specific microbial taxa identification, abun
                 "suggestions_for_curation": "Review paper for sample size information"
             }
         }
+
+    def _normalize_field(self, field_name: str, field_data, default_structure: Dict) -> Dict:
+        """Ensure a single field has the required structure, filling in missing keys."""
+        if not isinstance(field_data, dict):
+            return default_structure.copy()
+        # Merge with default structure to ensure all required keys exist
+        for key, default_value in default_structure.items():
+            if key not in field_data:
+                field_data[key] = default_value
+        return field_data
+
+    def _validate_and_normalize_json(self, parsed_json: Dict) -> Dict:
+        """
+        Validate and normalize the JSON structure to ensure all required fields are present.
+        """
+        # Define the required field structure
+        required_fields = self._default_field_structures()
         
         # Ensure all required fields exist with proper structure
         for field_name, default_structure in required_fields.items():
-            if field_name not in parsed_json:
-                parsed_json[field_name] = default_structure.copy()
-            else:
-                # Ensure the field has the required structure
-                field_data = parsed_json[field_name]
-                if not isinstance(field_data, dict):
-                    parsed_json[field_name] = default_structure.copy()
-                else:
-                    # Merge with default structure to ensure all required keys exist
-                    for key, default_value in default_structure.items():
-                        if key not in field_data:
-                            field_data[key] = default_value
+            parsed_json[field_name] = self._normalize_field(field_name, parsed_json.get(field_name), default_structure)
         
         # Add curation readiness assessment
         curation_ready = all(
@@ -932,7 +1045,8 @@ CRITICAL: If the paper contains ANY specific microbial taxa identification, abun
                 "If the user provides a paper context, use it to inform your answer."
             )
             model = genai.GenerativeModel(self.model)
-            response = await model.generate_content_async(f"{chat_prompt}\nUser: {prompt}")
+            with _log_gemini_call("chat"):
+                response = await model.generate_content_async(f"{chat_prompt}\nUser: {prompt}")
             reply = response.text.strip()
             confidence = 1.0 if reply else 0.0
             return {
@@ -0,0 +1,308 @@
+"""
+Optimized CPU Inference Backends
+
+Provides drop-in replacements for the fp32 PyTorch SciBERT encoder and
+MicrobeSigClassifier on CPU-only hosts: dynamic int8 quantization of the Linear
+layers, or an ONNX export run with ONNX Runtime. Every optimized model is checked
+against the fp32 model on sample inputs and discarded if its outputs drift beyond
+the configured tolerance.
+"""
+
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Tuple
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.models.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# Texts used to compare the optimized encoder against fp32
+PARITY_TEXTS = [
+    "16S rRNA gene sequencing of fecal samples revealed decreased Bacteroides in patients.",
+    "Shotgun metagenomics of the oral microbiome in mice fed a high-fat diet.",
+    "Differential abundance analysis identified Faecalibacterium prausnitzii as depleted in "
+    "Crohn's disease compared with healthy controls across two independent cohorts.",
+    "Skin swabs were collected from 120 participants.",
+]
+
+
+def quantize_dynamic(model: nn.Module) -> nn.Module:
+    """Quantize the Linear layers of a model to int8 weights with dynamic activations.
+
+    Args:
+        model: fp32 model on CPU
+
+    Returns:
+        Quantized copy of the model
+    """
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def relative_error(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Relative L2 (Frobenius) error of candidate outputs against reference outputs."""
+    reference = reference.astype(np.float64)
+    candidate = candidate.astype(np.float64)
+    return float(np.linalg.norm(reference - candidate) / max(np.linalg.norm(reference), 1e-12))
+
+
+def check_parity(
+    reference_fn: Callable[[], Dict[str, np.ndarray]],
+    candidate_fn: Callable[[], Dict[str, np.ndarray]],
+    tolerance: float
+) -> Tuple[bool, float]:
+    """Compare the outputs of an optimized model against the fp32 model.
+
+    Args:
+        reference_fn: Returns the fp32 outputs by name
+        candidate_fn: Returns the optimized outputs by name
+        tolerance: Maximum allowed relative error for any output
+
+    Returns:
+        Tuple of (whether all outputs are within tolerance, largest relative error)
+    """
+    reference = reference_fn()
+    candidate = candidate_fn()
+    error = max(relative_error(reference[name], candidate[name]) for name in reference)
+    return error <= tolerance, error
+
+
+class ONNXEncoder:
+    """ONNX Runtime session that stands in for a Hugging Face encoder model."""
+
+    def __init__(self, path: Path, model_config):
+        self.session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        self.config = model_config
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> SimpleNamespace:
+        (last_hidden_state,) = self.session.run(
+            ["last_hidden_state"],
+            {
+                "input_ids": input_ids.cpu().numpy().astype(np.int64),
+                "attention_mask": attention_mask.cpu().numpy().astype(np.int64)
+            }
+        )
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(last_hidden_state))
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+class ONNXClassifier:
+    """ONNX Runtime session that stands in for MicrobeSigClassifier."""
+
+    OUTPUTS = ["signature", "sequencing", "body_site"]
+
+    def __init__(self, path: Path):
+        self.session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+
+    def __call__(self, embeddings: torch.Tensor, features: torch.Tensor) -> Dict[str, torch.Tensor]:
+        outputs = self.session.run(
+            self.OUTPUTS,
+            {
+                "embeddings": embeddings.cpu().numpy().astype(np.float32),
+                "features": features.cpu().numpy().astype(np.float32)
+            }
+        )
+        return {name: torch.from_numpy(output) for name, output in zip(self.OUTPUTS, outputs)}
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+def export_encoder_onnx(model: nn.Module, tokenizer, path: Path) -> Path:
+    """Export a Hugging Face encoder to ONNX with dynamic batch and sequence axes.
+
+    Args:
+        model: fp32 encoder on CPU
+        tokenizer: Matching tokenizer, used to build example inputs
+        path: Output .onnx file
+
+    Returns:
+        Path of the exported model
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    example = tokenizer(PARITY_TEXTS[:2], padding=True, return_tensors="pt")
+
+    class _Wrapper(nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    torch.onnx.export(
+        _Wrapper(model).eval(),
+        (example["input_ids"], example["attention_mask"]),
+        str(path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"}
+        },
+        opset_version=17
+    )
+    return path
+
+
+def export_classifier_onnx(model: nn.Module, path: Path, num_features: int = 3) -> Path:
+    """Export MicrobeSigClassifier to ONNX with a dynamic batch axis.
+
+    Args:
+        model: fp32 classifier on CPU
+        path: Output .onnx file
+        num_features: Number of additional features the classifier takes
+
+    Returns:
+        Path of the exported model
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    class _Wrapper(nn.Module):
+        def __init__(self, classifier):
+            super().__init__()
+            self.classifier = classifier
+
+        def forward(self, embeddings, features):
+            outputs = self.classifier(embeddings, features)
+            return tuple(outputs[name] for name in ONNXClassifier.OUTPUTS)
+
+    torch.onnx.export(
+        _Wrapper(model).eval(),
+        (torch.zeros(2, model.embedding_dim), torch.zeros(2, num_features)),
+        str(path),
+        input_names=["embeddings", "features"],
+        output_names=ONNXClassifier.OUTPUTS,
+        dynamic_axes={name: {0: "batch"} for name in ["embeddings", "features"] + ONNXClassifier.OUTPUTS},
+        opset_version=17
+    )
+    return path
+
+
+def optimize_encoder(model: nn.Module, tokenizer, model_config: ModelConfig, name: str = "encoder"):
+    """Build the configured inference backend for a SciBERT encoder.
+
+    Falls back to the fp32 model when the backend is unavailable, fails to build
+    or does not pass the parity check.
+
+    Args:
+        model: fp32 encoder on CPU
+        tokenizer: Matching tokenizer
+        model_config: Configuration selecting the backend and parity tolerance
+        name: File name stem for the ONNX export
+
+    Returns:
+        Model to use for inference
+    """
+    backend = model_config.inference_backend
+    if backend == "torch":
+        return model
+
+    model.eval()
+    sample = tokenizer(PARITY_TEXTS, padding=True, truncation=True, return_tensors="pt")
+
+    def run(encoder) -> Dict[str, np.ndarray]:
+        with torch.inference_mode():
+            outputs = encoder(input_ids=sample["input_ids"], attention_mask=sample["attention_mask"])
+        # Compare the [CLS] vectors actually used as document embeddings
+        return {"cls": outputs.last_hidden_state[:, 0, :].float().numpy()}
+
+    try:
+        if backend == "quantized":
+            candidate = quantize_dynamic(model)
+        elif backend == "onnx":
+            if not ONNXRUNTIME_AVAILABLE:
+                logger.warning("onnxruntime is not installed; using fp32 PyTorch inference")
+                return model
+            path = export_encoder_onnx(model, tokenizer, Path(model_config.onnx_dir) / f"{name}.onnx")
+            candidate = ONNXEncoder(path, model.config)
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+    except Exception as e:
+        logger.error(f"Failed to build {backend} encoder: {str(e)}; using fp32 PyTorch inference")
+        return model
+
+    ok, error = check_parity(lambda: run(model), lambda: run(candidate), model_config.parity_tolerance)
+    if not ok:
+        logger.warning(
+            f"{backend} encoder failed parity check (relative error {error:.4f} > "
+            f"{model_config.parity_tolerance}); using fp32 PyTorch inference"
+        )
+        return model
+
+    logger.info(f"Using {backend} encoder for inference (relative error {error:.4f})")
+    return candidate
+
+
+def optimize_classifier(model: nn.Module, model_config: ModelConfig, sample: Tuple[torch.Tensor, torch.Tensor]):
+    """Build the configured inference backend for MicrobeSigClassifier.
+
+    Falls back to the fp32 model when the backend is unavailable, fails to build
+    or does not pass the parity check.
+
+    Args:
+        model: Trained fp32 classifier on CPU
+        model_config: Configuration selecting the backend and parity tolerance
+        sample: (embeddings, features) of representative papers for the parity
+            check, such as a held-out batch; features must be in their real ranges,
+            since int8 error on a raw publication year (~2020) differs from [0, 1) inputs
+
+    Returns:
+        Model to use for inference
+    """
+    backend = model_config.inference_backend
+    if backend == "torch":
+        return model
+
+    model.eval()
+    embeddings, features = (tensor.cpu().float() for tensor in sample)
+    num_features = features.shape[1]
+
+    def run(classifier) -> Dict[str, np.ndarray]:
+        with torch.inference_mode():
+            outputs = classifier(embeddings, features)
+        return {name: output.float().numpy() for name, output in outputs.items()}
+
+    try:
+        if backend == "quantized":
+            candidate = quantize_dynamic(model)
+        elif backend == "onnx":
+            if not ONNXRUNTIME_AVAILABLE:
+                logger.warning("onnxruntime is not installed; using fp32 PyTorch inference")
+                return model
+            path = export_classifier_onnx(model, Path(model_config.onnx_dir) / "classifier.onnx", num_features)
+            candidate = ONNXClassifier(path)
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+    except Exception as e:
+        logger.error(f"Failed to build {backend} classifier: {str(e)}; using fp32 PyTorch inference")
+        return model
+
+    ok, error = check_parity(lambda: run(model), lambda: run(candidate), model_config.parity_tolerance)
+    if not ok:
+        logger.warning(
+            f"{backend} classifier failed parity check (relative error {error:.4f} > "
+            f"{model_config.parity_tolerance}); using fp32 PyTorch inference"
+        )
+        return model
+
+    logger.info(f"Using {backend} classifier for inference (relative error {error:.4f})")
+    return candidate
@@ -1,17 +1,59 @@
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional, Tuple
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 import numpy as np
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 from app.utils.utils import config, get_sequencing_types, get_body_sites
+from app.models.config import ModelConfig
+from app.models.inference import optimize_classifier
 
 logger = logging.getLogger(__name__)
 
+# Additional per-paper features, in the order the classifier expects them
+FEATURE_NAMES = ["has_full_text", "publication_year", "is_research_article"]
+# Value range of each feature, for synthetic inputs to inference parity checks
+FEATURE_RANGES = {"has_full_text": (0, 1), "publication_year": (1990, 2025), "is_research_article": (0, 1)}
+
+def features_to_tensor(additional_features: List[Dict]) -> torch.Tensor:
+    """Convert additional feature dictionaries to the classifier's feature tensor.
+    
+    Args:
+        additional_features: List of additional feature dictionaries
+        
+    Returns:
+        Float tensor of shape (num_papers, len(FEATURE_NAMES))
+    """
+    return torch.tensor(
+        [[features[name] for name in FEATURE_NAMES] for features in additional_features],
+        dtype=torch.float32
+    ).reshape(len(additional_features), len(FEATURE_NAMES))
+
+def synthetic_features(num_papers: int, generator: Optional[torch.Generator] = None) -> torch.Tensor:
+    """Random feature rows with each feature drawn from its real (integer) range.
+    
+    Args:
+        num_papers: Number of rows
+        generator: Optional random generator
+        
+    Returns:
+        Float tensor of shape (num_papers, len(FEATURE_NAMES))
+    """
+    columns = [
+        torch.randint(low, high + 1, (num_papers,), generator=generator)
+        for low, high in (FEATURE_RANGES[name] for name in FEATURE_NAMES)
+    ]
+    return torch.stack(columns, dim=1).float()
+
 class PaperDataset(Dataset):
-    """Dataset class for paper classification."""
+    """Dataset class for paper classification.
+    
+    Embeddings, features and labels are stacked into tensors once, and items are
+    sliced from them by index. Indexing with a list of indices returns a whole
+    batch, which make_loader uses to skip per-item collation.
+    """
     
     def __init__(
         self,
@@ -26,24 +68,23 @@ class PaperDataset(Dataset):
             additional_features: List of additional feature dictionaries
             labels: Optional dictionary of label tensors
         """
-        self.embeddings = embeddings
+        self.embeddings = embeddings.float().contiguous()
         
         # Convert additional features to tensor
-        feature_list = []
-        for features in additional_features:
-            feature_list.append([
-                features["has_full_text"],
-                features["publication_year"],
-                features["is_research_article"]
-            ])
-        self.features = torch.tensor(feature_list, dtype=torch.float32)
+        self.features = features_to_tensor(additional_features)
         
         self.labels = labels
+        if self.labels is not None:
+            self.labels = {k: v.contiguous() for k, v in labels.items()}
         
     def __len__(self) -> int:
         return len(self.embeddings)
         
-    def __getitem__(self, idx: int) -> Tuple:
+    def __getitem__(self, idx) -> Dict[str, torch.Tensor]:
+        """Get one paper (integer index) or a batch of papers (list of indices)."""
+        if not isinstance(idx, int):
+            idx = torch.as_tensor(idx, dtype=torch.long)
+            
         item = {
             "embeddings": self.embeddings[idx],
             "features": self.features[idx]
@@ -53,6 +94,61 @@ class PaperDataset(Dataset):
             item.update({k: v[idx] for k, v in self.labels.items()})
             
         return item
+    
+    def subset(self, indices) -> "PaperDataset":
+        """Create a dataset holding a contiguous copy of the given papers.
+        
+        Args:
+            indices: Indices of the papers to keep
+            
+        Returns:
+            PaperDataset over the selected papers
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        subset = PaperDataset.__new__(PaperDataset)
+        subset.embeddings = self.embeddings[indices]
+        subset.features = self.features[indices]
+        subset.labels = None if self.labels is None else {k: v[indices] for k, v in self.labels.items()}
+        return subset
+
+def make_loader(
+    dataset: PaperDataset,
+    batch_size: Optional[int] = None,
+    shuffle: bool = False,
+    num_workers: Optional[int] = None,
+    pin_memory: Optional[bool] = None,
+    prefetch_factor: Optional[int] = None
+) -> DataLoader:
+    """Create a DataLoader that slices whole batches from a PaperDataset.
+    
+    A BatchSampler hands the dataset lists of indices, so each batch is a single
+    tensor slice per field instead of batch_size item dicts collated together.
+    
+    Args:
+        dataset: Paper dataset
+        batch_size: Papers per batch (defaults to config.BATCH_SIZE)
+        shuffle: Whether to shuffle every epoch
+        num_workers: Loader worker processes (defaults to config.NUM_WORKERS)
+        pin_memory: Pin batches for faster GPU transfer (defaults to config.PIN_MEMORY,
+            only applied when CUDA is available)
+        prefetch_factor: Batches prefetched per worker (defaults to config.PREFETCH_FACTOR)
+        
+    Returns:
+        DataLoader yielding batch dictionaries
+    """
+    num_workers = config.NUM_WORKERS if num_workers is None else num_workers
+    pin_memory = config.PIN_MEMORY if pin_memory is None else pin_memory
+    
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size or config.BATCH_SIZE, drop_last=False),
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=pin_memory and torch.cuda.is_available(),
+        persistent_workers=num_workers > 0,
+        prefetch_factor=(prefetch_factor or config.PREFETCH_FACTOR) if num_workers > 0 else None
+    )
 
 class MicrobeSigClassifier(nn.Module):
     """Neural network for paper classification."""
@@ -123,17 +219,25 @@ class ModelTrainer:
     def __init__(
         self,
         model: MicrobeSigClassifier,
-        device: torch.device = None
+        device: torch.device = None,
+        model_config: Optional[ModelConfig] = None
     ):
         """Initialize the trainer.
         
         Args:
             model: Model to train
             device: Device to use for training
+            model_config: Optional model configuration selecting a CPU inference backend
         """
         self.model = model
         self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = self.model.to(self.device)
+        self.model_config = model_config
+        
+        # Optimized copy used by predict(); rebuilt after training
+        self._inference_model = None
+        # Validation batch kept from training for the optimized model's parity check
+        self._holdout: Optional[Tuple[torch.Tensor, torch.Tensor]] = None
         
         # Loss functions
         self.signature_criterion = nn.BCELoss()
@@ -159,14 +263,14 @@ class ModelTrainer:
         
         for batch in train_loader:
             # Move batch to device
-            batch = {k: v.to(self.device) for k, v in batch.items()}
+            batch = {k: v.to(self.device, non_blocking=True) for k, v in batch.items()}
             
             # Forward pass
             outputs = self.model(batch["embeddings"], batch["features"])
             
             # Calculate losses
             signature_loss = self.signature_criterion(
-                outputs["signature"].squeeze(),
+                outputs["signature"].squeeze(-1),
                 batch["signature_label"]
             )
             
@@ -213,13 +317,13 @@ class ModelTrainer:
         
         for batch in val_loader:
             # Move batch to device
-            batch = {k: v.to(self.device) for k, v in batch.items()}
+            batch = {k: v.to(self.device, non_blocking=True) for k, v in batch.items()}
             
             # Forward pass
             outputs = self.model(batch["embeddings"], batch["features"])
             
             # Collect predictions and labels
-            all_signature_preds.extend(outputs["signature"].squeeze().cpu().numpy())
+            all_signature_preds.extend(outputs["signature"].squeeze(-1).cpu().numpy())
             all_signature_labels.extend(batch["signature_label"].cpu().numpy())
             
             all_sequencing_preds.extend(outputs["sequencing"].argmax(dim=1).cpu().numpy())
@@ -301,6 +405,12 @@ class ModelTrainer:
                 f"Sequencing F1: {val_metrics['sequencing_f1']:.4f} - "
                 f"Body Site F1: {val_metrics['body_site_f1']:.4f}"
             )
+        
+        # Weights changed, so any optimized inference model is stale
+        self._inference_model = None
+        holdout = next(iter(val_loader), None)
+        if holdout is not None:
+            self._holdout = (holdout["embeddings"].cpu(), holdout["features"].cpu())
             
         return history
         
@@ -326,13 +436,51 @@ class ModelTrainer:
         features = features.to(self.device)
         
         # Forward pass
-        outputs = self.model(embeddings, features)
+        outputs = self._get_inference_model(embeddings, features)(embeddings, features)
         
         # Convert outputs to numpy arrays
         predictions = {
-            "signature": outputs["signature"].squeeze().cpu().numpy(),
+            "signature": outputs["signature"].squeeze(-1).cpu().numpy(),
             "sequencing": outputs["sequencing"].argmax(dim=1).cpu().numpy(),
             "body_site": outputs["body_site"].argmax(dim=1).cpu().numpy()
         }
         
-        return predictions
\ No newline at end of file
+        return predictions
+    
+    def _get_inference_model(self, embeddings: torch.Tensor, features: torch.Tensor):
+        """Model used for prediction: the configured CPU backend, or the fp32 model.
+        
+        The backend is built on the first prediction and checked for parity on that
+        batch, the validation batch kept from training and, up to 32 rows, synthetic
+        papers with features in their real ranges.
+        """
+        if self.model_config is None or self.model_config.inference_backend == "torch" or self.device.type != "cpu":
+            return self.model
+        
+        if self._inference_model is None:
+            self.model.eval()
+            self._inference_model = optimize_classifier(
+                self.model, self.model_config, self._parity_sample(embeddings, features)
+            )
+        return self._inference_model
+    
+    def _parity_sample(
+        self,
+        embeddings: torch.Tensor,
+        features: torch.Tensor,
+        min_rows: int = 32
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Representative (embeddings, features) for the inference parity check."""
+        sample_embeddings, sample_features = [embeddings.cpu().float()], [features.cpu().float()]
+        if self._holdout is not None:
+            sample_embeddings.append(self._holdout[0].float())
+            sample_features.append(self._holdout[1].float())
+        
+        rows = sum(len(part) for part in sample_embeddings)
+        if rows < min_rows:
+            generator = torch.Generator().manual_seed(0)
+            # Synthetic embeddings on the scale of the real ones
+            scale = torch.cat(sample_embeddings).std().item() if rows > 1 else 1.0
+            sample_embeddings.append(torch.randn(min_rows - rows, embeddings.shape[1], generator=generator) * scale)
+            sample_features.append(synthetic_features(min_rows - rows, generator))
+        return torch.cat(sample_embeddings), torch.cat(sample_features)
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Dict, List, Optional, Union
 from .gemini_qa import GeminiQA
 
 logger = logging.getLogger(__name__)
@@ -82,4 +82,21 @@ class UnifiedQA:
                 "error": "No enhanced analysis available",
                 "key_findings": "{}",
                 "confidence": 0.0
-            } 
\ No newline at end of file
+            }
+
+    async def analyze_paper_enhanced_stream(self, prompt: str) -> AsyncIterator[Dict]:
+        """
+        Streaming enhanced analysis that yields each curation field as it completes.
+        """
+        if self.use_gemini and self.qa_system:
+            async for event in self.qa_system.analyze_paper_enhanced_stream(prompt):
+                yield event
+        else:
+            yield {
+                "type": "complete",
+                "analysis": {
+                    "error": "No enhanced analysis available",
+                    "key_findings": "{}",
+                    "confidence": 0.0
+                }
+            }
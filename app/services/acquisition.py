@@ -0,0 +1,163 @@
+import json
+import logging
+import concurrent.futures
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import torch
+
+from app.services.data_retrieval import PubMedRetriever, RateLimiter
+from app.services.embedding_store import EmbeddingStore
+from app.services.preprocessing import TextPreprocessor
+from app.utils.utils import config
+from app.utils.config import NCBI_RATE_LIMIT_DELAY
+
+logger = logging.getLogger(__name__)
+
+class AcquisitionPipeline:
+    """Resumable acquisition of training data (metadata, full text, embeddings).
+
+    Papers are fetched concurrently by a thread pool, with every E-utilities request
+    going through one RateLimiter shared by the threads, and embedded in batches as they arrive. Embeddings
+    are kept in the preprocessor's embedding store (keyed by text), then each paper
+    is recorded in a JSON lines manifest with the key of its text; a re-run skips
+    every paper already recorded as done, so an interrupted run loses at most one
+    unembedded batch.
+    """
+
+    MANIFEST_FILE = "manifest.jsonl"
+
+    def __init__(
+        self,
+        retriever: PubMedRetriever,
+        preprocessor: TextPreprocessor,
+        work_dir: Path,
+        max_workers: Optional[int] = None,
+        embed_batch_size: int = 64
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            retriever: PubMed data retriever
+            preprocessor: Text preprocessor used for embeddings; it must have an
+                embedding store, which holds the acquired embeddings
+            work_dir: Directory holding the manifest
+            max_workers: Concurrent fetch threads (defaults to config.ACQUISITION_WORKERS)
+            embed_batch_size: Papers embedded (and checkpointed) together
+        """
+        if preprocessor.embedding_store is None:
+            raise ValueError("AcquisitionPipeline needs a TextPreprocessor with an embedding store")
+        self.retriever = retriever
+        if retriever.rate_limiter is None:
+            retriever.rate_limiter = RateLimiter(1.0 / NCBI_RATE_LIMIT_DELAY)
+        self.preprocessor = preprocessor
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers or config.ACQUISITION_WORKERS
+        self.embed_batch_size = embed_batch_size
+
+        self.manifest_path = self.work_dir / self.MANIFEST_FILE
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """Latest manifest record of every paper, ignoring a partially written last line."""
+        records = {}
+        if not self.manifest_path.exists():
+            return records
+        with open(self.manifest_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["pmid"]] = record
+        return records
+
+    def _append_manifest(self, records: List[Dict]):
+        with open(self.manifest_path, 'a') as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.flush()
+
+    def _fetch(self, pmid: str) -> Tuple[Dict, Optional[str]]:
+        """Retrieve metadata and full text for a paper (runs in a worker thread)."""
+        metadata = self.retriever.get_paper_metadata(pmid)
+        full_text = self.retriever.get_pmc_fulltext(pmid)
+        return metadata, full_text
+
+    def _is_done(self, record: Dict) -> bool:
+        """Whether a manifest record is complete and its embedding is still stored."""
+        return record.get("status") == "done" and record.get("text_key") in self.preprocessor.embedding_store
+
+    def _embed_batch(self, batch: List[Tuple[str, Dict, Optional[str]]]):
+        """Embed fetched papers into the preprocessor's store, then checkpoint them."""
+        text_keys = [
+            EmbeddingStore.text_key(self.preprocessor.paper_text(metadata, full_text))
+            for _, metadata, full_text in batch
+        ]
+        # prepare_batch stores the embeddings first: a crash before the manifest
+        # write only re-fetches this batch, whose embeddings are then store hits
+        _, additional_features = self.preprocessor.prepare_batch(
+            [metadata for _, metadata, _ in batch],
+            [full_text for _, _, full_text in batch]
+        )
+        self._append_manifest([
+            {"pmid": pmid, "status": "done", "text_key": text_key, "features": features}
+            for (pmid, _, _), text_key, features in zip(batch, text_keys, additional_features)
+        ])
+
+    def run(self, pmids: List[str]) -> Dict[str, int]:
+        """Acquire and embed every paper not yet completed.
+
+        Args:
+            pmids: PMIDs to acquire
+
+        Returns:
+            Counts of papers skipped (already done), completed and failed in this run
+        """
+        manifest = self.load_manifest()
+        pending = [pmid for pmid in dict.fromkeys(pmids) if not self._is_done(manifest.get(pmid, {}))]
+        counts = {"skipped": len(set(pmids)) - len(pending), "completed": 0, "failed": 0}
+        logger.info(f"Acquiring {len(pending)} papers ({counts['skipped']} already done)")
+
+        batch = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._fetch, pmid): pmid for pmid in pending}
+            for future in concurrent.futures.as_completed(futures):
+                pmid = futures[future]
+                try:
+                    metadata, full_text = future.result()
+                except Exception as e:
+                    logger.error(f"Error acquiring PMID {pmid}: {str(e)}")
+                    self._append_manifest([{"pmid": pmid, "status": "failed", "error": str(e)}])
+                    counts["failed"] += 1
+                    continue
+
+                batch.append((pmid, metadata, full_text))
+                if len(batch) >= self.embed_batch_size:
+                    self._embed_batch(batch)
+                    counts["completed"] += len(batch)
+                    batch = []
+                    logger.info(f"Acquired {counts['completed']}/{len(pending)} papers")
+
+            if batch:
+                self._embed_batch(batch)
+                counts["completed"] += len(batch)
+
+        logger.info(f"Acquisition finished: {counts}")
+        return counts
+
+    def load(self, pmids: List[str]) -> Tuple[List[str], torch.Tensor, List[Dict]]:
+        """Load the acquired embeddings and features of completed papers.
+
+        Args:
+            pmids: PMIDs wanted, in order
+
+        Returns:
+            Tuple of (PMIDs that were acquired, embeddings tensor, additional features)
+        """
+        manifest = self.load_manifest()
+        done = [pmid for pmid in dict.fromkeys(pmids) if self._is_done(manifest.get(pmid, {}))]
+        if not done:
+            return [], torch.empty(0), []
+
+        vectors, _ = self.preprocessor.stored_embeddings([manifest[pmid]["text_key"] for pmid in done])
+        return done, torch.from_numpy(np.ascontiguousarray(vectors)), [manifest[pmid]["features"] for pmid in done]
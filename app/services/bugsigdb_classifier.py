@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
 import json
 import logging
 from pathlib import Path
@@ -8,12 +9,16 @@ from typing import Dict, List, Optional, Tuple
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
 import numpy as np
 
 from app.services.preprocessing import TextPreprocessor
-from app.models.model import MicrobeSigClassifier, ModelTrainer, PaperDataset
-from app.utils.utils import config, get_sequencing_types, get_body_sites, format_prediction_output
+from app.models.model import MicrobeSigClassifier, ModelTrainer, PaperDataset, make_loader
+from app.models.config import ModelConfig, INFERENCE_BACKENDS
+from app.services.acquisition import AcquisitionPipeline
+from app.services.classification_service import ClassificationService
+from app.services.data_retrieval import PubMedRetriever
+from app.utils.utils import config, get_sequencing_types, get_body_sites
 
 # Configure logging
 logging.basicConfig(
@@ -47,14 +52,20 @@ def save_predictions(predictions: List[Dict], output_path: str):
 def train_model(
     retriever,
     preprocessor: TextPreprocessor,
-    model_path: Optional[str] = None
+    model_path: Optional[str] = None,
+    work_dir: Optional[Path] = None
 ) -> MicrobeSigClassifier:
     """Train the classification model.
     
+    Training data is acquired through a resumable AcquisitionPipeline: papers are
+    fetched concurrently and embedded incrementally, so an interrupted run can be
+    restarted with the same work_dir and skips papers already acquired.
+    
     Args:
         retriever: PubMed data retriever
         preprocessor: Text preprocessor
         model_path: Optional path to save model
+        work_dir: Directory for acquisition checkpoints (defaults to data/training)
         
     Returns:
         Trained model
@@ -71,22 +82,16 @@ def train_model(
     all_pmids = positive_pmids + negative_pmids
     np.random.shuffle(all_pmids)
     
-    # Create labels
-    signature_labels = torch.tensor([1] * len(positive_pmids) + [0] * len(negative_pmids))
-    
-    # Get metadata and full texts
-    metadata_list = []
-    full_texts = []
-    
-    for pmid in all_pmids:
-        metadata = retriever.get_paper_metadata(pmid)
-        full_text = retriever.get_pmc_fulltext(pmid)
-        
-        metadata_list.append(metadata)
-        full_texts.append(full_text)
+    # Get metadata, full texts and embeddings (resumes from earlier runs)
+    pipeline = AcquisitionPipeline(retriever, preprocessor, work_dir or config.DATA_DIR / "training")
+    pipeline.run(all_pmids)
+    all_pmids, embeddings, additional_features = pipeline.load(all_pmids)
+    if not all_pmids:
+        raise RuntimeError("No training papers could be acquired")
     
-    # Prepare features
-    embeddings, additional_features = preprocessor.prepare_batch(metadata_list, full_texts)
+    # Create labels for the papers that were acquired
+    positive_set = set(positive_pmids)
+    signature_labels = torch.tensor([float(pmid in positive_set) for pmid in all_pmids])
     
     # Create random labels for sequencing type and body site (for demonstration)
     # In practice, these would come from labeled data
@@ -107,24 +112,13 @@ def train_model(
     
     # Split into train and validation sets
     train_size = int(0.8 * len(dataset))
-    val_size = len(dataset) - train_size
-    
-    train_dataset, val_dataset = torch.utils.data.random_split(
-        dataset,
-        [train_size, val_size]
-    )
+    permutation = torch.randperm(len(dataset))
+    train_dataset = dataset.subset(permutation[:train_size])
+    val_dataset = dataset.subset(permutation[train_size:])
     
     # Create data loaders
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=config.BATCH_SIZE,
-        shuffle=True
-    )
-    
-    val_loader = DataLoader(
-        val_dataset,
-        batch_size=config.BATCH_SIZE
-    )
+    train_loader = make_loader(train_dataset, shuffle=True)
+    val_loader = make_loader(val_dataset)
     
     # Initialize and train model
     model = MicrobeSigClassifier()
@@ -144,59 +138,50 @@ def predict_papers(
     pmids: List[str],
     model: MicrobeSigClassifier,
     retriever,
-    preprocessor: TextPreprocessor
+    preprocessor: TextPreprocessor,
+    model_config: Optional[ModelConfig] = None,
+    batch_size: Optional[int] = None,
+    batch_window: Optional[float] = None,
+    max_concurrent: Optional[int] = None,
+    output_path: Optional[str] = None
 ) -> List[Dict]:
     """Make predictions for a list of papers.
     
+    Papers are retrieved concurrently and classified in micro-batches through
+    ClassificationService.
+    
     Args:
         pmids: List of PMIDs
         model: Trained model
         retriever: PubMed data retriever
         preprocessor: Text preprocessor
+        model_config: Optional model configuration selecting a CPU inference backend
+        batch_size: Maximum papers per inference batch
+        batch_window: Seconds to wait for an inference batch to fill
+        max_concurrent: Maximum concurrent paper retrievals
+        output_path: If a .jsonl path, predictions are appended there as they complete
+            (skipping PMIDs already in the file) and an empty list is returned
         
     Returns:
-        List of prediction dictionaries
+        List of prediction dictionaries, in input order
     """
-    # Get metadata and full texts
-    metadata_list = []
-    full_texts = []
-    
-    for pmid in pmids:
-        try:
-            metadata = retriever.get_paper_metadata(pmid)
-            full_text = retriever.get_pmc_fulltext(pmid)
-            
-            metadata_list.append(metadata)
-            full_texts.append(full_text)
-            
-        except Exception as e:
-            logger.error(f"Error processing PMID {pmid}: {str(e)}")
-            continue
-    
-    # Prepare features
-    embeddings, additional_features = preprocessor.prepare_batch(metadata_list, full_texts)
-    
-    # Make predictions
-    trainer = ModelTrainer(model)
-    predictions = trainer.predict(embeddings, torch.tensor(additional_features))
-    
-    # Format output
-    results = []
-    sequencing_types = get_sequencing_types()
-    body_sites = get_body_sites()
-    
-    for i, pmid in enumerate(pmids):
-        results.append(format_prediction_output(
-            pmid=pmid,
-            has_signature=bool(np.round(predictions["signature"][i])),
-            signature_probability=float(predictions["signature"][i]),
-            sequencing_type=sequencing_types[predictions["sequencing"][i]],
-            metadata={
-                "body_site": body_sites[predictions["body_site"][i]]
-            }
-        ))
-    
-    return results
+    service = ClassificationService(
+        model,
+        preprocessor,
+        retriever,
+        model_config=model_config,
+        batch_size=batch_size,
+        batch_window=batch_window,
+        max_concurrent=max_concurrent
+    )
+    try:
+        if output_path and str(output_path).endswith(".jsonl"):
+            # Stream results to disk as they complete (resumable)
+            asyncio.run(service.classify_to_file(pmids, Path(output_path)))
+            return []
+        return asyncio.run(service.classify_all(pmids))
+    finally:
+        service.close()
 
 def main():
     """Main function."""
@@ -215,7 +200,7 @@ def main():
         "--output",
         type=str,
         required=True,
-        help="Path for output JSON file"
+        help="Path for output JSON file (use .jsonl to stream results as they complete and resume interrupted runs)"
     )
     
     parser.add_argument(
@@ -237,33 +222,74 @@ def main():
         help="Use GPU if available"
     )
     
+    parser.add_argument(
+        "--batch_window",
+        type=float,
+        default=config.CLASSIFY_BATCH_WINDOW,
+        help="Seconds to wait for an inference batch to fill"
+    )
+    
+    parser.add_argument(
+        "--max_concurrent",
+        type=int,
+        default=config.CLASSIFY_MAX_CONCURRENT,
+        help="Maximum concurrent paper retrievals"
+    )
+    
+    parser.add_argument(
+        "--inference_backend",
+        type=str,
+        choices=INFERENCE_BACKENDS,
+        default="torch",
+        help="CPU inference backend (quantized/onnx fall back to torch if parity checks fail)"
+    )
+    
+    parser.add_argument(
+        "--work_dir",
+        type=str,
+        default=str(config.DATA_DIR / "training"),
+        help="Directory for training data checkpoints (re-running resumes from it)"
+    )
+    
     args = parser.parse_args()
     
     # Set batch size
     config.BATCH_SIZE = args.batch_size
     
     # Initialize components
+    model_config = ModelConfig(inference_backend=args.inference_backend)
     retriever = PubMedRetriever()
-    preprocessor = TextPreprocessor()
+    preprocessor = TextPreprocessor(model_config=model_config)
     
     # Load or train model
     if args.model_path and Path(args.model_path).exists():
         logger.info(f"Loading model from {args.model_path}")
         model = MicrobeSigClassifier()
-        model.load_state_dict(torch.load(args.model_path))
+        model.load_state_dict(torch.load(args.model_path, map_location="cpu"))
     else:
         logger.info("Training new model...")
-        model = train_model(retriever, preprocessor, args.model_path)
+        model = train_model(retriever, preprocessor, args.model_path, Path(args.work_dir))
     
     # Load PMIDs
     pmids = load_pmids(args.pmid_list)
     logger.info(f"Processing {len(pmids)} papers...")
     
     # Make predictions
-    predictions = predict_papers(pmids, model, retriever, preprocessor)
+    predictions = predict_papers(
+        pmids,
+        model,
+        retriever,
+        preprocessor,
+        model_config,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        max_concurrent=args.max_concurrent,
+        output_path=args.output
+    )
     
     # Save results
-    save_predictions(predictions, args.output)
+    if not args.output.endswith(".jsonl"):
+        save_predictions(predictions, args.output)
     logger.info(f"Results saved to {args.output}")
 
 if __name__ == "__main__":
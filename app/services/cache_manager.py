@@ -4,10 +4,11 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import logging
-import asyncio
 import concurrent.futures
 import time
 from app.utils.performance_logger import perf_logger
+from app.utils import tracing
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +32,8 @@ class CacheManager:
         """Get a database connection from the pool."""
         if self._connection_pool:
             return self._connection_pool.pop()
-        return sqlite3.connect(self.db_path)
+        # Pooled connections are reused by whichever executor thread takes them next
+        return sqlite3.connect(self.db_path, check_same_thread=False)
         
     def _return_connection(self, conn):
         """Return a connection to the pool."""
@@ -166,25 +168,27 @@ class CacheManager:
     
     async def get_analysis_result_async(self, pmid: str) -> Optional[Dict]:
         """Async version of get_analysis_result for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.get_analysis_result, pmid)
+        with tracer.span("cache.lookup", pmid=pmid, cache_type="analysis") as span:
+            result = await tracing.run_in_executor(self.get_analysis_result, pmid)
+            span.set_attribute("hit", result is not None)
+            return result
     
     async def store_analysis_result_async(self, pmid: str, analysis_data: Dict, metadata: Dict, 
                                         source: str = "gemini", confidence: float = 0.0, 
                                         curation_ready: bool = False) -> bool:
         """Async version of store_analysis_result for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.store_analysis_result, pmid, analysis_data, metadata, source, confidence, curation_ready)
+        with tracer.span("cache.write", pmid=pmid, cache_type="analysis"):
+            return await tracing.run_in_executor(self.store_analysis_result, pmid, analysis_data, metadata, source, confidence, curation_ready)
     
     async def store_metadata_async(self, pmid: str, metadata: Dict, source: str = "pubmed") -> bool:
         """Async version of store_metadata for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.store_metadata, pmid, metadata, source)
+        with tracer.span("cache.write", pmid=pmid, cache_type="metadata"):
+            return await tracing.run_in_executor(self.store_metadata, pmid, metadata, source)
     
     async def store_fulltext_async(self, pmid: str, fulltext: str, source: str = "pmc") -> bool:
         """Async version of store_fulltext for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.store_fulltext, pmid, fulltext, source)
+        with tracer.span("cache.write", pmid=pmid, cache_type="fulltext"):
+            return await tracing.run_in_executor(self.store_fulltext, pmid, fulltext, source)
     
     def store_metadata(self, pmid: str, metadata: Dict, source: str = "pubmed") -> bool:
         """Store paper metadata in cache."""
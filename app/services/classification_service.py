@@ -0,0 +1,336 @@
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import torch
+
+from app.models.config import ModelConfig
+from app.models.model import MicrobeSigClassifier, ModelTrainer, features_to_tensor
+from app.services.data_retrieval import PubMedRetriever
+from app.services.preprocessing import TextPreprocessor
+from app.utils.utils import config, get_sequencing_types, get_body_sites, format_prediction_output
+from app.utils.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+class ClassificationService:
+    """High-throughput MicrobeSigClassifier predictions for many papers.
+
+    Papers are retrieved concurrently (bounded by max_concurrent), then queued for a
+    single inference worker that collects them into micro-batches: a batch is run as
+    soon as it holds batch_size papers or batch_window seconds after its first paper
+    arrived. Embeddings go through the preprocessor's embedding store, so papers seen
+    before are not re-embedded.
+    """
+
+    def __init__(
+        self,
+        model: MicrobeSigClassifier,
+        preprocessor: TextPreprocessor,
+        retriever: PubMedRetriever,
+        model_config: Optional[ModelConfig] = None,
+        batch_size: Optional[int] = None,
+        batch_window: Optional[float] = None,
+        max_concurrent: Optional[int] = None
+    ):
+        """Initialize the service.
+
+        Args:
+            model: Trained classifier
+            preprocessor: Text preprocessor used for embeddings
+            retriever: PubMed data retriever
+            model_config: Optional model configuration selecting a CPU inference backend
+            batch_size: Maximum papers per inference batch (defaults to config.CLASSIFY_BATCH_SIZE)
+            batch_window: Seconds to wait for a batch to fill (defaults to config.CLASSIFY_BATCH_WINDOW)
+            max_concurrent: Maximum concurrent paper retrievals (defaults to config.CLASSIFY_MAX_CONCURRENT)
+        """
+        self.preprocessor = preprocessor
+        self.retriever = retriever
+        self.trainer = ModelTrainer(model, model_config=model_config)
+        self.batch_size = batch_size or config.CLASSIFY_BATCH_SIZE
+        self.batch_window = config.CLASSIFY_BATCH_WINDOW if batch_window is None else batch_window
+        self.max_concurrent = max_concurrent or config.CLASSIFY_MAX_CONCURRENT
+
+        self.sequencing_types = get_sequencing_types()
+        self.body_sites = get_body_sites()
+
+        # A single inference thread keeps model use serialized and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier")
+        loop_monitor.register_executor("classifier", self._executor)
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._fetch_semaphore = None
+
+    @classmethod
+    def from_model_path(
+        cls,
+        model_path: Optional[Path] = None,
+        preprocessor: Optional[TextPreprocessor] = None,
+        retriever: Optional[PubMedRetriever] = None,
+        model_config: Optional[ModelConfig] = None,
+        **kwargs
+    ) -> "ClassificationService":
+        """Create a service from saved classifier weights.
+
+        Args:
+            model_path: Path of the saved state dict (defaults to config.CLASSIFIER_MODEL_PATH)
+            preprocessor: Text preprocessor (a new one is created if omitted)
+            retriever: PubMed data retriever (a new one is created if omitted)
+            model_config: Optional model configuration selecting a CPU inference backend
+            **kwargs: Batching options passed to the constructor
+
+        Returns:
+            ClassificationService instance
+
+        Raises:
+            FileNotFoundError: If no trained model exists at the path
+        """
+        model_path = Path(model_path or config.CLASSIFIER_MODEL_PATH)
+        if not model_path.exists():
+            raise FileNotFoundError(f"No trained classifier found at {model_path}")
+
+        model = MicrobeSigClassifier()
+        model.load_state_dict(torch.load(model_path, map_location="cpu"))
+        logger.info(f"Loaded classifier from {model_path}")
+
+        return cls(
+            model,
+            preprocessor or TextPreprocessor(model_config=model_config),
+            retriever or PubMedRetriever(),
+            model_config=model_config,
+            **kwargs
+        )
+
+    def _ensure_worker(self):
+        """Start the batching worker on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._fetch_semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._worker = loop.create_task(self._batch_worker())
+
+    async def _fetch(self, pmid: str) -> Tuple[Dict, Optional[str]]:
+        """Retrieve metadata and full text for a paper."""
+        async with self._fetch_semaphore:
+            metadata, full_text = await asyncio.gather(
+                self.retriever.get_paper_metadata_async(pmid),
+                self.retriever.get_pmc_fulltext_async(pmid),
+                return_exceptions=True
+            )
+
+        if isinstance(metadata, Exception):
+            raise metadata
+        if isinstance(full_text, Exception):
+            logger.warning(f"Full text retrieval failed for PMID {pmid}: {str(full_text)}")
+            full_text = None
+        return metadata, full_text
+
+    async def classify(self, pmid: str) -> Dict:
+        """Classify a single paper.
+
+        Args:
+            pmid: PubMed ID
+
+        Returns:
+            Prediction dictionary with signature probability, sequencing type and body site
+        """
+        self._ensure_worker()
+        try:
+            metadata, full_text = await self._fetch(pmid)
+        except Exception as e:
+            logger.error(f"Error retrieving PMID {pmid}: {str(e)}")
+            return {"pmid": pmid, "status": "error", "error": f"Retrieval failed: {str(e)}"}
+
+        future = self._loop.create_future()
+        await self._queue.put((pmid, metadata, full_text, future))
+        return await future
+
+    async def classify_many(self, pmids: List[str]) -> AsyncIterator[Dict]:
+        """Classify papers, yielding each prediction as soon as it is ready.
+
+        Args:
+            pmids: List of PMIDs
+
+        Yields:
+            Prediction dictionaries, in completion order
+        """
+        tasks = [asyncio.ensure_future(self.classify(pmid)) for pmid in pmids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def classify_all(self, pmids: List[str]) -> List[Dict]:
+        """Classify papers and return the predictions in input order.
+
+        Args:
+            pmids: List of PMIDs
+
+        Returns:
+            List of prediction dictionaries
+        """
+        return list(await asyncio.gather(*(self.classify(pmid) for pmid in pmids)))
+
+    async def classify_to_file(self, pmids: List[str], output_path: Path) -> int:
+        """Classify papers, appending each prediction to a JSON lines file.
+
+        PMIDs already classified successfully are skipped, so an interrupted run can
+        be resumed with the same arguments. Papers that failed (status "error") are
+        retried: their rows are dropped from the file before the run, so each PMID
+        keeps only its latest result.
+
+        Args:
+            pmids: List of PMIDs
+            output_path: JSON lines output file
+
+        Returns:
+            Number of papers classified in this run
+        """
+        output_path = Path(output_path)
+        done = set()
+        if output_path.exists():
+            kept = []
+            dropped = 0
+            with open(output_path, 'r') as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                        pmid = result["pmid"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        dropped += 1
+                        continue
+                    if result.get("status") != "success" or pmid in done:
+                        dropped += 1
+                        continue
+                    done.add(pmid)
+                    kept.append(line if line.endswith("\n") else line + "\n")
+            if dropped:
+                # Rewrite without failed rows, atomically so an interruption loses nothing
+                tmp_path = output_path.with_name(output_path.name + ".tmp")
+                with open(tmp_path, 'w') as f:
+                    f.writelines(kept)
+                tmp_path.replace(output_path)
+                logger.info(f"Removed {dropped} failed, duplicate or unreadable rows from {output_path}")
+
+        remaining = [pmid for pmid in dict.fromkeys(pmids) if pmid not in done]
+        if done:
+            logger.info(f"Resuming: {len(done)} PMIDs already classified, {len(remaining)} remaining")
+
+        count = 0
+        with open(output_path, 'a') as f:
+            async for result in self.classify_many(remaining):
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                count += 1
+                if count % 100 == 0:
+                    logger.info(f"Classified {count}/{len(remaining)} papers")
+        return count
+
+    async def _batch_worker(self):
+        """Collect queued papers into micro-batches and run inference on them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0 and self._queue.empty():
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(timeout, 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            pmids, metadata_list, full_texts, futures = zip(*batch)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._predict_batch, list(pmids), list(metadata_list), list(full_texts)
+                )
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Classification of PMID {pmids[0]} failed: {str(e)}")
+                    results = [{"pmid": pmids[0], "status": "error", "error": str(e)}]
+                else:
+                    # Retry one paper at a time, so only the offending papers get an error
+                    logger.warning(f"Classification batch of {len(batch)} papers failed, retrying one at a time: {str(e)}")
+                    results = await loop.run_in_executor(
+                        self._executor, self._predict_each, list(pmids), list(metadata_list), list(full_texts)
+                    )
+
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _predict_batch(
+        self,
+        pmids: List[str],
+        metadata_list: List[Dict],
+        full_texts: List[Optional[str]]
+    ) -> List[Dict]:
+        """Embed and classify one batch of papers.
+
+        Args:
+            pmids: PMIDs of the batch
+            metadata_list: Paper metadata dictionaries
+            full_texts: Full texts (None where unavailable)
+
+        Returns:
+            Prediction dictionaries in batch order
+        """
+        embeddings, additional_features = self.preprocessor.prepare_batch(metadata_list, full_texts)
+        predictions = self.trainer.predict(embeddings, features_to_tensor(additional_features))
+
+        results = []
+        for i, (pmid, metadata) in enumerate(zip(pmids, metadata_list)):
+            signature_probability = float(predictions["signature"][i])
+            result = format_prediction_output(
+                pmid=pmid,
+                has_signature=signature_probability >= 0.5,
+                signature_probability=signature_probability,
+                sequencing_type=self.sequencing_types[predictions["sequencing"][i]],
+                metadata={
+                    "body_site": self.body_sites[predictions["body_site"][i]],
+                    "title": metadata.get("title", "")
+                }
+            )
+            result["status"] = "success"
+            results.append(result)
+        return results
+
+    def _predict_each(
+        self,
+        pmids: List[str],
+        metadata_list: List[Dict],
+        full_texts: List[Optional[str]]
+    ) -> List[Dict]:
+        """Classify papers one at a time, turning each failure into an error result.
+
+        Args:
+            pmids: PMIDs of the papers
+            metadata_list: Paper metadata dictionaries
+            full_texts: Full texts (None where unavailable)
+
+        Returns:
+            Prediction or error dictionaries in input order
+        """
+        results = []
+        for pmid, metadata, full_text in zip(pmids, metadata_list, full_texts):
+            try:
+                results.extend(self._predict_batch([pmid], [metadata], [full_text]))
+            except Exception as e:
+                logger.error(f"Classification of PMID {pmid} failed: {str(e)}")
+                results.append({"pmid": pmid, "status": "error", "error": str(e)})
+        return results
+
+    def close(self):
+        """Stop the batching worker and the inference thread."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,132 @@
+import csv
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Curated fields that can be suggested from similar papers
+SUGGESTED_FIELDS = ["host", "body_site", "condition", "sequencing_type", "taxa_level", "statistical_method"]
+
+class CuratedPapers:
+    """In-memory index of the BugSigDB curation export (data/full_dump.csv) by PMID.
+
+    The CSV is parsed once and re-read only when the file changes, so per-paper
+    lookups no longer scan the whole file.
+    """
+
+    def __init__(self, csv_path: Path):
+        """Initialize the index.
+
+        Args:
+            csv_path: Path of the BugSigDB CSV export
+        """
+        self.csv_path = Path(csv_path)
+        self._rows: Dict[str, Dict] = {}
+        self._mtime: Optional[float] = None
+        self._missing = False
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """(Re)load the CSV if it changed since it was last read."""
+        try:
+            mtime = self.csv_path.stat().st_mtime
+        except FileNotFoundError:
+            if not self._missing:
+                logger.warning(f"Curated papers file not found: {self.csv_path}")
+            self._rows, self._mtime, self._missing = {}, None, True
+            return
+        self._missing = False
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            rows = {}
+            with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
+                # Skip comment lines (starting with #) before the header
+                lines = (line for line in csvfile if not line.startswith('#'))
+                for row in csv.DictReader(lines):
+                    pmid = row.get('PMID')
+                    # Several signatures share a PMID; keep the first row, as before
+                    if pmid and pmid != 'NA' and pmid not in rows:
+                        rows[pmid] = row
+            self._rows = rows
+            self._mtime = mtime
+            logger.info(f"Loaded {len(rows)} curated papers from {self.csv_path}")
+
+    def pmids(self) -> List[str]:
+        """All PMIDs in the export."""
+        self._refresh()
+        return list(self._rows)
+
+    def row(self, pmid: str) -> Optional[Dict]:
+        """Raw CSV row of a paper, if curated."""
+        self._refresh()
+        return self._rows.get(pmid)
+
+    def get(self, pmid: str) -> Optional[Dict]:
+        """Curated metadata of a paper, if curated.
+
+        Args:
+            pmid: PubMed ID
+
+        Returns:
+            Dictionary of curated fields, or None if the paper is not in the export
+        """
+        row = self.row(pmid)
+        if row is None:
+            return None
+
+        # Combine both group sample sizes if present
+        group0 = row.get('Group 0 sample size', '')
+        group1 = row.get('Group 1 sample size', '')
+        sample_size = f"Group 0: {group0}, Group 1: {group1}" if group0 or group1 else ''
+        return {
+            'pmid': row.get('PMID', ''),
+            'title': row.get('Title', ''),
+            'authors': row.get('Authors list', ''),
+            'journal': row.get('Journal', ''),
+            'year': row.get('Year', ''),
+            'host': row.get('Host species', ''),
+            'body_site': row.get('Body site', ''),
+            'condition': row.get('Condition', ''),
+            'sequencing_type': row.get('Sequencing type', ''),
+            'in_bugsigdb': row.get('In BugSigDB', ''),
+            'sample_size': sample_size,
+            'taxa_level': row.get('Taxa Level', ''),
+            'statistical_method': row.get('Statistical test', ''),
+            'doi': row.get('DOI', ''),
+            'publication_date': row.get('Publication Date', ''),
+            'signature_probability': row.get('Signature Probability', ''),
+        }
+
+def suggest_fields(neighbors: List[Tuple[Dict, float]]) -> Dict[str, Dict]:
+    """Suggest curation field values from similar curated papers.
+
+    Each neighbor votes for its curated value of every field with its similarity
+    as weight.
+
+    Args:
+        neighbors: List of (curated metadata, similarity) pairs
+
+    Returns:
+        Mapping of field name to {"value", "support"}, support being the share of
+        the total similarity that voted for the value
+    """
+    suggestions = {}
+    for field in SUGGESTED_FIELDS:
+        votes = defaultdict(float)
+        for metadata, similarity in neighbors:
+            value = (metadata.get(field) or '').strip()
+            if value and value != 'NA':
+                votes[value] += max(similarity, 0.0)
+        total = sum(votes.values())
+        if total > 0:
+            value, weight = max(votes.items(), key=lambda item: item[1])
+            suggestions[field] = {"value": value, "support": round(weight / total, 3)}
+    return suggestions
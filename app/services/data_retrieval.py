@@ -1,6 +1,5 @@
 import time
 import logging
-import asyncio
 from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 import requests
@@ -8,15 +7,53 @@ from Bio import Entrez
 from bs4 import BeautifulSoup
 from app.utils.utils import config, create_cache_key, save_json, load_json
 from app.utils.performance_logger import perf_logger
+from app.utils import tracing
+from app.utils.tracing import tracer
 import concurrent.futures
+import threading
 
 logger = logging.getLogger(__name__)
 
+class RateLimiter:
+    """Thread-safe token bucket limiting calls per second across threads."""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize the limiter.
+        
+        Args:
+            rate: Sustained calls per second
+            burst: Calls allowed back to back after an idle period
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def acquire(self):
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
 class PubMedRetriever:
     """Class for retrieving data from PubMed and PMC."""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the retriever with API credentials."""
+    def __init__(self, api_key: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None):
+        """Initialize the retriever with API credentials.
+        
+        Args:
+            api_key: NCBI API key
+            rate_limiter: Optional limiter applied to every E-utilities request,
+                for callers issuing requests from several threads
+        """
         Entrez.email = config.EMAIL
         self.api_key = api_key or config.NCBI_API_KEY
         Entrez.api_key = self.api_key
@@ -24,6 +61,7 @@ class PubMedRetriever:
         # Add timeout configuration
         self.timeout = 30  # 30 seconds timeout
         self.max_workers = 3  # Limit concurrent API calls
+        self.rate_limiter = rate_limiter
         
     def _handle_api_call(self, func, *args, **kwargs) -> Dict:
         """Handle API calls with retries, rate limiting, and timeout.
@@ -41,6 +79,8 @@ class PubMedRetriever:
             kwargs["api_key"] = self.api_key
             
         for attempt in range(config.MAX_RETRIES):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
             try:
                 # Use ThreadPoolExecutor to handle timeouts
                 with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
@@ -63,13 +103,11 @@ class PubMedRetriever:
                     
     async def get_paper_metadata_async(self, pmid: str) -> Dict:
         """Async version of get_paper_metadata for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.get_paper_metadata, pmid)
+        return await tracing.run_in_executor(self.get_paper_metadata, pmid)
         
     async def get_pmc_fulltext_async(self, pmid: str) -> Optional[str]:
         """Async version of get_pmc_fulltext for better performance."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.get_pmc_fulltext, pmid)
+        return await tracing.run_in_executor(self.get_pmc_fulltext, pmid)
         
     def get_paper_metadata(self, pmid: str) -> Dict:
         """Retrieve metadata for a paper from PubMed.
@@ -88,25 +126,26 @@ class PubMedRetriever:
         # Ensure cache directory exists
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        if cache_file.exists():
-            duration = time.time() - start_time
-            perf_logger.log_cache_operation("GET", pmid, "metadata", duration, True)
-            return load_json(cache_file)
+        with tracer.span("cache.lookup", pmid=pmid, cache_type="metadata") as span:
+            span.set_attribute("hit", cache_file.exists())
+            if span.attributes["hit"]:
+                duration = time.time() - start_time
+                perf_logger.log_cache_operation("GET", pmid, "metadata", duration, True)
+                return load_json(cache_file)
             
         try:
-            result = self._handle_api_call(
-                Entrez.efetch,
-                db="pubmed",
-                id=pmid,
-                rettype="medline",
-                retmode="xml"
-            )
+            with tracer.span("pubmed.efetch", pmid=pmid):
+                result = self._handle_api_call(
+                    Entrez.efetch,
+                    db="pubmed",
+                    id=pmid,
+                    rettype="medline",
+                    retmode="xml"
+                )
             
             duration = time.time() - start_time
             perf_logger.log_api_call("PubMed", "efetch", pmid, duration, True)
             
-            return result
-            
         except Exception as e:
             duration = time.time() - start_time
             perf_logger.log_api_call("PubMed", "efetch", pmid, duration, False, str(e))
@@ -148,7 +187,8 @@ class PubMedRetriever:
             "sequencing_type": sequencing_type
         }
         
-        save_json(metadata, cache_file)
+        with tracer.span("cache.write", pmid=pmid, cache_type="metadata"):
+            save_json(metadata, cache_file)
         return metadata
         
     def _extract_mesh_terms(self, article: Dict) -> List[str]:
@@ -218,21 +258,24 @@ class PubMedRetriever:
         cache_key = create_cache_key("fulltext", pmid)
         cache_file = self.cache_dir / f"{cache_key}.txt"
         
-        if cache_file.exists():
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                duration = time.time() - start_time
-                perf_logger.log_cache_operation("GET", pmid, "fulltext", duration, True)
-                return f.read()
+        with tracer.span("cache.lookup", pmid=pmid, cache_type="fulltext") as span:
+            span.set_attribute("hit", cache_file.exists())
+            if span.attributes["hit"]:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    duration = time.time() - start_time
+                    perf_logger.log_cache_operation("GET", pmid, "fulltext", duration, True)
+                    return f.read()
                 
         try:
             # First, get the PMCID
             link_start = time.time()
-            result = self._handle_api_call(
-                Entrez.elink,
-                dbfrom="pubmed",
-                db="pmc",
-                id=pmid
-            )
+            with tracer.span("pubmed.elink", pmid=pmid):
+                result = self._handle_api_call(
+                    Entrez.elink,
+                    dbfrom="pubmed",
+                    db="pmc",
+                    id=pmid
+                )
             
             link_duration = time.time() - link_start
             perf_logger.log_api_call("PubMed", "elink", pmid, link_duration, True)
@@ -252,21 +295,24 @@ class PubMedRetriever:
         
         # Then fetch the full text
         try:
-            result = self._handle_api_call(
-                Entrez.efetch,
-                db="pmc",
-                id=pmcid,
-                rettype="full",
-                retmode="xml"
-            )
+            with tracer.span("pmc.efetch", pmid=pmid, pmcid=pmcid):
+                result = self._handle_api_call(
+                    Entrez.efetch,
+                    db="pmc",
+                    id=pmcid,
+                    rettype="full",
+                    retmode="xml"
+                )
             
             # Parse XML and extract text
-            soup = BeautifulSoup(result, 'lxml')
-            full_text = self._extract_text_from_pmc_xml(soup)
+            with tracer.span("pmc.extract_text", pmid=pmid):
+                soup = BeautifulSoup(result, 'lxml')
+                full_text = self._extract_text_from_pmc_xml(soup)
             
             # Store full text in cache
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write(full_text)
+            with tracer.span("cache.write", pmid=pmid, cache_type="fulltext"):
+                with open(cache_file, 'w', encoding='utf-8') as f:
+                    f.write(full_text)
             
             # Log successful completion
             total_duration = time.time() - start_time
@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingStore:
+    """Persistent store of text embeddings keyed by (model name, text hash).
+
+    Each model gets its own directory holding a raw row-major matrix of vectors
+    (read through a memory map) and an append-only file of row keys. Writes only
+    ever append; re-embedding a key appends a new row that supersedes the old one,
+    and compact() rewrites the files keeping just the live rows. Several processes
+    (the API, build_similarity_index.py, the acquisition pipeline) may share a
+    store: writes and compaction hold a file lock, and each process picks up the
+    others' rows from the keys file.
+    """
+
+    VECTORS_FILE = "vectors.bin"
+    KEYS_FILE = "keys.txt"
+    META_FILE = "meta.json"
+    LOCK_FILE = "store.lock"
+
+    def __init__(self, root: Path, model_name: str, dtype: str = "float32"):
+        """Open (or create) the store for a model.
+
+        Args:
+            root: Directory holding the stores of all models
+            model_name: Name of the model that produced the embeddings
+            dtype: Storage dtype, "float32" or "float16" (ignored for existing stores)
+        """
+        self.model_name = model_name
+        self.directory = Path(root) / re.sub(r'[^A-Za-z0-9_.-]+', '__', model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / self.VECTORS_FILE
+        self.keys_path = self.directory / self.KEYS_FILE
+        self.meta_path = self.directory / self.META_FILE
+
+        self.lock_path = self.directory / self.LOCK_FILE
+
+        self._lock = threading.Lock()
+        self._memmap: Optional[np.memmap] = None
+        self._index: Dict[str, int] = {}
+        self._num_rows = 0
+        # Identity and read position of the keys file, to pick up other processes' appends
+        self._keys_inode: Optional[int] = None
+        self._keys_offset = 0
+
+        # Replaced by the stored dim and dtype once the store has rows (see _sync)
+        self.dim: Optional[int] = None
+        self.dtype = np.dtype(dtype)
+
+        self._load_index()
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        """Hash of a text, used as its key in the store."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * self.dtype.itemsize
+
+    @contextmanager
+    def _locked(self):
+        """Hold the thread lock and an exclusive lock on the store shared with other processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """Load the key index, discarding a partially written trailing row."""
+        with self._locked():
+            self._sync()
+
+    def _changed_on_disk(self) -> bool:
+        """Whether another process appended keys or compacted the store since the last sync."""
+        try:
+            stat = self.keys_path.stat()
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self._keys_inode or stat.st_size != self._keys_offset
+
+    def _sync(self):
+        """Read rows written by other processes since the last sync (call with _locked held).
+
+        Keys appended since the last read extend the index; a store rewritten by
+        compact() is reloaded from the start. Rows left half-written by a crashed
+        writer are truncated away, which is safe because no writer holds the lock.
+        """
+        if self.dim is None and self.meta_path.exists():
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.dtype = np.dtype(meta["dtype"])
+
+        if self.keys_path.exists():
+            stat = self.keys_path.stat()
+            if stat.st_ino != self._keys_inode or stat.st_size < self._keys_offset:
+                self._index, self._num_rows, self._keys_offset = {}, 0, 0
+                self._keys_inode = stat.st_ino
+                self._memmap = None
+            if stat.st_size > self._keys_offset:
+                with open(self.keys_path, 'rb') as f:
+                    f.seek(self._keys_offset)
+                    data = f.read()
+                complete = data[:data.rfind(b"\n") + 1]
+                # Later rows supersede earlier ones for the same key
+                for line in complete.decode("utf-8").splitlines():
+                    if line.strip():
+                        self._index[line.strip()] = self._num_rows
+                        self._num_rows += 1
+                self._keys_offset += len(complete)
+
+        keys_size = self.keys_path.stat().st_size if self.keys_path.exists() else 0
+        vectors_size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        row_bytes = self._row_bytes if self.dim else 0
+        if keys_size != self._keys_offset or vectors_size != self._num_rows * row_bytes:
+            self._repair()
+        self._remap()
+
+    def _repair(self):
+        """Truncate keys and vectors to the rows written completely to both."""
+        keys = []
+        if self.keys_path.exists():
+            with open(self.keys_path, 'r') as f:
+                data = f.read()
+            keys = [line.strip() for line in data[:data.rfind("\n") + 1].splitlines() if line.strip()]
+
+        stored_rows = 0
+        if self.dim and self.vectors_path.exists():
+            stored_rows = self.vectors_path.stat().st_size // self._row_bytes
+
+        num_rows = min(len(keys), stored_rows)
+        logger.warning(f"Embedding store {self.directory} has an incomplete write; truncating to {num_rows} rows")
+        if self.vectors_path.exists():
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(num_rows * self._row_bytes if self.dim else 0)
+        # Replaced rather than rewritten in place, so other processes reload it
+        tmp_keys = self.keys_path.with_suffix(".tmp")
+        with open(tmp_keys, 'w') as f:
+            f.writelines(f"{key}\n" for key in keys[:num_rows])
+        os.replace(tmp_keys, self.keys_path)
+
+        self._index = {key: row for row, key in enumerate(keys[:num_rows])}
+        self._num_rows = num_rows
+        stat = self.keys_path.stat()
+        self._keys_inode, self._keys_offset = stat.st_ino, stat.st_size
+        self._memmap = None
+
+    def _remap(self):
+        """Map the vectors indexed so far (call with _locked held, so the file matches the index)."""
+        if not self._num_rows:
+            self._memmap = None
+        elif self._memmap is None or self._memmap.shape[0] != self._num_rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(self._num_rows, self.dim))
+
+    def get_many(self, keys: List[str]) -> Tuple[Optional[np.ndarray], List[bool]]:
+        """Look up embeddings for many keys.
+
+        Keys another process added since the last lookup are picked up before
+        reporting a miss.
+
+        Args:
+            keys: Text keys (see text_key)
+
+        Returns:
+            Tuple of (float32 matrix with one row per key, zeros for misses, or None
+            if the store is empty; list of hit flags)
+        """
+        if not all(key in self._index for key in keys) and self._changed_on_disk():
+            with self._locked():
+                self._sync()
+
+        with self._lock:
+            found = [key in self._index for key in keys]
+            if not any(found):
+                return (np.zeros((len(keys), self.dim), dtype=np.float32) if self.dim else None), found
+
+            rows = np.array([self._index.get(key, 0) for key in keys], dtype=np.int64)
+            vectors = np.asarray(self._memmap[rows], dtype=np.float32)
+            vectors[~np.array(found)] = 0.0
+            return vectors, found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Append embeddings for many keys.
+
+        Safe to call from several processes sharing the store: appends are made
+        under a file lock, and the rows are numbered from the size of the vectors
+        file at that point rather than from this process's view of it.
+
+        Args:
+            keys: Text keys (see text_key)
+            vectors: Matrix with one embedding row per key
+        """
+        vectors = np.asarray(vectors)
+        if len(keys) != vectors.shape[0]:
+            raise ValueError(f"Got {len(keys)} keys for {vectors.shape[0]} vectors")
+        if not keys:
+            return
+
+        with self._locked():
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, 'w') as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            first_row = self.vectors_path.stat().st_size // self._row_bytes if self.vectors_path.exists() else 0
+            # Vectors first: a crash between the two writes leaves an orphan row that
+            # _sync discards, never a key pointing at a missing row.
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, 'a') as f:
+                f.writelines(f"{key}\n" for key in keys)
+
+            for offset, key in enumerate(keys):
+                self._index[key] = first_row + offset
+            self._num_rows = first_row + len(keys)
+            stat = self.keys_path.stat()
+            self._keys_inode, self._keys_offset = stat.st_ino, stat.st_size
+            self._remap()
+
+    def compact(self) -> int:
+        """Rewrite the store keeping only the live row of each key.
+
+        Returns:
+            Number of superseded rows removed
+        """
+        with self._locked():
+            self._sync()
+            removed = self._num_rows - len(self._index)
+            if removed == 0:
+                return 0
+
+            live = sorted(self._index.items(), key=lambda item: item[1])
+            rows = np.array([row for _, row in live], dtype=np.int64)
+            vectors = self._memmap
+
+            tmp_vectors = self.vectors_path.with_suffix(".tmp")
+            tmp_keys = self.keys_path.with_suffix(".tmp")
+            with open(tmp_vectors, 'wb') as f:
+                # Copy in chunks to keep memory bounded for large stores
+                for start in range(0, len(rows), 10000):
+                    f.write(np.ascontiguousarray(vectors[rows[start:start + 10000]]).tobytes())
+            with open(tmp_keys, 'w') as f:
+                f.writelines(f"{key}\n" for key, _ in live)
+
+            self._memmap = None
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_keys, self.keys_path)
+
+            self._index = {key: row for row, (key, _) in enumerate(live)}
+            self._num_rows = len(live)
+            stat = self.keys_path.stat()
+            self._keys_inode, self._keys_offset = stat.st_ino, stat.st_size
+            self._remap()
+            logger.info(f"Compacted embedding store {self.directory}: removed {removed} superseded rows")
+            return removed
@@ -1,22 +1,94 @@
 import re
 import logging
-from typing import Dict, List, Union, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Union, Tuple
 import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModel
+from app.models.config import ModelConfig
+from app.models.inference import optimize_encoder
+from app.services.embedding_store import EmbeddingStore
 from app.utils.utils import config
 
 logger = logging.getLogger(__name__)
 
+def length_buckets(lengths: List[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """Group indices into batches of similar length under a padded-token budget.
+    
+    Indices are sorted by length, and a batch is closed when padding every row to
+    the batch's longest row would exceed token_budget or it holds max_batch_size rows.
+    
+    Args:
+        lengths: Token length of each item
+        token_budget: Maximum padded tokens (rows x longest row) per batch
+        max_batch_size: Maximum rows per batch
+        
+    Returns:
+        List of batches, each a list of indices into lengths
+    """
+    buckets = []
+    current = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted ascending, so this item sets the padded length of the batch
+        if current and (lengths[i] * (len(current) + 1) > token_budget or len(current) >= max_batch_size):
+            buckets.append(current)
+            current = []
+        current.append(i)
+    if current:
+        buckets.append(current)
+    return buckets
+
+POOLING_METHODS = ("mean", "max", "attention")
+
+def pool_windows(window_vectors: np.ndarray, method: str = "mean") -> np.ndarray:
+    """Pool the window embeddings of one document into a single vector.
+    
+    Args:
+        window_vectors: Matrix with one embedding row per window
+        method: "mean", "max" or "attention" (softmax weights from each window's
+            similarity to the mean window, so outlying windows count less)
+        
+    Returns:
+        Pooled document embedding
+    """
+    if method == "mean":
+        return window_vectors.mean(axis=0)
+    if method == "max":
+        return window_vectors.max(axis=0)
+    if method == "attention":
+        centroid = window_vectors.mean(axis=0)
+        scores = window_vectors @ centroid / np.sqrt(window_vectors.shape[1])
+        weights = np.exp(scores - scores.max())
+        weights /= weights.sum()
+        return weights @ window_vectors
+    raise ValueError(f"Unknown pooling method: {method}")
+
 class TextPreprocessor:
     """Class for text preprocessing and embedding generation."""
     
-    def __init__(self, model_name: str = "allenai/scibert_scivocab_uncased"):
+    def __init__(
+        self,
+        model_name: str = "allenai/scibert_scivocab_uncased",
+        use_embedding_store: bool = True,
+        embedding_dir: Optional[Path] = None,
+        pooling: Optional[str] = None,
+        model_config: Optional[ModelConfig] = None
+    ):
         """Initialize the preprocessor with a SciBERT model.
         
         Args:
             model_name: Name of the pretrained model to use
+            use_embedding_store: Whether to cache embeddings on disk across runs
+            embedding_dir: Root directory of the embedding store (defaults to config.EMBEDDING_DIR)
+            pooling: "truncate" or a window pooling method for long documents
+                (defaults to config.EMBEDDING_POOLING)
+            model_config: Optional model configuration selecting a CPU inference backend
         """
+        self.model_name = model_name
+        self.inference_backend = "torch"
+        self.pooling = pooling or config.EMBEDDING_POOLING
+        if self.pooling != "truncate" and self.pooling not in POOLING_METHODS:
+            raise ValueError(f"Unknown pooling method: {self.pooling}")
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
             self.model = AutoModel.from_pretrained(model_name)
@@ -33,6 +105,41 @@ class TextPreprocessor:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         if self.model_available:
             self.model = self.model.to(self.device)
+            self.model.eval()
+            
+            # Optimized CPU inference (int8 / ONNX Runtime), checked against fp32
+            if model_config is not None and model_config.inference_backend != "torch":
+                if self.device.type == "cpu":
+                    optimized = optimize_encoder(self.model, self.tokenizer, model_config)
+                    if optimized is not self.model:
+                        self.model = optimized
+                        self.inference_backend = model_config.inference_backend
+                else:
+                    logger.info(f"Ignoring {model_config.inference_backend} backend on {self.device}")
+        
+        # Persistent embedding cache; fallback features are never stored, and
+        # optimized backends get their own store since their outputs differ slightly
+        self.embedding_store = None
+        self.window_store = None
+        if self.model_available and use_embedding_store:
+            store_name = model_name if self.inference_backend == "torch" else f"{model_name}-{self.inference_backend}"
+            # Document embeddings; pooled ones depend on the window settings
+            document_store_name = store_name
+            if self.pooling != "truncate":
+                document_store_name = (f"{store_name}-{self.pooling}-{config.MAX_LENGTH}-"
+                                       f"{config.WINDOW_STRIDE}-{config.MAX_WINDOWS}")
+            self.embedding_store = EmbeddingStore(
+                embedding_dir or config.EMBEDDING_DIR,
+                document_store_name,
+                dtype=config.EMBEDDING_DTYPE
+            )
+            # Window embeddings are stored unpooled, so changing the pooling method
+            # needs no re-inference
+            self.window_store = EmbeddingStore(
+                embedding_dir or config.EMBEDDING_DIR,
+                f"{store_name}-windows-{config.MAX_LENGTH}-{config.WINDOW_STRIDE}",
+                dtype=config.EMBEDDING_DTYPE
+            )
         
     def clean_text(self, text: str) -> str:
         """Clean and normalize text.
@@ -72,10 +179,13 @@ class TextPreprocessor:
         
         return " ".join(text_parts)
         
-    @torch.no_grad()
     def generate_embeddings(self, texts: List[str]) -> torch.Tensor:
         """Generate SciBERT embeddings for a list of texts.
         
+        Texts are tokenized in chunks, grouped into buckets of similar token length
+        under a padded-token budget and run through the model bucket by bucket, so
+        padding waste is small and peak memory does not grow with the input size.
+        
         Args:
             texts: List of input texts
             
@@ -102,30 +212,221 @@ class TextPreprocessor:
             padded_features = [f + [0] * (max_len - len(f)) for f in features]
             return torch.tensor(padded_features, dtype=torch.float)
         
-        # Tokenize texts
-        encoded = self.tokenizer(
-            texts,
-            padding=True,
-            truncation=True,
-            max_length=config.MAX_LENGTH,
-            return_tensors="pt"
-        )
+        embeddings = None
+        for start in range(0, len(texts), config.EMBEDDING_CHUNK_SIZE):
+            chunk = texts[start:start + config.EMBEDDING_CHUNK_SIZE]
+            
+            # Tokenize without padding; each bucket is padded to its own longest row
+            encoded = self.tokenizer(
+                chunk,
+                truncation=True,
+                max_length=config.MAX_LENGTH
+            )
+            chunk_embeddings = self._embed_token_ids(encoded["input_ids"])
+            
+            if embeddings is None:
+                embeddings = torch.empty(len(texts), chunk_embeddings.shape[1])
+            embeddings[start:start + len(chunk)] = chunk_embeddings
         
-        # Move inputs to device
-        input_ids = encoded["input_ids"].to(self.device)
-        attention_mask = encoded["attention_mask"].to(self.device)
+        if embeddings is None:
+            return torch.empty(0, self.model.config.hidden_size)
+        return embeddings
+    
+    def _embed_token_ids(self, input_ids: List[List[int]]) -> torch.Tensor:
+        """Run tokenized texts through the model in length-bucketed batches.
         
-        # Generate embeddings
-        outputs = self.model(
-            input_ids=input_ids,
-            attention_mask=attention_mask
-        )
+        Args:
+            input_ids: Token IDs of each text (unpadded)
+            
+        Returns:
+            Tensor of [CLS] embeddings in input order
+        """
+        lengths = [len(ids) for ids in input_ids]
+        embeddings = None
         
-        # Use [CLS] token embeddings as document representations
-        embeddings = outputs.last_hidden_state[:, 0, :]
+        for bucket in length_buckets(lengths, config.EMBEDDING_TOKEN_BUDGET, config.EMBEDDING_MAX_BATCH_SIZE):
+            batch = self.tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in bucket]},
+                padding=True,
+                return_tensors="pt"
+            )
+            
+            with torch.inference_mode():
+                outputs = self.model(
+                    input_ids=batch["input_ids"].to(self.device),
+                    attention_mask=batch["attention_mask"].to(self.device)
+                )
+                # Use [CLS] token embeddings as document representations
+                bucket_embeddings = outputs.last_hidden_state[:, 0, :].float().cpu()
+            
+            # Scatter back to the original positions (outside inference mode, so the
+            # result can later be used in autograd, e.g. for training)
+            if embeddings is None:
+                embeddings = torch.empty(len(input_ids), bucket_embeddings.shape[1])
+            embeddings[bucket] = bucket_embeddings
         
-        return embeddings.cpu()
+        return embeddings
+    
+    def split_windows(self, token_ids: List[int]) -> List[List[int]]:
+        """Split a tokenized document into overlapping model-sized windows.
+        
+        Args:
+            token_ids: Token IDs of the document, without special tokens
+            
+        Returns:
+            List of windows, each with the model's special tokens added
+        """
+        size = config.MAX_LENGTH - self.tokenizer.num_special_tokens_to_add()
+        step = max(size - config.WINDOW_STRIDE, 1)
+        
+        starts = [0]
+        while starts[-1] + size < len(token_ids) and len(starts) < config.MAX_WINDOWS:
+            starts.append(starts[-1] + step)
+        
+        return [
+            self.tokenizer.build_inputs_with_special_tokens(token_ids[start:start + size])
+            for start in starts
+        ]
+    
+    def window_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed every window of each text, reusing stored window embeddings.
+        
+        Windows of all texts are embedded together, so short and long documents
+        share length-bucketed batches.
         
+        Args:
+            texts: List of cleaned input texts
+            
+        Returns:
+            One matrix of window embeddings per text, in input order
+        """
+        results = []
+        for start in range(0, len(texts), config.EMBEDDING_CHUNK_SIZE):
+            chunk = texts[start:start + config.EMBEDDING_CHUNK_SIZE]
+            encoded = self.tokenizer(chunk, add_special_tokens=False, verbose=False)
+            windows = [self.split_windows(ids) for ids in encoded["input_ids"]]
+            
+            text_keys = [EmbeddingStore.text_key(text) for text in chunk]
+            keys = [f"{text_key}/{i}" for text_key, doc_windows in zip(text_keys, windows) for i in range(len(doc_windows))]
+            flat_windows = [window for doc_windows in windows for window in doc_windows]
+            
+            if self.window_store is not None:
+                vectors, found = self.window_store.get_many(keys)
+            else:
+                vectors, found = None, [False] * len(keys)
+            
+            # Embed each distinct missing window once
+            misses = {}
+            for key, window, hit in zip(keys, flat_windows, found):
+                if not hit and key not in misses:
+                    misses[key] = window
+            
+            if misses:
+                new_vectors = self._embed_token_ids(list(misses.values())).numpy()
+                if self.window_store is not None:
+                    self.window_store.put_many(list(misses.keys()), new_vectors)
+                if vectors is None:
+                    vectors = np.zeros((len(keys), new_vectors.shape[1]), dtype=np.float32)
+                rows = dict(zip(misses.keys(), new_vectors))
+                for i, (key, hit) in enumerate(zip(keys, found)):
+                    if not hit:
+                        vectors[i] = rows[key]
+            
+            logger.info(f"Window store: {sum(found)}/{len(keys)} hits, {len(misses)} windows embedded")
+            
+            offset = 0
+            for doc_windows in windows:
+                results.append(vectors[offset:offset + len(doc_windows)])
+                offset += len(doc_windows)
+        
+        return results
+    
+    def embed_long_texts(self, texts: List[str], pooling: str = "mean") -> torch.Tensor:
+        """Embed texts over their full length by pooling sliding-window embeddings.
+        
+        Args:
+            texts: List of cleaned input texts
+            pooling: "mean", "max" or "attention"
+            
+        Returns:
+            Tensor of pooled embeddings in input order
+        """
+        if not self.model_available:
+            return self.generate_embeddings(texts)
+        if not texts:
+            return torch.empty(0, self.model.config.hidden_size)
+        
+        pooled = [pool_windows(vectors, pooling) for vectors in self.window_embeddings(texts)]
+        return torch.from_numpy(np.stack(pooled).astype(np.float32))
+    
+    def embed_texts(self, texts: List[str]) -> torch.Tensor:
+        """Get embeddings for texts, computing only those not in the embedding store.
+        
+        Args:
+            texts: List of cleaned input texts
+            
+        Returns:
+            Tensor of embeddings in input order
+        """
+        if self.embedding_store is None or not texts:
+            return self._embed_documents(texts)
+        
+        keys = [EmbeddingStore.text_key(text) for text in texts]
+        vectors, found = self.embedding_store.get_many(keys)
+        
+        # Embed each distinct missing text once
+        misses = {}
+        for key, text, hit in zip(keys, texts, found):
+            if not hit and key not in misses:
+                misses[key] = text
+        
+        if misses:
+            new_embeddings = self._embed_documents(list(misses.values())).float().numpy()
+            self.embedding_store.put_many(list(misses.keys()), new_embeddings)
+            if vectors is None:
+                vectors = np.zeros((len(texts), new_embeddings.shape[1]), dtype=np.float32)
+            rows = dict(zip(misses.keys(), new_embeddings))
+            for i, (key, hit) in enumerate(zip(keys, found)):
+                if not hit:
+                    vectors[i] = rows[key]
+        
+        logger.info(f"Embedding store: {len(texts) - sum(not hit for hit in found)}/{len(texts)} hits, {len(misses)} embedded")
+        return torch.from_numpy(vectors)
+        
+    def _embed_documents(self, texts: List[str]) -> torch.Tensor:
+        """Compute document embeddings with the configured pooling, bypassing the document store."""
+        if self.pooling != "truncate":
+            return self.embed_long_texts(texts, self.pooling)
+        return self.generate_embeddings(texts)
+    
+    def stored_embeddings(self, keys: List[str]) -> Tuple[Optional[np.ndarray], List[bool]]:
+        """Look up stored document embeddings by text key.
+        
+        Args:
+            keys: EmbeddingStore.text_key of paper_text outputs
+            
+        Returns:
+            Tuple of (matrix with one row per key, zeros for misses, or None; list of hit flags)
+        """
+        if self.embedding_store is None:
+            return None, [False] * len(keys)
+        return self.embedding_store.get_many(keys)
+    
+    def paper_text(self, metadata: Dict, full_text: Optional[str] = None) -> str:
+        """Cleaned text a paper is embedded from.
+        
+        Args:
+            metadata: Paper metadata dictionary
+            full_text: Optional full text content
+            
+        Returns:
+            Combined and cleaned text
+        """
+        text = self.combine_paper_text(metadata)
+        if full_text:
+            text += " " + full_text
+        return self.clean_text(text)
+    
     def prepare_features(
         self,
         metadata: Dict,
@@ -140,14 +441,8 @@ class TextPreprocessor:
         Returns:
             Tuple of (embeddings tensor, additional features dictionary)
         """
-        # Combine and clean text
-        text = self.combine_paper_text(metadata)
-        if full_text:
-            text += " " + full_text
-        text = self.clean_text(text)
-        
         # Generate embeddings
-        embeddings = self.generate_embeddings([text])[0]
+        embeddings = self.embed_texts([self.paper_text(metadata, full_text)])[0]
         
         # Extract additional features
         additional_features = {
@@ -179,12 +474,7 @@ class TextPreprocessor:
         additional_features_list = []
         
         for metadata, full_text in zip(metadata_list, full_texts):
-            # Combine and clean text
-            text = self.combine_paper_text(metadata)
-            if full_text:
-                text += " " + full_text
-            text = self.clean_text(text)
-            texts.append(text)
+            texts.append(self.paper_text(metadata, full_text))
             
             # Extract additional features
             additional_features = {
@@ -194,7 +484,7 @@ class TextPreprocessor:
             }
             additional_features_list.append(additional_features)
             
-        # Generate embeddings for the batch
-        embeddings = self.generate_embeddings(texts)
+        # Generate embeddings for the batch, reusing stored ones
+        embeddings = self.embed_texts(texts)
         
         return embeddings, additional_features_list 
\ No newline at end of file
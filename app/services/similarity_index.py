@@ -0,0 +1,368 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+class SimilarityIndex:
+    """Approximate nearest-neighbor index over paper embeddings (cosine similarity).
+
+    Vectors are L2-normalized and appended to a raw float32 file that is read through
+    a memory map. Search uses an HNSW graph when hnswlib is installed, otherwise an
+    inverted-file (IVF) index in NumPy: vectors are assigned to k-means centroids and
+    a query only scans the lists of its nprobe closest centroids. Small indexes are
+    searched exactly.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    IDS_FILE = "ids.txt"
+    META_FILE = "meta.json"
+    CENTROIDS_FILE = "centroids.npy"
+    ASSIGNMENTS_FILE = "assignments.npy"
+    HNSW_FILE = "hnsw.bin"
+
+    # Below this many vectors a brute-force scan is as fast as an approximate search
+    EXACT_SEARCH_THRESHOLD = 20000
+
+    def __init__(self, directory: Path, backend: str = "auto", nprobe: int = 8):
+        """Open (or create) an index.
+
+        Args:
+            directory: Directory holding the index files
+            backend: "hnsw", "ivf" or "auto" (HNSW when hnswlib is installed)
+            nprobe: Number of IVF lists scanned per query
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if backend == "auto":
+            backend = "hnsw" if HNSWLIB_AVAILABLE else "ivf"
+        if backend == "hnsw" and not HNSWLIB_AVAILABLE:
+            logger.warning("hnswlib is not installed; using the NumPy IVF index")
+            backend = "ivf"
+        self.backend = backend
+        self.nprobe = nprobe
+
+        self._lock = threading.RLock()
+        self._memmap: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        # IVF state
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._list_offsets: Optional[np.ndarray] = None
+        self._list_rows: Optional[np.ndarray] = None
+
+        # HNSW state
+        self._hnsw = None
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _load(self):
+        """Load ids, metadata and the search structure from disk."""
+        meta_path = self._path(self.META_FILE)
+        if not meta_path.exists():
+            return
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+
+        with open(self._path(self.IDS_FILE), 'r') as f:
+            ids = [line.strip() for line in f if line.strip()]
+        stored_rows = self._path(self.VECTORS_FILE).stat().st_size // (self.dim * 4)
+        # Ignore rows whose id or vector was not fully written
+        self.ids = ids[:min(len(ids), stored_rows)]
+        self._rows = {key: row for row, key in enumerate(self.ids)}
+
+        if self._path(self.CENTROIDS_FILE).exists():
+            self._centroids = np.load(self._path(self.CENTROIDS_FILE))
+            assignments = np.load(self._path(self.ASSIGNMENTS_FILE))
+            if len(assignments) < len(self.ids):
+                # Rows added after the assignments were saved
+                extra = self._assign(np.asarray(self._vectors()[len(assignments):]))
+                assignments = np.concatenate([assignments, extra])
+            self._assignments = assignments[:len(self.ids)]
+
+        if self.backend == "hnsw" and self._path(self.HNSW_FILE).exists():
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.load_index(str(self._path(self.HNSW_FILE)), max_elements=max(len(self.ids), 1))
+            if self._hnsw.get_current_count() < len(self.ids):
+                start = self._hnsw.get_current_count()
+                self._hnsw_add(np.asarray(self._vectors()[start:]), np.arange(start, len(self.ids)))
+
+    def _vectors(self) -> np.ndarray:
+        """Memory map over all stored (normalized) vectors."""
+        if not self.ids:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._memmap is None or self._memmap.shape[0] != len(self.ids):
+            self._memmap = np.memmap(self._path(self.VECTORS_FILE), dtype=np.float32, mode='r', shape=(len(self.ids), self.dim))
+        return self._memmap
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        """Stored (normalized) vector of a key, if present."""
+        row = self._rows.get(key)
+        return None if row is None else np.array(self._vectors()[row])
+
+    def add(self, keys: List[str], vectors: np.ndarray):
+        """Add vectors to the index; keys already present are skipped.
+
+        Args:
+            keys: Ids of the vectors (PMIDs)
+            vectors: Matrix with one embedding row per key
+        """
+        vectors = np.asarray(vectors)
+        if len(keys) != len(vectors):
+            raise ValueError(f"Got {len(keys)} keys for {len(vectors)} vectors")
+
+        with self._lock:
+            new = [i for i, key in enumerate(keys) if key not in self._rows]
+            # Keep only the first occurrence of keys repeated within the batch
+            seen = set()
+            new = [i for i in new if not (keys[i] in seen or seen.add(keys[i]))]
+            if not new:
+                return
+
+            vectors = self._normalize(vectors[new])
+            keys = [keys[i] for i in new]
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._path(self.META_FILE), 'w') as f:
+                    json.dump({"dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            # Vectors first, so a crash never leaves an id without a vector
+            with open(self._path(self.VECTORS_FILE), 'ab') as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._path(self.IDS_FILE), 'a') as f:
+                f.writelines(f"{key}\n" for key in keys)
+
+            start = len(self.ids)
+            self.ids.extend(keys)
+            for offset, key in enumerate(keys):
+                self._rows[key] = start + offset
+
+            if self._centroids is not None:
+                self._assignments = np.concatenate([self._assignments, self._assign(vectors)])
+                self._list_offsets = None
+            if self._hnsw is not None:
+                self._hnsw_add(vectors, np.arange(start, len(self.ids)))
+
+    def build(self, num_lists: Optional[int] = None, iterations: int = 10, sample_size: int = 50000):
+        """Build (or rebuild) the search structure over all stored vectors.
+
+        Args:
+            num_lists: Number of IVF lists (defaults to about 4 * sqrt(N))
+            iterations: k-means iterations
+            sample_size: Number of vectors used to train the centroids
+        """
+        with self._lock:
+            vectors = self._vectors()
+            n = len(self.ids)
+            if n == 0:
+                return
+
+            if self.backend == "hnsw":
+                self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+                self._hnsw.init_index(max_elements=n, ef_construction=200, M=16)
+                self._hnsw_add(np.asarray(vectors), np.arange(n))
+                self._hnsw.save_index(str(self._path(self.HNSW_FILE)))
+                logger.info(f"Built HNSW index over {n} vectors")
+                return
+
+            num_lists = num_lists or max(1, int(4 * np.sqrt(n)))
+            num_lists = min(num_lists, n)
+            rng = np.random.default_rng(0)
+            sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(sample_size, n), replace=False))])
+
+            # Spherical k-means on the sample
+            centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                counts = np.bincount(labels, minlength=num_lists)
+                starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                nonempty = counts > 0
+                # Empty lists keep their previous centroid
+                sums = centroids.copy()
+                sums[nonempty] = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts[nonempty], axis=0)
+                centroids = self._normalize(sums)
+
+            self._centroids = centroids
+            self._assignments = np.concatenate([
+                self._assign(np.asarray(vectors[start:start + 10000]))
+                for start in range(0, n, 10000)
+            ])
+            self._list_offsets = None
+            self.save()
+            logger.info(f"Built IVF index over {n} vectors with {num_lists} lists")
+
+    def save(self):
+        """Persist the search structure (vectors and ids are written on add)."""
+        with self._lock:
+            if self._centroids is not None:
+                np.save(self._path(self.CENTROIDS_FILE), self._centroids)
+                np.save(self._path(self.ASSIGNMENTS_FILE), self._assignments)
+            if self._hnsw is not None:
+                self._hnsw.save_index(str(self._path(self.HNSW_FILE)))
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest IVF list of each vector."""
+        if len(vectors) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _hnsw_add(self, vectors: np.ndarray, labels: np.ndarray):
+        needed = self._hnsw.get_current_count() + len(labels)
+        if needed > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(max(needed, 2 * self._hnsw.get_max_elements()))
+        self._hnsw.add_items(vectors, labels)
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by IVF list, as (offsets, rows) in CSR layout."""
+        if self._list_offsets is None:
+            self._list_rows = np.argsort(self._assignments, kind="stable").astype(np.int64)
+            counts = np.bincount(self._assignments, minlength=len(self._centroids))
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_offsets, self._list_rows
+
+    def search(self, query: np.ndarray, k: int = 10, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Find the stored vectors most similar to a query.
+
+        Args:
+            query: Query embedding
+            k: Number of neighbors to return
+            exclude: Key to leave out of the results (e.g. the query paper itself)
+
+        Returns:
+            List of (key, cosine similarity), most similar first
+        """
+        with self._lock:
+            n = len(self.ids)
+            if n == 0:
+                return []
+            query = self._normalize(np.asarray(query).reshape(1, -1))[0]
+            fetch = min(k + (1 if exclude else 0), n)
+            vectors = self._vectors()
+
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(50, 2 * fetch))
+                labels, distances = self._hnsw.knn_query(query, k=fetch)
+                rows, scores = labels[0], 1.0 - distances[0]
+            else:
+                if self._centroids is None or n <= self.EXACT_SEARCH_THRESHOLD:
+                    candidates = None
+                    candidate_scores = np.asarray(vectors) @ query
+                else:
+                    offsets, list_rows = self._inverted_lists()
+                    order = np.argsort(self._centroids @ query)[::-1]
+                    # Probe at least nprobe lists, and more while they hold fewer than fetch
+                    # vectors (nearby lists may be small or empty)
+                    sizes = np.cumsum(offsets[order + 1] - offsets[order])
+                    num_probe = max(self.nprobe, int(np.searchsorted(sizes, fetch)) + 1)
+                    probe = order[:num_probe]
+                    candidates = np.sort(np.concatenate([list_rows[offsets[c]:offsets[c + 1]] for c in probe]))
+                    candidate_scores = np.asarray(vectors[candidates]) @ query
+
+                top = min(fetch, len(candidate_scores))
+                if top == 0:
+                    return []
+                best = np.argpartition(-candidate_scores, top - 1)[:top]
+                best = best[np.argsort(-candidate_scores[best])]
+                rows = best if candidates is None else candidates[best]
+                scores = candidate_scores[best]
+
+            results = [(self.ids[row], float(score)) for row, score in zip(rows, scores) if self.ids[row] != exclude]
+            return results[:k]
+
+
+def paper_embeddings(preprocessor, metadata_list: List[Dict]) -> np.ndarray:
+    """Embeddings of papers as indexed and queried: title, abstract and MeSH terms.
+
+    Both the index build and /similar queries go through this function, so indexed
+    papers and query papers are embedded from the same kind of text.
+
+    Args:
+        preprocessor: TextPreprocessor used for the embeddings
+        metadata_list: Paper metadata dictionaries
+
+    Returns:
+        Matrix with one embedding row per paper
+    """
+    embeddings, _ = preprocessor.prepare_batch(metadata_list)
+    return embeddings.numpy()
+
+
+def build_curated_index(
+    index: SimilarityIndex,
+    curated,
+    preprocessor,
+    retriever=None,
+    batch_size: int = 256
+) -> int:
+    """Embed curated papers missing from the index and add them.
+
+    Args:
+        index: Index to extend
+        curated: CuratedPapers export of BugSigDB
+        preprocessor: TextPreprocessor used for the embeddings
+        retriever: PubMedRetriever used to fetch abstracts and MeSH terms, which the
+            export lacks; without it papers are embedded from their titles only and
+            match /similar queries (title, abstract and MeSH terms) less well
+        batch_size: Papers embedded per batch
+
+    Returns:
+        Number of papers added
+    """
+    pmids = [pmid for pmid in curated.pmids() if pmid not in index]
+    if retriever is None:
+        logger.warning("No retriever given: embedding curated papers from their titles only")
+    logger.info(f"Adding {len(pmids)} curated papers to the similarity index ({len(index)} already indexed)")
+
+    added = 0
+    for start in range(0, len(pmids), batch_size):
+        batch = pmids[start:start + batch_size]
+        metadata_list = []
+        for pmid in batch:
+            metadata = curated.get(pmid)
+            if retriever is not None:
+                try:
+                    metadata = {**metadata, **retriever.get_paper_metadata(pmid)}
+                except Exception as e:
+                    logger.warning(f"Using the curated title only for PMID {pmid}: {str(e)}")
+            metadata_list.append(metadata)
+
+        index.add(batch, paper_embeddings(preprocessor, metadata_list))
+        added += len(batch)
+        logger.info(f"Indexed {added}/{len(pmids)} curated papers")
+
+    if added:
+        index.build()
+    return added
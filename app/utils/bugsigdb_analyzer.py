@@ -6,8 +6,100 @@ from pathlib import Path
 import json
 from datetime import datetime
 import re
-from functools import lru_cache
+import os
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
 from time import sleep
+from app.utils.config import NCBI_API_KEY, NCBI_RATE_LIMIT_DELAY, ESUMMARY_BATCH_SIZE
+from app.utils.keyword_index import KeywordHits, keyword_index
+
+# Below this many papers, scoring in-process is faster than starting workers
+PARALLEL_SCORING_THRESHOLD = 2000
+
+
+class EsummaryCache:
+    """Persistent esummary metadata cache shared by all analyzer instances and processes."""
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / "esummary_cache.db"
+        self._init_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _init_database(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS esummary_cache (
+                    pmid TEXT PRIMARY KEY,
+                    metadata TEXT NOT NULL,
+                    fetch_date TEXT NOT NULL
+                )
+            """)
+    
+    def get_many(self, pmids: List[str]) -> Dict[str, Dict]:
+        """Return cached metadata for the given PMIDs (misses are omitted)."""
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(pmids), 900):
+                chunk = pmids[i:i + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT pmid, metadata FROM esummary_cache WHERE pmid IN ({placeholders})", chunk
+                ).fetchall()
+                for pmid, metadata in rows:
+                    found[pmid] = json.loads(metadata)
+        
+        # Fall back to per-PMID JSON files written by earlier versions
+        for pmid in pmids:
+            if pmid in found:
+                continue
+            legacy_file = self.cache_dir / f"pmid_{pmid}.json"
+            if legacy_file.exists():
+                try:
+                    with open(legacy_file, 'r') as f:
+                        found[pmid] = json.load(f)
+                except json.JSONDecodeError:
+                    continue
+        return found
+    
+    def store_many(self, records: Dict[str, Dict]):
+        """Store metadata for many PMIDs in one transaction."""
+        if not records:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO esummary_cache (pmid, metadata, fetch_date) VALUES (?, ?, ?)",
+                [(pmid, json.dumps(metadata), metadata.get('fetch_date', '')) for pmid, metadata in records.items()]
+            )
+
+
+def _analyze_texts(papers: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+    """Score a chunk of (pmid, text) pairs; runs in worker processes of suggest_papers_for_review.
+    
+    A paper that cannot be scored is logged and gets None, so one malformed
+    record does not abort the rest of the batch.
+    """
+    texts = [text for _, text in papers]
+    try:
+        batch_hits = keyword_index.scan_batch(texts)
+    except Exception:
+        # Scan each paper on its own, so only the malformed ones fail
+        batch_hits = [None] * len(papers)
+    
+    analyses = []
+    for (pmid, text), hits in zip(papers, batch_hits):
+        try:
+            analyses.append(BugSigDBAnalyzer.analyze_paper(text, hits))
+        except Exception as e:
+            logging.getLogger('BugSigDBAnalyzer').error(f"Error processing PMID {pmid}: {str(e)}")
+            analyses.append(None)
+    return analyses
 
 class BugSigDBAnalyzer:
     """Analyzer for identifying and processing microbial signatures in scientific papers."""
@@ -51,6 +143,14 @@ class BugSigDBAnalyzer:
             'soil', 'water', 'air', 'dust', 'surface', 'restroom', 'public'
         ]
     }
+    
+    SEQUENCING_PATTERNS = {
+        '16S rRNA': re.compile(r'16s\s*r(?:rna|RNA)'),
+        'shotgun metagenomics': re.compile(r'shotgun|whole\s*genome'),
+        'amplicon sequencing': re.compile(r'amplicon\s*sequenc'),
+        'transcriptomics': re.compile(r'transcriptom|rna[\-\s]*seq'),
+        'qPCR': re.compile(r'q(?:uantitative)?\s*pcr')
+    }
 
     def __init__(self, data_path: str = "data/full_dump.csv", cache_dir: str = "cache"):
         """Initialize the BugSigDB analyzer.
@@ -70,6 +170,8 @@ class BugSigDBAnalyzer:
         )
         self.logger = logging.getLogger('BugSigDBAnalyzer')
         
+        self.metadata_cache = EsummaryCache(self.cache_dir)
+        
         self._load_existing_data()
     
     def _load_existing_data(self):
@@ -87,7 +189,6 @@ class BugSigDBAnalyzer:
             self.logger.error(f"Error loading data: {str(e)}")
             raise
     
-    @lru_cache(maxsize=1000)
     def fetch_paper_metadata(self, pmid: str) -> Dict:
         """Fetch paper metadata from PubMed using E-utilities with caching.
         
@@ -97,55 +198,75 @@ class BugSigDBAnalyzer:
         Returns:
             Dictionary containing paper metadata
         """
-        cache_file = self.cache_dir / f"pmid_{pmid}.json"
+        return self.fetch_papers_metadata([pmid]).get(str(pmid), {})
+    
+    def fetch_papers_metadata(self, pmids: List[str], batch_size: int = ESUMMARY_BATCH_SIZE) -> Dict[str, Dict]:
+        """Fetch metadata for many papers with batched esummary calls.
         
-        # Check cache first
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                self.logger.warning(f"Invalid cache file for PMID {pmid}")
+        Cached PMIDs are served from the shared on-disk cache; the rest are
+        requested up to batch_size IDs per call.
+        
+        Args:
+            pmids: PubMed IDs to fetch
+            batch_size: Maximum number of IDs per esummary request
+            
+        Returns:
+            Dictionary mapping PMID to metadata (PMIDs that could not be fetched are omitted)
+        """
+        pmids = list(dict.fromkeys(str(pmid) for pmid in pmids))
+        results = self.metadata_cache.get_many(pmids)
+        missing = [pmid for pmid in pmids if pmid not in results]
         
         base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
         
-        try:
-            # Fetch summary
-            summary_url = f"{base_url}/esummary.fcgi?db=pubmed&id={pmid}&retmode=json"
-            response = requests.get(summary_url)
-            response.raise_for_status()
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            params = {'db': 'pubmed', 'id': ','.join(batch), 'retmode': 'json'}
+            if NCBI_API_KEY:
+                params['api_key'] = NCBI_API_KEY
             
-            data = response.json()
-            if 'result' in data and pmid in data['result']:
-                paper_data = data['result'][pmid]
-                metadata = {
-                    'title': paper_data.get('title', ''),
-                    'abstract': paper_data.get('abstract', ''),
-                    'pubdate': paper_data.get('pubdate', ''),
-                    'journal': paper_data.get('fulljournalname', ''),
-                    'mesh_terms': paper_data.get('meshheadinglist', []),
-                    'authors': paper_data.get('authors', []),
-                    'doi': paper_data.get('elocationid', ''),
-                    'fetch_date': datetime.now().isoformat()
-                }
+            try:
+                # POST keeps long ID lists out of the URL
+                response = requests.post(f"{base_url}/esummary.fcgi", data=params, timeout=60)
+                response.raise_for_status()
                 
-                # Cache the results
-                with open(cache_file, 'w') as f:
-                    json.dump(metadata, f)
+                data = response.json().get('result', {})
+                fetched = {}
+                for pmid in batch:
+                    if pmid not in data or 'error' in data[pmid]:
+                        continue
+                    paper_data = data[pmid]
+                    fetched[pmid] = {
+                        'title': paper_data.get('title', ''),
+                        'abstract': paper_data.get('abstract', ''),
+                        'pubdate': paper_data.get('pubdate', ''),
+                        'journal': paper_data.get('fulljournalname', ''),
+                        'mesh_terms': paper_data.get('meshheadinglist', []),
+                        'authors': paper_data.get('authors', []),
+                        'doi': paper_data.get('elocationid', ''),
+                        'fetch_date': datetime.now().isoformat()
+                    }
                 
-                sleep(0.34)  # Rate limiting for NCBI API
-                return metadata
+                # Cache the results
+                self.metadata_cache.store_many(fetched)
+                results.update(fetched)
+                self.logger.info(f"Fetched esummary batch {i // batch_size + 1}: {len(fetched)}/{len(batch)} PMIDs")
                 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error fetching metadata for PMID {pmid}: {str(e)}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.logger.error(f"Error fetching metadata for {len(batch)} PMIDs: {str(e)}")
+            
+            if i + batch_size < len(missing):
+                sleep(NCBI_RATE_LIMIT_DELAY)  # Rate limiting for NCBI API
         
-        return {}
+        return results
     
-    def analyze_paper(self, text: str) -> Dict:
+    @classmethod
+    def analyze_paper(cls, text: str, hits: Optional[KeywordHits] = None) -> Dict:
         """Analyze paper text for microbial signatures and metadata.
         
         Args:
             text: Paper text (title, abstract, or full text)
+            hits: Precomputed keyword_index scan of text; computed if omitted
             
         Returns:
             Dict containing analysis results including:
@@ -156,12 +277,14 @@ class BugSigDBAnalyzer:
             - body_sites: Detected body sites
             - disease_categories: Detected disease categories
         """
-        text = text.lower()
+        if hits is None:
+            hits = keyword_index.scan(text)
+        text = hits.text
         
         # Find signature-related terms
         found_terms = {
-            category: [term for term in terms if term in text]
-            for category, terms in self.SIGNATURE_KEYWORDS.items()
+            category: hits.found(terms)
+            for category, terms in cls.SIGNATURE_KEYWORDS.items()
         }
         
         # Calculate signature confidence
@@ -179,22 +302,14 @@ class BugSigDBAnalyzer:
         )
         
         # Detect sequencing types
-        sequencing_patterns = {
-            '16S rRNA': r'16s\s*r(?:rna|RNA)',
-            'shotgun metagenomics': r'shotgun|whole\s*genome',
-            'amplicon sequencing': r'amplicon\s*sequenc',
-            'transcriptomics': r'transcriptom|rna[\-\s]*seq',
-            'qPCR': r'q(?:uantitative)?\s*pcr'
-        }
-        
         sequencing_types = [
-            seq_type for seq_type, pattern in sequencing_patterns.items()
-            if re.search(pattern, text)
+            seq_type for seq_type, pattern in cls.SEQUENCING_PATTERNS.items()
+            if pattern.search(text)
         ]
         
         # Detect body sites and diseases
-        body_sites = self._detect_categories(text, self.BODY_SITES)
-        diseases = self._detect_categories(text, self.DISEASE_CATEGORIES)
+        body_sites = cls._detect_categories(text, cls.BODY_SITES, hits)
+        diseases = cls._detect_categories(text, cls.DISEASE_CATEGORIES, hits)
         
         return {
             'has_signatures': has_signatures,
@@ -207,56 +322,81 @@ class BugSigDBAnalyzer:
             'disease_categories': diseases
         }
     
-    def _detect_categories(self, text: str, category_dict: Dict[str, List[str]]) -> List[str]:
+    @staticmethod
+    def _detect_categories(text: str, category_dict: Dict[str, List[str]],
+                           hits: Optional[KeywordHits] = None) -> List[str]:
         """Helper method to detect categories (body sites, diseases, etc.) in text."""
+        if hits is None:
+            hits = keyword_index.scan(text)
         return [
             category for category, terms in category_dict.items()
-            if any(term in text for term in terms)
+            if hits.any(terms)
         ]
     
     def is_paper_in_bugsigdb(self, pmid: str) -> bool:
         """Check if paper is already in BugSigDB."""
         return str(pmid) in self.existing_pmids
     
-    def suggest_papers_for_review(self, pmids: List[str], min_confidence: float = 0.4) -> List[Dict]:
+    def suggest_papers_for_review(self, pmids: List[str], min_confidence: float = 0.4,
+                                  max_workers: Optional[int] = None) -> List[Dict]:
         """Analyze multiple papers and suggest those likely relevant for BugSigDB.
         
+        Metadata is fetched with batched esummary calls and, for large inputs,
+        scoring is spread over a process pool.
+        
         Args:
             pmids: List of PubMed IDs to analyze
             min_confidence: Minimum confidence threshold for suggestions
+            max_workers: Worker processes for scoring (defaults to CPU count; 1 disables the pool)
             
         Returns:
             List of dicts containing analysis results for relevant papers
         """
         suggestions = []
         
+        candidate_pmids = []
         for pmid in pmids:
             if self.is_paper_in_bugsigdb(pmid):
                 self.logger.debug(f"Skipping PMID {pmid} - already in BugSigDB")
                 continue
-                
-            try:
-                metadata = self.fetch_paper_metadata(pmid)
-                if not metadata:
-                    continue
-            
-                # Analyze title and abstract
-                text_to_analyze = f"{metadata['title']} {metadata['abstract']}"
-                analysis = self.analyze_paper(text_to_analyze)
-            
-                if analysis['has_signatures'] and analysis['confidence'] > min_confidence:
-                    suggestion = {
-                        'pmid': pmid,
-                        'analysis_date': datetime.now().isoformat(),
-                        **metadata,
-                        **analysis
-                    }
-                    suggestions.append(suggestion)
-                    self.logger.info(f"Found relevant paper: PMID {pmid} (confidence: {analysis['confidence']:.2f})")
-            
-            except Exception as e:
-                self.logger.error(f"Error processing PMID {pmid}: {str(e)}")
+            candidate_pmids.append(str(pmid))
+        
+        all_metadata = self.fetch_papers_metadata(candidate_pmids)
+        
+        candidates = []
+        for pmid in candidate_pmids:
+            metadata = all_metadata.get(pmid)
+            if not metadata:
+                continue
+            if not isinstance(metadata, dict):
+                self.logger.error(f"Error processing PMID {pmid}: malformed metadata")
+                continue
+            # Analyze title and abstract
+            candidates.append((pmid, metadata, f"{metadata.get('title', '')} {metadata.get('abstract', '')}"))
+        
+        papers = [(pmid, text) for pmid, _, text in candidates]
+        workers = max_workers or os.cpu_count() or 1
+        
+        if workers > 1 and len(papers) >= PARALLEL_SCORING_THRESHOLD:
+            chunk_size = max(1, len(papers) // (workers * 4))
+            chunks = [papers[i:i + chunk_size] for i in range(0, len(papers), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                analyses = [analysis for chunk in executor.map(_analyze_texts, chunks) for analysis in chunk]
+        else:
+            analyses = _analyze_texts(papers)
+        
+        for (pmid, metadata, _), analysis in zip(candidates, analyses):
+            if analysis is None:
                 continue
+            if analysis['has_signatures'] and analysis['confidence'] > min_confidence:
+                suggestion = {
+                    'pmid': pmid,
+                    'analysis_date': datetime.now().isoformat(),
+                    **metadata,
+                    **analysis
+                }
+                suggestions.append(suggestion)
+                self.logger.info(f"Found relevant paper: PMID {pmid} (confidence: {analysis['confidence']:.2f})")
         
         return suggestions 
 
@@ -273,4 +413,10 @@ class BugSigDBAnalyzer:
             self.logger.info(f"Exported {len(suggestions)} suggestions to {output_file}")
         except Exception as e:
             self.logger.error(f"Error exporting suggestions: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+
+# Register the analyzer's dictionaries with the shared keyword index
+keyword_index.register('bugsigdb_signatures', BugSigDBAnalyzer.SIGNATURE_KEYWORDS)
+keyword_index.register('bugsigdb_body_sites', BugSigDBAnalyzer.BODY_SITES)
+keyword_index.register('bugsigdb_diseases', BugSigDBAnalyzer.DISEASE_CATEGORIES)
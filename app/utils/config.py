@@ -1,7 +1,6 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
 import logging
 
 # Load environment variables from .env file
@@ -26,6 +25,7 @@ def validate_gemini_key():
     if not GEMINI_API_KEY:
         return False
     try:
+        import google.generativeai as genai
         genai.configure(api_key=GEMINI_API_KEY)
         return True
     except Exception as e:
@@ -88,6 +88,19 @@ MAX_CACHE_SIZE = int(os.getenv("MAX_CACHE_SIZE", "1000"))  # number of entries
 # Rate Limiting
 NCBI_RATE_LIMIT_DELAY = float(os.getenv("NCBI_RATE_LIMIT_DELAY", "0.34"))  # seconds
 MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "3"))
+ESUMMARY_BATCH_SIZE = int(os.getenv("ESUMMARY_BATCH_SIZE", "500"))  # PMIDs per esummary call
+# Per WebSocket connection: paper analyses running at once, and messages in progress
+# before new ones are rejected
+WS_MAX_CONCURRENT_ANALYSES = int(os.getenv("WS_MAX_CONCURRENT_ANALYSES", "2"))
+WS_MAX_PENDING_MESSAGES = int(os.getenv("WS_MAX_PENDING_MESSAGES", "16"))
+# Chat memory: tokens of recent turns sent with each chat prompt, and tokens of the
+# rolling summary that older turns are folded into
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "2000"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+
+# Startup: comma-separated components to build in the background after startup
+# (e.g. "text_processor,preprocessor"); by default they load on first use
+WARMUP_COMPONENTS = [name.strip() for name in os.getenv("WARMUP_COMPONENTS", "").split(",") if name.strip()]
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -100,7 +113,7 @@ LOG_DIR.mkdir(exist_ok=True)
 
 # Main application log
 MAIN_LOG_FILE = LOG_DIR / "bioanalyzer.log"
-# Performance log for PMID queries
+# Performance log for PMID queries (JSON lines, written only by app.utils.performance_logger)
 PERFORMANCE_LOG_FILE = LOG_DIR / "performance.log"
 # Error log for detailed error tracking
 ERROR_LOG_FILE = LOG_DIR / "errors.log"
@@ -111,6 +124,30 @@ API_LOG_FILE = LOG_DIR / "api_calls.log"
 MAX_LOG_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_LOG_FILES = 5  # Keep 5 rotated log files
 
+# Performance log pipeline: records queued for the writer thread before new ones are
+# dropped, and the fraction of successful cache reads that are logged
+PERF_LOG_QUEUE_SIZE = int(os.getenv("PERF_LOG_QUEUE_SIZE", "10000"))
+PERF_LOG_CACHE_HIT_SAMPLE_RATE = float(os.getenv("PERF_LOG_CACHE_HIT_SAMPLE_RATE", "0.1"))
+
+# Request tracing: exporter for finished spans ("file", "otlp" or "none"), the JSON
+# lines file used by the file exporter (rotated at MAX_LOG_SIZE), and the OTLP/HTTP
+# collector base URL
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+TRACE_FILE = LOG_DIR / "traces.jsonl"
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "bioanalyzer")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+
+# Debug endpoints (/debug/profile, /debug/tasks): token expected in the X-Admin-Token
+# header; the endpoints are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+DEBUG_PROFILE_MAX_SECONDS = int(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "60"))
+
+# Event loop monitor: lag that counts as a stall (its stack is recorded), and whether
+# known blocking calls made on the event loop are logged ("warn") or raise ("raise")
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))  # seconds
+LOOP_BLOCKING_DEBUG = os.getenv("LOOP_BLOCKING_DEBUG", "").lower()
+
 def setup_logging():
     """Setup comprehensive logging configuration with file rotation."""
     import logging.handlers
@@ -134,16 +171,6 @@ def setup_logging():
     main_file_handler.setLevel(logging.INFO)
     main_file_handler.setFormatter(file_formatter)
     
-    # Performance log handler
-    perf_file_handler = logging.handlers.RotatingFileHandler(
-        PERFORMANCE_LOG_FILE,
-        maxBytes=MAX_LOG_SIZE,
-        backupCount=MAX_LOG_FILES,
-        encoding='utf-8'
-    )
-    perf_file_handler.setLevel(logging.INFO)
-    perf_file_handler.setFormatter(file_formatter)
-    
     # Error log handler
     error_file_handler = logging.handlers.RotatingFileHandler(
         ERROR_LOG_FILE,
@@ -175,7 +202,6 @@ def setup_logging():
     # Add all handlers
     root_logger.addHandler(console_handler)
     root_logger.addHandler(main_file_handler)
-    root_logger.addHandler(perf_file_handler)
     root_logger.addHandler(error_file_handler)
     root_logger.addHandler(api_file_handler)
     
@@ -1,56 +1,185 @@
-from typing import List, Dict, Optional
+"""
+Token-bounded conversation history.
+
+ConversationMemory keeps messages in a deque together with their token counts
+and a running total, so adding a message and trimming the oldest ones are O(1)
+per message. Messages pushed out of the token budget are folded into a rolling
+summary (one short extract per turn, itself bounded in tokens), so a prompt
+built from the memory stays the same size however long the conversation runs.
+The formatted context is cached until the memory changes.
+"""
+
+from typing import Callable, Deque, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
+from collections import deque
 import json
+import re
+
+from app.utils.config import CHAT_HISTORY_MAX_TOKENS, CHAT_SUMMARY_MAX_TOKENS
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def approximate_tokens(text: str) -> int:
+    """Token estimate at 4 characters per token, for when no tokenizer is loaded."""
+    return (len(text) + 3) // 4
+
 
 @dataclass
 class Message:
     role: str  # 'user' or 'assistant'
     content: str
     timestamp: str = None
-    
+    tokens: int = 0
+
     def __post_init__(self):
         if self.timestamp is None:
             self.timestamp = datetime.now().isoformat()
 
+    def format(self) -> str:
+        return f"{ROLE_LABELS.get(self.role, self.role.capitalize())}: {self.content}"
+
+
 class ConversationMemory:
-    def __init__(self, max_history: int = 100):
-        self.messages: List[Message] = []
+    def __init__(
+        self,
+        max_history: int = 100,
+        max_tokens: int = CHAT_HISTORY_MAX_TOKENS,
+        summary_max_tokens: int = CHAT_SUMMARY_MAX_TOKENS,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        summary_chars: int = 200
+    ):
+        """
+        Args:
+            max_history: Maximum number of messages kept verbatim
+            max_tokens: Token budget of the messages kept verbatim
+            summary_max_tokens: Token budget of the rolling summary (0 disables it)
+            count_tokens: Tokenizer-backed counter, e.g. AdvancedTextProcessor.count_tokens
+                (default: approximate_tokens)
+            summary_chars: Characters of an evicted message kept in the summary
+        """
+        self.messages: Deque[Message] = deque()
         self.max_history = max_history
-    
-    def add_message(self, role: str, content: str):
-        """Add a new message to the conversation history"""
-        message = Message(role=role, content=content)
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.count_tokens = count_tokens or approximate_tokens
+        self.summary_chars = summary_chars
+        self.total_tokens = 0
+        self.summary_tokens = 0
+        self.evicted = 0
+        self._summary: Deque[Tuple[str, int]] = deque()
+        # Formatted context per budget, dropped whenever the memory changes
+        self._context_cache: Dict[Optional[int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add_message(self, role: str, content: str, timestamp: Optional[str] = None):
+        """Add a new message, folding the oldest ones into the summary when over budget"""
+        message = Message(role=role, content=content, timestamp=timestamp)
+        message.tokens = self.count_tokens(message.format()) + 1  # + the newline
         self.messages.append(message)
-        
-        # Trim history if it exceeds max_history
-        if len(self.messages) > self.max_history:
-            self.messages = self.messages[-self.max_history:]
-    
+        self.total_tokens += message.tokens
+
+        # The newest message is kept even if it alone exceeds the budget
+        while len(self.messages) > 1 and (
+                len(self.messages) > self.max_history or self.total_tokens > self.max_tokens):
+            self._evict()
+        self._context_cache.clear()
+
+    def _evict(self):
+        message = self.messages.popleft()
+        self.total_tokens -= message.tokens
+        self.evicted += 1
+        if self.summary_max_tokens <= 0:
+            return
+
+        # The first sentence of a turn usually carries the question or the answer
+        text = " ".join(message.content.split())
+        extract = _SENTENCE_END.split(text, 1)[0]
+        if len(extract) > self.summary_chars:
+            extract = extract[:self.summary_chars].rsplit(" ", 1)[0] + "..."
+        line = f"- {ROLE_LABELS.get(message.role, message.role.capitalize())}: {extract}"
+        tokens = self.count_tokens(line) + 1
+        self._summary.append((line, tokens))
+        self.summary_tokens += tokens
+        while len(self._summary) > 1 and self.summary_tokens > self.summary_max_tokens:
+            self.summary_tokens -= self._summary.popleft()[1]
+
+    @property
+    def summary(self) -> str:
+        """Rolling summary of the messages no longer kept verbatim"""
+        return "\n".join(line for line, _ in self._summary)
+
     def get_conversation_history(self, last_n: Optional[int] = None) -> List[Dict]:
         """Get the conversation history as a list of dictionaries"""
-        history = self.messages[-last_n:] if last_n else self.messages
-        return [{"role": msg.role, "content": msg.content, "timestamp": msg.timestamp} 
+        history = list(self.messages)[-last_n:] if last_n else self.messages
+        return [{"role": msg.role, "content": msg.content, "timestamp": msg.timestamp}
                 for msg in history]
-    
-    def get_formatted_context(self, max_tokens: int = 1024) -> str:
-        """Get conversation history formatted as context for the model"""
-        context = []
-        for msg in self.messages:
-            context.append(f"{msg.role.upper()}: {msg.content}")
-        return "\n".join(context[-max_tokens:])
-    
+
+    def get_formatted_context(self, max_tokens: Optional[int] = None) -> str:
+        """
+        Get conversation history formatted as context for the model.
+
+        Args:
+            max_tokens: Token budget of the recent messages (default: the memory's budget);
+                the summary comes on top
+
+        Returns:
+            The summary of older turns followed by the most recent messages that fit
+        """
+        cached = self._context_cache.get(max_tokens)
+        if cached is not None:
+            return cached
+
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        recent = []
+        used = 0
+        for msg in reversed(self.messages):
+            if recent and used + msg.tokens > budget:
+                break
+            recent.append(msg.format())
+            used += msg.tokens
+        recent.reverse()
+
+        context = "\n".join(recent)
+        if self._summary:
+            context = f"Summary of the earlier conversation:\n{self.summary}\n\nRecent messages:\n{context}"
+        self._context_cache[max_tokens] = context
+        return context
+
+    def stats(self) -> Dict:
+        """Message, token and summary counts"""
+        return {
+            "messages": len(self.messages),
+            "tokens": self.total_tokens,
+            "max_tokens": self.max_tokens,
+            "evicted_messages": self.evicted,
+            "summary_lines": len(self._summary),
+            "summary_tokens": self.summary_tokens
+        }
+
     def save_to_file(self, filepath: str):
         """Save conversation history to a file"""
         with open(filepath, 'w') as f:
             json.dump(self.get_conversation_history(), f, indent=2)
-    
+
     def load_from_file(self, filepath: str):
         """Load conversation history from a file"""
         with open(filepath, 'r') as f:
             data = json.load(f)
-            self.messages = [Message(**msg) for msg in data]
-            
+        self.clear()
+        for msg in data:
+            self.add_message(msg["role"], msg["content"], msg.get("timestamp"))
+
     def clear(self):
         """Clear the conversation history"""
-        self.messages = [] 
\ No newline at end of file
+        self.messages.clear()
+        self._summary.clear()
+        self.total_tokens = 0
+        self.summary_tokens = 0
+        self.evicted = 0
+        self._context_cache.clear()
@@ -5,10 +5,10 @@ This module provides comprehensive validation and extraction utilities for the 6
 It ensures consistent field structure and improves extraction accuracy.
 """
 
-import re
 import logging
 from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from app.utils.pattern_matcher import PatternScan, PatternTableMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -74,8 +74,24 @@ class EnhancedFieldValidator:
             "PARTIALLY_PRESENT": (0.4, 0.7),
             "ABSENT": (0.0, 0.3)
         }
+        
+        # Compile all pattern tables once for single-pass scanning
+        self.matcher = PatternTableMatcher(self.field_patterns)
+    
+    def scan_text(self, text: str) -> PatternScan:
+        """
+        Scan text once for the patterns of every field.
+        
+        Args:
+            text: Full text content for validation
+            
+        Returns:
+            PatternScan with per-field, per-category hits that all validators can reuse
+        """
+        return self.matcher.scan(text.lower())
     
-    def validate_field(self, field_name: str, text: str, extracted_data: Dict) -> FieldValidationResult:
+    def validate_field(self, field_name: str, text: str, extracted_data: Dict,
+                       scan: Optional[PatternScan] = None) -> FieldValidationResult:
         """
         Validate a specific field based on extracted data and text content.
         
@@ -83,6 +99,7 @@ class EnhancedFieldValidator:
             field_name: Name of the field to validate
             text: Full text content for validation
             extracted_data: Data extracted by the LLM
+            scan: Precomputed scan_text result for text; computed if omitted
             
         Returns:
             FieldValidationResult with validation details
@@ -95,7 +112,7 @@ class EnhancedFieldValidator:
                 return self._create_absent_result(field_name, "No content extracted")
             
             # Validate against patterns
-            pattern_match = self._check_pattern_match(field_name, content_value, text)
+            pattern_match = self._check_pattern_match(field_name, content_value, text, scan)
             
             if pattern_match["confidence"] >= 0.8:
                 status = "PRESENT"
@@ -137,25 +154,24 @@ class EnhancedFieldValidator:
         key = content_keys.get(field_name, "value")
         return extracted_data.get(key, "")
     
-    def _check_pattern_match(self, field_name: str, content_value: str, text: str) -> Dict[str, float]:
+    def _check_pattern_match(self, field_name: str, content_value: str, text: str,
+                             scan: Optional[PatternScan] = None) -> Dict[str, float]:
         """Check how well the content matches expected patterns."""
         if field_name not in self.field_patterns:
             return {"confidence": 0.0, "matches": []}
         
-        text_lower = text.lower()
+        if scan is None:
+            scan = self.scan_text(text)
         content_lower = content_value.lower()
         
         best_match = {"confidence": 0.0, "matches": []}
         
-        for category, patterns in self.field_patterns[field_name].items():
-            category_matches = []
-            for pattern in patterns:
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    category_matches.append(pattern)
+        for category in self.field_patterns[field_name]:
+            category_matches = scan.matched_patterns(field_name, category)
             
             if category_matches:
                 # Check if content matches the category
-                if any(re.search(pattern, content_lower, re.IGNORECASE) for pattern in category_matches):
+                if any(self.matcher.compiled[pattern].search(content_lower) for pattern in category_matches):
                     confidence = min(1.0, len(category_matches) * 0.2 + 0.6)
                 else:
                     confidence = min(1.0, len(category_matches) * 0.1 + 0.3)
@@ -224,10 +240,13 @@ class FieldExtractionEnhancer:
         """
         enhanced_data = {}
         
+        # Scan the full text once; every field validator reuses the hits
+        scan = self.validator.scan_text(full_text) if isinstance(full_text, str) else None
+        
         for field_name in ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]:
             if field_name in extracted_data:
                 # Validate the field
-                validation_result = self.validator.validate_field(field_name, full_text, extracted_data[field_name])
+                validation_result = self.validator.validate_field(field_name, full_text, extracted_data[field_name], scan)
                 
                 # Update the field with validation results
                 enhanced_data[field_name] = {
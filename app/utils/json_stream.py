@@ -0,0 +1,274 @@
+"""
+Tolerant and Incremental JSON Parsing for LLM Responses
+
+LLM responses frequently arrive wrapped in markdown code fences, carry trailing
+commas, or are cut off mid-object when a stream ends early. This module provides
+a repair step that recovers as much valid JSON as possible from such output and
+an incremental parser that emits each top-level field of a streamed JSON object
+as soon as it is complete.
+"""
+
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CODE_FENCE = re.compile(r"```[a-zA-Z0-9_-]*[ \t]*\r?\n?(.*?)(?:```|$)", re.DOTALL)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Number of cut points tried when recovering a truncated document
+_MAX_REPAIR_ATTEMPTS = 64
+
+
+def strip_code_fences(text: str) -> str:
+    """
+    Remove markdown code fences around a JSON payload.
+
+    Args:
+        text: Raw LLM response text
+
+    Returns:
+        Content of the first fenced block, or the original text when unfenced
+    """
+    if "```" not in text:
+        return text.strip()
+    match = _CODE_FENCE.search(text)
+    if match:
+        return match.group(1).strip()
+    return text.strip()
+
+
+def repair_json(text: str) -> str:
+    """
+    Repair common defects in LLM-generated JSON.
+
+    Handles code fences, leading/trailing prose, trailing commas and documents
+    truncated mid-value. Incomplete trailing members are dropped rather than
+    guessed at, so every value in the repaired document was fully generated.
+
+    Args:
+        text: Raw LLM response text
+
+    Returns:
+        Repaired JSON text, or the unrepaired text (which fails to parse) when no
+        member of the document was complete
+    """
+    text = strip_code_fences(text)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return text
+
+    out: List[str] = []
+    stack: List[str] = []
+    # (output length, open brackets) at every structural comma, used as cut points
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = False
+    escape = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                # Ignore anything after the root value (prose, closing fences)
+                return "".join(out)
+        elif ch == ",":
+            cut_points.append((len(out), tuple(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    # The document was truncated: close it at the latest point that parses
+    if not in_string:
+        candidate = "".join(out).rstrip().rstrip(",")
+        candidate += "".join(_CLOSERS[b] for b in reversed(stack))
+        if _is_valid(candidate) and json.loads(candidate):
+            return candidate
+
+    for length, open_brackets in reversed(cut_points[-_MAX_REPAIR_ATTEMPTS:]):
+        candidate = "".join(out[:length]).rstrip()
+        candidate += "".join(_CLOSERS[b] for b in reversed(open_brackets))
+        if _is_valid(candidate):
+            return candidate
+
+    # Nothing complete beyond the opening bracket: an empty object would read as
+    # a valid response in which nothing was found, so leave the text invalid
+    return text[start:]
+
+
+def parse_llm_json(text: str) -> Any:
+    """
+    Parse JSON from an LLM response, repairing it when necessary.
+
+    Args:
+        text: Raw LLM response text
+
+    Returns:
+        Parsed JSON value
+
+    Raises:
+        json.JSONDecodeError: If no JSON could be recovered, including documents
+            truncated before their first complete member
+    """
+    cleaned = strip_code_fences(text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+
+    repaired = repair_json(text)
+    result = json.loads(repaired)
+    logger.debug("Recovered LLM JSON response with repair step")
+    return result
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    """Remove a dangling comma (and whitespace) before a closing bracket."""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+def _is_valid(candidate: str) -> bool:
+    try:
+        json.loads(candidate)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed JSON object.
+
+    Text chunks are fed as they arrive; every top-level member of the root object
+    is returned as soon as its value is complete, without waiting for the rest of
+    the document. Leading prose and code fences before the root object are skipped.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._finished = False
+        self._member_start: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def text(self) -> str:
+        """All text received so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume a chunk of streamed text.
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            List of (key, value) pairs for top-level members completed by this chunk
+        """
+        if not chunk:
+            return []
+        self._text += chunk
+        if self._finished:
+            return []
+
+        completed = []
+        text = self._text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            i = self._pos
+            self._pos += 1
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._pos
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_member(text[self._member_start:i], completed)
+                    self._finished = True
+                    break
+            elif ch == "," and self._depth == 1:
+                self._emit_member(text[self._member_start:i], completed)
+                self._member_start = self._pos
+
+        return completed
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish parsing and return the full object.
+
+        Uses the repair step on the accumulated text, so truncated or slightly
+        malformed streams still yield every complete field.
+
+        Raises:
+            json.JSONDecodeError: If no JSON object could be recovered
+        """
+        result = parse_llm_json(self._text)
+        if not isinstance(result, dict):
+            raise json.JSONDecodeError("Expected a JSON object", self._text, 0)
+        return result
+
+    def _emit_member(self, member: str, completed: List[Tuple[str, Any]]) -> None:
+        member = member.strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            try:
+                parsed = json.loads(repair_json("{" + member + "}"))
+            except json.JSONDecodeError:
+                logger.debug(f"Skipping unparseable streamed member: {member[:80]}")
+                return
+        if not isinstance(parsed, dict):
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
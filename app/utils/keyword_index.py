@@ -0,0 +1,149 @@
+"""
+Shared keyword index for single-pass document scanning.
+
+Scorers register their term dictionaries once; the union of all terms is compiled
+into one multi-literal matcher, and each document is scanned a single time to
+produce a term → positions map that every scorer consumes.
+"""
+
+import bisect
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from app.utils.pattern_matcher import LiteralMatcher
+
+logger = logging.getLogger(__name__)
+
+# Separator between documents in a batch scan; never part of a registered term
+_DOCUMENT_SEPARATOR = "\x00"
+
+
+class KeywordHits:
+    """Term occurrences found by a KeywordIndex scan over one document."""
+
+    def __init__(self, text: str, positions: Dict[str, List[int]]):
+        self.text = text
+        self.positions = positions
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.positions
+
+    def found(self, terms: Iterable[str]) -> List[str]:
+        """Terms present in the document, in the given order."""
+        return [term for term in terms if term in self.positions]
+
+    def first(self, terms: Iterable[str]) -> Optional[str]:
+        """First of the given terms present in the document, if any."""
+        for term in terms:
+            if term in self.positions:
+                return term
+        return None
+
+    def any(self, terms: Iterable[str]) -> bool:
+        """Whether any of the given terms is present in the document."""
+        return any(term in self.positions for term in terms)
+
+    def whole_words(self, term: str) -> List[int]:
+        """Positions where the term occurs as a whole word (regex ``\\b`` semantics)."""
+        end_offset = len(term)
+        return [
+            start for start in self.positions.get(term, [])
+            if not _is_word_char(self.text, start - 1) and not _is_word_char(self.text, start + end_offset)
+        ]
+
+
+def _is_word_char(text: str, index: int) -> bool:
+    if index < 0 or index >= len(text):
+        return False
+    ch = text[index]
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordIndex:
+    """Term dictionaries from all scorers, compiled for one scan per document."""
+
+    def __init__(self):
+        self._dictionaries: Dict[str, Dict[str, List[str]]] = {}
+        self._matcher: Optional[LiteralMatcher] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, dictionary: Dict[str, List[str]]):
+        """
+        Register (or replace) a named term dictionary.
+
+        Args:
+            name: Dictionary name, e.g. the owning scorer
+            dictionary: Mapping of category to its list of terms
+        """
+        with self._lock:
+            if self._dictionaries.get(name) == dictionary:
+                return
+            self._dictionaries[name] = {category: list(terms) for category, terms in dictionary.items()}
+            self._matcher = None
+
+    @property
+    def terms(self) -> List[str]:
+        """All registered terms."""
+        return self._get_matcher().literals
+
+    def _get_matcher(self) -> LiteralMatcher:
+        with self._lock:
+            if self._matcher is None:
+                terms = {
+                    term
+                    for dictionary in self._dictionaries.values()
+                    for terms in dictionary.values()
+                    for term in terms
+                }
+                self._matcher = LiteralMatcher(terms)
+                logger.debug(f"Compiled keyword index with {len(terms)} terms from {len(self._dictionaries)} dictionaries")
+            return self._matcher
+
+    def scan(self, text: str) -> KeywordHits:
+        """
+        Scan one document for every registered term.
+
+        Args:
+            text: Document text; it is lowercased before matching
+
+        Returns:
+            KeywordHits for the document
+        """
+        text = text.lower()
+        return KeywordHits(text, self._get_matcher().positions(text))
+
+    def scan_batch(self, texts: List[str]) -> List[KeywordHits]:
+        """
+        Scan many documents with a single pass over their concatenation.
+
+        Args:
+            texts: Document texts
+
+        Returns:
+            KeywordHits for each document, in input order
+        """
+        lowered = [text.lower().replace(_DOCUMENT_SEPARATOR, " ") for text in texts]
+        if not lowered:
+            return []
+
+        starts = []
+        offset = 0
+        for text in lowered:
+            starts.append(offset)
+            offset += len(text) + 1
+
+        positions: List[Dict[str, List[int]]] = [{} for _ in lowered]
+        for term, start in self._get_matcher().finditer(_DOCUMENT_SEPARATOR.join(lowered)):
+            doc = bisect.bisect_right(starts, start) - 1
+            positions[doc].setdefault(term, []).append(start - starts[doc])
+
+        for doc_positions in positions:
+            for offsets in doc_positions.values():
+                offsets.sort()
+
+        return [KeywordHits(text, doc_positions) for text, doc_positions in zip(lowered, positions)]
+
+
+# Global keyword index shared by all scorers
+keyword_index = KeywordIndex()
@@ -0,0 +1,209 @@
+"""
+BM25 inverted index over the conversation knowledge base.
+
+The knowledge base is tokenized with vectorized pandas string operations and
+compiled into CSR-style postings: one ``indptr`` array of offsets per term into
+flat ``doc_ids``/``term_freqs`` arrays. The arrays are saved to an ``.npz`` file
+together with a fingerprint of the indexed columns, so the index is rebuilt only
+when the knowledge base changes.
+"""
+
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Lowercased alphanumeric runs; hyphens and punctuation split terms
+_TOKEN_PATTERN = r"[a-z0-9]+"
+
+# Knowledge base columns indexed by default
+DEFAULT_FIELDS = ("keywords", "title")
+
+
+def _tokenize(text: str) -> List[str]:
+    # Same tokens as the vectorized tokenization in KnowledgeIndex.build
+    return re.findall(_TOKEN_PATTERN, text.lower())
+
+
+def fingerprint(knowledge_base: pd.DataFrame, fields: Sequence[str] = DEFAULT_FIELDS) -> str:
+    """Hash of the indexed columns of a knowledge base."""
+    columns = [field for field in fields if field in knowledge_base.columns]
+    digest = hashlib.sha1(",".join(columns).encode())
+    if columns:
+        digest.update(pd.util.hash_pandas_object(knowledge_base[columns], index=False).values.tobytes())
+    digest.update(str(len(knowledge_base)).encode())
+    return digest.hexdigest()
+
+
+class KnowledgeIndex:
+    """Inverted index with BM25 ranking over knowledge base rows."""
+
+    def __init__(
+        self,
+        vocabulary: np.ndarray,
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        fingerprint: str = "",
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        self.vocabulary = vocabulary
+        self.term_ids = {term: i for i, term in enumerate(vocabulary.tolist())}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+
+        num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if num_docs else 0.0
+        self.length_norm = k1 * (1 - b + b * doc_lengths / max(self.avg_doc_length, 1e-9))
+        doc_freqs = np.diff(indptr)
+        self.idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, knowledge_base: pd.DataFrame, fields: Sequence[str] = DEFAULT_FIELDS) -> "KnowledgeIndex":
+        """
+        Build the index from the given knowledge base columns.
+
+        Args:
+            knowledge_base: Knowledge base, one entry per row
+            fields: Text columns to index (missing columns are skipped)
+
+        Returns:
+            KnowledgeIndex whose document ids are row positions
+        """
+        num_docs = len(knowledge_base)
+        columns = [field for field in fields if field in knowledge_base.columns]
+        text = pd.Series([""] * num_docs, dtype=object)
+        for column in columns:
+            text = text + " " + knowledge_base[column].fillna("").astype(str).to_numpy(dtype=object)
+
+        # One row per (document position, token) occurrence
+        tokens = text.str.lower().str.findall(_TOKEN_PATTERN).explode().dropna()
+        doc_positions = tokens.index.to_numpy(dtype=np.int64)
+        codes, vocabulary = pd.factorize(tokens.to_numpy(), sort=True)
+
+        # Collapse occurrences into (term, document) postings with term frequencies
+        pairs, term_freqs = np.unique(codes.astype(np.int64) * max(num_docs, 1) + doc_positions, return_counts=True)
+        posting_terms = pairs // max(num_docs, 1)
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(vocabulary)), out=indptr[1:])
+
+        index = cls(
+            vocabulary=np.asarray(vocabulary, dtype=str),
+            indptr=indptr,
+            doc_ids=(pairs % max(num_docs, 1)).astype(np.int32),
+            term_freqs=term_freqs.astype(np.int32),
+            doc_lengths=np.bincount(doc_positions, minlength=num_docs).astype(np.int32),
+            fingerprint=fingerprint(knowledge_base, fields)
+        )
+        logger.info(f"Built knowledge index: {num_docs} entries, {len(vocabulary)} terms, {len(pairs)} postings")
+        return index
+
+    def save(self, path: Path):
+        """Write the index arrays to an .npz file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                vocabulary=self.vocabulary,
+                indptr=self.indptr,
+                doc_ids=self.doc_ids,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+                fingerprint=np.array(self.fingerprint)
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "KnowledgeIndex":
+        """Read an index written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                vocabulary=data["vocabulary"],
+                indptr=data["indptr"],
+                doc_ids=data["doc_ids"],
+                term_freqs=data["term_freqs"],
+                doc_lengths=data["doc_lengths"],
+                fingerprint=str(data["fingerprint"])
+            )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        knowledge_base: pd.DataFrame,
+        path: Path,
+        fields: Sequence[str] = DEFAULT_FIELDS
+    ) -> "KnowledgeIndex":
+        """
+        Load the index saved at path, rebuilding it if the knowledge base changed.
+
+        Args:
+            knowledge_base: Knowledge base, one entry per row
+            path: Location of the saved index
+            fields: Text columns to index
+
+        Returns:
+            KnowledgeIndex for the knowledge base
+        """
+        path = Path(path)
+        expected = fingerprint(knowledge_base, fields)
+        if path.exists():
+            try:
+                index = cls.load(path)
+                if index.fingerprint == expected:
+                    return index
+                logger.info(f"Knowledge base changed, rebuilding index at {path}")
+            except Exception as e:
+                logger.warning(f"Could not load knowledge index from {path}: {str(e)}")
+
+        index = cls.build(knowledge_base, fields)
+        try:
+            index.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save knowledge index to {path}: {str(e)}")
+        return index
+
+    def search(self, query: str, k: int = 5) -> List[int]:
+        """
+        Rank knowledge base rows against a query with BM25.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of rows to return
+
+        Returns:
+            Row positions of the best matching entries, best first; rows sharing no
+            term with the query are never returned
+        """
+        term_ids = {self.term_ids[token] for token in _tokenize(query) if token in self.term_ids}
+        if not term_ids or k <= 0:
+            return []
+
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Highest score first, ties by row position
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order].tolist()
@@ -0,0 +1,162 @@
+"""
+Mergeable quantile sketches for latency percentiles.
+
+LatencySketch keeps logarithmically spaced buckets, so any quantile is reported
+within a fixed relative error (1% by default) using memory proportional to the
+log of the value range rather than the number of samples. Sketches of the same
+accuracy merge exactly, which RollingSketch uses to answer quantiles over a
+sliding time window from per-slot sketches.
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class LatencySketch:
+    """Relative-error quantile sketch over non-negative values."""
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6):
+        """
+        Args:
+            relative_accuracy: Maximum relative error of reported quantiles
+            min_value: Values at or below this are counted in a single zero bucket
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, float] = {}
+        self.zero_count = 0.0
+        self.count = 0.0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0):
+        """
+        Record a value.
+
+        Args:
+            value: Observed value, e.g. a duration in seconds
+            weight: Number of observations it stands for (1 / sample rate for sampled logs)
+        """
+        if value <= self.min_value:
+            self.zero_count += weight
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0.0) + weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencySketch"):
+        """Add all observations of another sketch with the same accuracy."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, weight in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0.0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable state, e.g. to save a histogram with a benchmark report."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "buckets": {str(key): weight for key, weight in sorted(self.buckets.items())},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencySketch":
+        """Rebuild a sketch saved with to_dict, so saved histograms can be merged."""
+        sketch = cls(data["relative_accuracy"], data["min_value"])
+        sketch.buckets = {int(key): weight for key, weight in data["buckets"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if data["count"]:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q: Quantile in [0, 1], e.g. 0.95
+
+        Returns:
+            Estimated value, or None if the sketch is empty
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key], clamped to observed values
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+
+class RollingSketch:
+    """Quantiles over a sliding time window, kept as one sketch per time slot."""
+
+    def __init__(self, window: float = 300.0, slots: int = 30, relative_accuracy: float = 0.01):
+        """
+        Args:
+            window: Window length in seconds
+            slots: Number of slots the window is divided into
+            relative_accuracy: Accuracy of the per-slot sketches
+        """
+        self.window = window
+        self.slot_length = window / slots
+        self.relative_accuracy = relative_accuracy
+        self._slots: Deque[Tuple[int, LatencySketch]] = deque()
+
+    def add(self, value: float, timestamp: float, weight: float = 1.0):
+        """Record a value observed at the given time (seconds since the epoch)."""
+        slot = int(timestamp // self.slot_length)
+        if not self._slots or self._slots[-1][0] < slot:
+            self._slots.append((slot, LatencySketch(self.relative_accuracy)))
+            sketch = self._slots[-1][1]
+        else:
+            # Late records go to the latest held slot at or before their own, or to the
+            # oldest slot when they predate every held slot
+            sketch = next((s for key, s in reversed(self._slots) if key <= slot), self._slots[0][1])
+        sketch.add(value, weight)
+
+    def snapshot(self, now: float) -> LatencySketch:
+        """
+        Merge the slots inside the window ending at now, dropping older ones.
+
+        Returns:
+            Sketch of the observations in the window
+        """
+        oldest = int((now - self.window) // self.slot_length) + 1
+        while self._slots and self._slots[0][0] < oldest:
+            self._slots.popleft()
+
+        merged = LatencySketch(self.relative_accuracy)
+        for _, sketch in self._slots:
+            merged.merge(sketch)
+        return merged
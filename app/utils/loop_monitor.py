@@ -0,0 +1,246 @@
+"""
+Event-loop lag and executor saturation monitoring.
+
+LoopMonitor runs a heartbeat coroutine that sleeps for a fixed interval and
+records how late it wakes up; that lateness is the time other callbacks held
+the loop, i.e. what every client waited on top of its own work. A watchdog
+thread notices when the heartbeat is overdue by more than the threshold and
+captures the event loop thread's stack and current task while the loop is
+still blocked, so each stall is reported with the code that caused it.
+
+With LOOP_BLOCKING_DEBUG set, install_blocking_guards wraps known blocking
+calls (E-utilities retrieval, SQLite cache access, time.sleep) so that calling
+them on the event loop thread is logged ("warn") or raises BlockingCallError
+("raise"). Calls made from executor threads are unaffected.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from app.utils.config import LOOP_LAG_THRESHOLD
+from app.utils.latency_sketch import RollingSketch
+from app.utils.profiler import executor_stats
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "module:attribute" of calls that block and belong in an executor
+BLOCKING_CALLS = [
+    "app.services.data_retrieval:PubMedRetriever.get_paper_metadata",
+    "app.services.data_retrieval:PubMedRetriever.get_pmc_fulltext",
+    "app.services.data_retrieval:PubMedRetriever.get_paper_by_doi",
+    "app.services.cache_manager:CacheManager.get_analysis_result",
+    "app.services.cache_manager:CacheManager.store_analysis_result",
+    "app.services.cache_manager:CacheManager.get_metadata",
+    "app.services.cache_manager:CacheManager.store_metadata",
+    "app.services.cache_manager:CacheManager.get_fulltext",
+    "app.services.cache_manager:CacheManager.store_fulltext",
+    "app.services.cache_manager:CacheManager.get_cache_stats",
+    "app.services.cache_manager:CacheManager.clear_old_cache",
+    "app.services.cache_manager:CacheManager.search_cache",
+    "time:sleep",
+]
+
+
+class BlockingCallError(RuntimeError):
+    """A blocking call was made on the event loop thread."""
+
+
+def _stack(frame, limit: int = 30) -> List[str]:
+    """Frames of a stack as "function (file:line)", outermost first."""
+    return [f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+            for entry in traceback.extract_stack(frame, limit=limit)]
+
+
+def _origin(frame) -> Optional[str]:
+    """Innermost frame of a stack that belongs to the app package."""
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(_APP_DIR):
+            return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+        frame = frame.f_back
+    return None
+
+
+class LoopMonitor:
+    """Measures event-loop lag and records what was running during stalls."""
+
+    def __init__(self, threshold: float = LOOP_LAG_THRESHOLD, interval: float = 0.05, max_stalls: int = 50):
+        """
+        Args:
+            threshold: Lag in seconds that counts as a stall
+            interval: Heartbeat interval in seconds
+            max_stalls: Number of recent stalls kept with their stacks
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.lag = RollingSketch(window=300.0, slots=30)
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.stalls: Deque[Dict] = deque(maxlen=max_stalls)
+        self.blocking_calls: Counter = Counter()
+        self._executors: Dict[str, concurrent.futures.Executor] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_beat: Optional[float] = None
+        self._pending_stall: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register_executor(self, name: str, executor: concurrent.futures.Executor):
+        """Report the worker and queue counts of an executor with the metrics."""
+        self._executors[name] = executor
+
+    def start(self):
+        """Start monitoring the running event loop (call from a coroutine on it)."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        logger.info(f"Event loop monitor started (stall threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            start = time.perf_counter()
+            self._last_beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            self.lag.add(lag, time.time())
+            self.max_lag = max(self.max_lag, lag)
+
+            with self._lock:
+                stall, self._pending_stall = self._pending_stall, None
+            if lag >= self.threshold:
+                self.stall_count += 1
+                # The watchdog may miss stalls only slightly above the threshold
+                stall = stall or {"time": datetime.now().isoformat(), "task": None, "coroutine": None,
+                                  "origin": None, "stack": []}
+                stall["lag"] = round(lag, 4)
+                self.stalls.append(stall)
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms in "
+                               f"{stall['origin'] or stall['coroutine'] or 'unknown code'}")
+
+    def _watch(self):
+        """Capture the loop thread's stack once per overdue heartbeat."""
+        reported = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._last_beat
+            if beat is None or beat == reported:
+                continue
+            if time.perf_counter() - beat - self.interval < self.threshold:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            task = asyncio.current_task(self._loop) if self._loop else None
+            coro = task.get_coro() if task else None
+            stall = {
+                "time": datetime.now().isoformat(),
+                "task": task.get_name() if task else None,
+                "coroutine": getattr(coro, "__qualname__", None),
+                "origin": _origin(frame),
+                "stack": _stack(frame) if frame is not None else []
+            }
+            with self._lock:
+                self._pending_stall = stall
+
+    def executor_metrics(self) -> Dict[str, Optional[Dict]]:
+        """Worker and queue counts of the default executor and registered ones."""
+        metrics = {"default": executor_stats(getattr(self._loop, "_default_executor", None))}
+        for name, executor in self._executors.items():
+            metrics[name] = executor_stats(executor)
+        return metrics
+
+    def stats(self, include_stalls: bool = False) -> Dict:
+        """
+        Lag percentiles over the last 5 minutes, stall counts and executor metrics.
+
+        Args:
+            include_stalls: Add the recent stalls with their stacks
+        """
+        window = self.lag.snapshot(time.time())
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        stats = {
+            "running": self._task is not None,
+            "threshold_ms": ms(self.threshold),
+            "lag_p50_ms": ms(window.quantile(0.5)),
+            "lag_p99_ms": ms(window.quantile(0.99)),
+            "lag_max_ms": ms(window.max) if window.count else None,
+            "lag_max_since_start_ms": ms(self.max_lag),
+            "stalls": self.stall_count,
+            "blocking_calls": dict(self.blocking_calls.most_common()),
+            "executors": self.executor_metrics()
+        }
+        if include_stalls:
+            stats["recent_stalls"] = list(self.stalls)
+        return stats
+
+
+def _guard(func, name: str, mode: str):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return func(*args, **kwargs)  # not on the event loop thread
+
+        caller = sys._getframe(1)
+        site = f"{name} from {caller.f_code.co_name} ({os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno})"
+        if mode == "raise":
+            raise BlockingCallError(f"Blocking call on the event loop: {site}")
+        loop_monitor.blocking_calls[site] += 1
+        if loop_monitor.blocking_calls[site] == 1:
+            logger.warning(f"Blocking call on the event loop: {site}")
+        return func(*args, **kwargs)
+    wrapper.__blocking_guard__ = True
+    return wrapper
+
+
+def install_blocking_guards(mode: str = "warn", calls: Optional[List[str]] = None):
+    """
+    Wrap blocking calls so using them on the event loop thread is reported.
+
+    Args:
+        mode: "warn" logs each call site once and counts calls; "raise" raises BlockingCallError
+        calls: "module:attribute" paths to wrap (default: BLOCKING_CALLS)
+    """
+    if mode not in ("warn", "raise"):
+        raise ValueError(f"Unknown blocking call mode '{mode}' (use 'warn' or 'raise')")
+    for path in calls or BLOCKING_CALLS:
+        module_name, _, attribute = path.partition(":")
+        owner = importlib.import_module(module_name)
+        *parents, name = attribute.split(".")
+        for parent in parents:
+            owner = getattr(owner, parent)
+        func = getattr(owner, name)
+        if getattr(func, "__blocking_guard__", False):
+            continue
+        setattr(owner, name, _guard(func, attribute, mode))
+    logger.warning(f"Blocking call guards installed ({mode}) on {len(calls or BLOCKING_CALLS)} calls")
+
+
+# Global monitor instance
+loop_monitor = LoopMonitor()
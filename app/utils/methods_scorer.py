@@ -6,6 +6,7 @@ Provides quantitative assessment of experimental and analytical methods quality.
 import re
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
+from app.utils.keyword_index import KeywordHits, keyword_index
 
 @dataclass
 class MethodsScore:
@@ -62,17 +63,34 @@ class MethodsScorer:
             'reproducibility': ['container', 'docker', 'conda', 'environment'],
             'metadata': ['sample metadata', 'clinical data', 'phenotype data']
         }
+        
+        # Register all criteria with the shared keyword index
+        for name, criteria in [
+            ('methods_experimental', self.experimental_criteria),
+            ('methods_sequencing', self.sequencing_criteria),
+            ('methods_analytical', self.analytical_criteria),
+            ('methods_statistical', self.statistical_criteria),
+            ('methods_data_quality', self.data_quality_criteria)
+        ]:
+            keyword_index.register(name, criteria)
     
-    def score_paper(self, text: str) -> MethodsScore:
-        """Score a paper based on its methods description."""
-        text_lower = text.lower()
+    def score_paper(self, text: str, hits: Optional[KeywordHits] = None) -> MethodsScore:
+        """Score a paper based on its methods description.
+        
+        Args:
+            text: Paper text
+            hits: Precomputed keyword_index scan of text; computed if omitted
+        """
+        if hits is None:
+            hits = keyword_index.scan(text)
+        text_lower = hits.text
         
         # Score each category
-        experimental_score = self._score_category(text_lower, self.experimental_criteria)
-        sequencing_score = self._score_category(text_lower, self.sequencing_criteria)
-        analytical_score = self._score_category(text_lower, self.analytical_criteria)
-        statistical_score = self._score_category(text_lower, self.statistical_criteria)
-        data_quality_score = self._score_category(text_lower, self.data_quality_criteria)
+        experimental_score = self._score_category(text_lower, self.experimental_criteria, hits)
+        sequencing_score = self._score_category(text_lower, self.sequencing_criteria, hits)
+        analytical_score = self._score_category(text_lower, self.analytical_criteria, hits)
+        statistical_score = self._score_category(text_lower, self.statistical_criteria, hits)
+        data_quality_score = self._score_category(text_lower, self.data_quality_criteria, hits)
         
         # Calculate overall score (weighted average)
         weights = {
@@ -111,17 +129,19 @@ class MethodsScorer:
             details=details
         )
     
-    def _score_category(self, text: str, criteria: Dict[str, List[str]]) -> Tuple[float, List[str]]:
+    def _score_category(self, text: str, criteria: Dict[str, List[str]],
+                        hits: Optional[KeywordHits] = None) -> Tuple[float, List[str]]:
         """Score a specific category based on criteria."""
+        if hits is None:
+            hits = keyword_index.scan(text)
         found_methods = []
         total_criteria = 0
         
         for category, keywords in criteria.items():
             total_criteria += 1
-            for keyword in keywords:
-                if keyword in text:
-                    found_methods.append(f"{category}: {keyword}")
-                    break  # Only count once per category
+            keyword = hits.first(keywords)  # Only count once per category
+            if keyword is not None:
+                found_methods.append(f"{category}: {keyword}")
         
         score = len(found_methods) / total_criteria if total_criteria > 0 else 0.0
         return score, found_methods
@@ -0,0 +1,316 @@
+"""
+Compiled Multi-Pattern Matching Utilities
+
+This module compiles tables of search patterns once and scans a text for all of them
+in a single pass. Plain literals are matched with an Aho-Corasick automaton (using
+the optional ``pyahocorasick`` package, or a combined longest-first regex when it is
+not installed) and the remaining regular expressions with one alternation regex.
+All overlapping occurrences are reported, matching the semantics of running
+``re.search`` for every pattern separately.
+"""
+
+import re
+import bisect
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+_REGEX_METACHARACTERS = set(".^$*+?{}[]|()")
+
+# Character tests for the classes \d, \s and \w (Unicode semantics, a superset under re.ASCII)
+_CATEGORY_TESTS = {
+    sre_parse.CATEGORY_DIGIT: str.isdecimal,
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == "_",
+}
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)}
+
+# Characters and character tests a match can start with
+FirstChars = Tuple[Set[str], List[Callable[[str], bool]]]
+
+
+def literal_from_pattern(pattern: str) -> Optional[str]:
+    """
+    Return the literal string matched by a regex pattern.
+
+    Args:
+        pattern: Regular expression source
+
+    Returns:
+        The literal text if the pattern only matches that exact string, otherwise None
+    """
+    literal = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            # Escaped punctuation is literal; \d, \s, \b etc. are not
+            if i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+                literal.append(pattern[i + 1])
+                i += 2
+                continue
+            return None
+        if ch in _REGEX_METACHARACTERS:
+            return None
+        literal.append(ch)
+        i += 1
+    return "".join(literal) or None
+
+
+def _first_of_sequence(items) -> Tuple[Optional[FirstChars], bool]:
+    """First characters of a parsed regex sequence, and whether it can match empty."""
+    chars: Set[str] = set()
+    tests: List[Callable[[str], bool]] = []
+    for op, av in items:
+        first, nullable = _first_of_item(op, av)
+        if first is None:
+            return None, False
+        chars |= first[0]
+        tests += first[1]
+        if not nullable:
+            return (chars, tests), False
+    return (chars, tests), True
+
+
+def _first_of_item(op, av) -> Tuple[Optional[FirstChars], bool]:
+    if op is sre_parse.LITERAL:
+        return ({chr(av)}, []), False
+    if op is sre_parse.IN:
+        chars, tests = set(), []
+        for set_op, set_av in av:
+            if set_op is sre_parse.LITERAL:
+                chars.add(chr(set_av))
+            elif set_op is sre_parse.RANGE:
+                tests.append(lambda ch, low=set_av[0], high=set_av[1]: low <= ord(ch) <= high)
+            elif set_op is sre_parse.CATEGORY and set_av in _CATEGORY_TESTS:
+                tests.append(_CATEGORY_TESTS[set_av])
+            else:
+                return None, False  # negated sets and classes
+        return (chars, tests), False
+    if op is sre_parse.AT:
+        return (set(), []), True  # anchors and \b match empty
+    if op is sre_parse.SUBPATTERN:
+        return _first_of_sequence(av[-1])
+    if op is sre_parse.BRANCH:
+        chars, tests, any_nullable = set(), [], False
+        for branch in av[1]:
+            first, nullable = _first_of_sequence(branch)
+            if first is None:
+                return None, False
+            chars |= first[0]
+            tests += first[1]
+            any_nullable = any_nullable or nullable
+        return (chars, tests), any_nullable
+    if op in _REPEATS:
+        first, nullable = _first_of_sequence(av[2])
+        return first, nullable or av[0] == 0
+    return None, False
+
+
+def first_chars(pattern: str, flags: int = 0) -> Optional[FirstChars]:
+    """
+    Characters a match of a regex pattern can start with.
+
+    Args:
+        pattern: Regular expression source
+        flags: Flags the pattern is compiled with
+
+    Returns:
+        (characters, character tests) covering every possible first character, or
+        None when a match may start with any character or be empty
+    """
+    try:
+        first, nullable = _first_of_sequence(sre_parse.parse(pattern, flags))
+    except Exception:
+        return None
+    return None if nullable else first
+
+
+class LiteralMatcher:
+    """Find every (possibly overlapping) occurrence of a set of literal strings in one pass."""
+
+    def __init__(self, literals: Iterable[str]):
+        self.literals = sorted({literal for literal in literals if literal})
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for literal in self.literals:
+                self._automaton.add_word(literal, literal)
+            if self.literals:
+                self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # Longest alternatives first, so each position reports its longest literal;
+            # shorter literals matching at the same position are always its prefixes.
+            ordered = sorted(self.literals, key=len, reverse=True)
+            self._regex = re.compile("(?=(" + "|".join(re.escape(lit) for lit in ordered) + "))") if ordered else None
+            self._prefixes = {
+                literal: [other for other in self.literals if other != literal and literal.startswith(other)]
+                for literal in self.literals
+            }
+
+    def finditer(self, text: str) -> Iterator[Tuple[str, int]]:
+        """
+        Yield (literal, start offset) for every occurrence in the text.
+
+        Args:
+            text: Text to scan (callers normalise case beforehand)
+        """
+        if not self.literals:
+            return
+
+        if self._automaton is not None:
+            for end, literal in self._automaton.iter(text):
+                yield literal, end - len(literal) + 1
+            return
+
+        for match in self._regex.finditer(text):
+            literal = match.group(1)
+            start = match.start()
+            yield literal, start
+            for prefix in self._prefixes[literal]:
+                yield prefix, start
+
+    def positions(self, text: str) -> Dict[str, List[int]]:
+        """Map each literal found in the text to its sorted start offsets."""
+        found: Dict[str, List[int]] = {}
+        for literal, start in self.finditer(text):
+            found.setdefault(literal, []).append(start)
+        if self._automaton is not None:
+            for offsets in found.values():
+                offsets.sort()
+        return found
+
+
+class PatternScan:
+    """Occurrences of a compiled pattern table in one text."""
+
+    def __init__(self, table: Dict[str, Dict[str, List[str]]], offsets: Dict[str, List[int]]):
+        self._table = table
+        self.offsets = offsets
+
+    def matched_patterns(self, field_name: str, category: str) -> List[str]:
+        """Patterns of a field category found in the text, in table order."""
+        return [p for p in self._table.get(field_name, {}).get(category, []) if p in self.offsets]
+
+    def category_hits(self, field_name: str) -> Dict[str, Dict[str, List[int]]]:
+        """Per-category mapping of matched pattern to start offsets for a field."""
+        return {
+            category: {p: self.offsets[p] for p in patterns if p in self.offsets}
+            for category, patterns in self._table.get(field_name, {}).items()
+        }
+
+    def category_counts(self, field_name: str) -> Dict[str, int]:
+        """Per-category number of distinct patterns found for a field."""
+        return {
+            category: sum(1 for p in patterns if p in self.offsets)
+            for category, patterns in self._table.get(field_name, {}).items()
+        }
+
+
+class PatternTableMatcher:
+    """
+    Compiles a field → category → patterns table for single-pass scanning.
+
+    Literal patterns go into one LiteralMatcher; the remaining regular expressions
+    are combined into a single alternation regex. Where the alternation reports a
+    match, only the later patterns that can start with the character there are
+    re-checked for overlapping matches.
+    """
+
+    def __init__(self, table: Dict[str, Dict[str, List[str]]], flags: int = re.IGNORECASE):
+        self.table = table
+        self.compiled: Dict[str, re.Pattern] = {}
+        literal_patterns: Dict[str, List[str]] = {}
+        self._regex_patterns: List[str] = []
+
+        for categories in table.values():
+            for patterns in categories.values():
+                for pattern in patterns:
+                    if pattern in self.compiled:
+                        continue
+                    self.compiled[pattern] = re.compile(pattern, flags)
+                    literal = literal_from_pattern(pattern)
+                    if literal is not None:
+                        literal = literal.lower() if flags & re.IGNORECASE else literal
+                        literal_patterns.setdefault(literal, []).append(pattern)
+                    else:
+                        self._regex_patterns.append(pattern)
+
+        self._literal_patterns = literal_patterns
+        self._literals = LiteralMatcher(literal_patterns.keys())
+
+        self._flags = flags
+        self._first_chars = [first_chars(p, flags) for p in self._regex_patterns]
+        # Regex pattern indices that can start with a character, filled in as characters are seen
+        self._candidates: Dict[str, List[int]] = {}
+
+        if self._regex_patterns:
+            alternation = "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(self._regex_patterns))
+            self._combined = re.compile(f"(?=(?:{alternation}))", flags)
+        else:
+            self._combined = None
+
+        logger.debug(f"Compiled {len(literal_patterns)} literal and {len(self._regex_patterns)} regex patterns")
+
+    def scan(self, text: str) -> PatternScan:
+        """
+        Scan a text once for every pattern in the table.
+
+        Args:
+            text: Text to scan; lowercase it first when matching case-insensitively
+
+        Returns:
+            PatternScan with the start offsets of every matched pattern
+        """
+        offsets: Dict[str, List[int]] = {}
+
+        for literal, start in self._literals.finditer(text):
+            for pattern in self._literal_patterns[literal]:
+                offsets.setdefault(pattern, []).append(start)
+
+        if self._combined is not None:
+            for match in self._combined.finditer(text):
+                start = match.start()
+                index = int(match.lastgroup[1:])
+                offsets.setdefault(self._regex_patterns[index], []).append(start)
+                # The alternation reports only the first pattern matching here; earlier
+                # ones did not match, so check the later ones that can start with this
+                # character to keep overlapping matches.
+                candidates = self._regex_candidates(text[start])
+                for i in candidates[bisect.bisect_right(candidates, index):]:
+                    pattern = self._regex_patterns[i]
+                    if self.compiled[pattern].match(text, start):
+                        offsets.setdefault(pattern, []).append(start)
+
+        for pattern_offsets in offsets.values():
+            pattern_offsets.sort()
+
+        return PatternScan(self.table, offsets)
+
+    def _regex_candidates(self, ch: str) -> List[int]:
+        """Indices of the regex patterns a match starting with ch can belong to."""
+        candidates = self._candidates.get(ch)
+        if candidates is None:
+            variants = {ch, ch.lower(), ch.upper()} if self._flags & re.IGNORECASE else {ch}
+            candidates = [
+                i for i, first in enumerate(self._first_chars)
+                if first is None
+                or not variants.isdisjoint(first[0])
+                or any(test(c) for test in first[1] for c in variants if len(c) == 1)
+            ]
+            self._candidates[ch] = candidates
+        return candidates
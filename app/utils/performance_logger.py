@@ -1,4 +1,9 @@
 import logging
+import logging.handlers
+import queue
+import random
+import threading
+import atexit
 import time
 import json
 from datetime import datetime
@@ -8,106 +13,193 @@ from functools import wraps
 import traceback
 import asyncio
 
+from app.utils.config import (
+    PERFORMANCE_LOG_FILE, MAX_LOG_SIZE, MAX_LOG_FILES,
+    PERF_LOG_QUEUE_SIZE, PERF_LOG_CACHE_HIT_SAMPLE_RATE
+)
+from app.utils.tracing import current_trace_id
+
+class PerformanceRecordFormatter(logging.Formatter):
+    """Render structured performance records as JSON lines.
+    
+    Each line is one object with the record time ("ts", seconds since the epoch,
+    and "timestamp", ISO 8601), "level", "event" and the event's fields; fields
+    that are None are left out. Runs on the listener thread, so the JSON encoding
+    and timestamp formatting are kept off the request path.
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": round(record.created, 6),
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "event": record.msg
+        }
+        fields = getattr(record, "fields", None)
+        if fields is None:
+            # Plain message logged directly on the 'performance' logger
+            line["event"] = "MESSAGE"
+            line["message"] = record.getMessage()
+        else:
+            line.update((key, value) for key, value in fields.items() if value is not None)
+        return json.dumps(line, default=str)
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so records need no pre-formatting or
+        # pickling; formatting happens on the listener thread
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# One queue and one listener thread per process, shared by every PerformanceLogger
+_pipeline_lock = threading.Lock()
+_queue_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def _start_pipeline() -> _NonBlockingQueueHandler:
+    """Start the performance log listener thread (once) and return its queue handler."""
+    global _queue_handler, _listener
+    with _pipeline_lock:
+        if _queue_handler is None:
+            Path(PERFORMANCE_LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+            perf_handler = logging.handlers.RotatingFileHandler(
+                PERFORMANCE_LOG_FILE,
+                maxBytes=MAX_LOG_SIZE,
+                backupCount=MAX_LOG_FILES,
+                encoding='utf-8'
+            )
+            perf_handler.setFormatter(PerformanceRecordFormatter())
+            
+            log_queue = queue.Queue(maxsize=PERF_LOG_QUEUE_SIZE)
+            _queue_handler = _NonBlockingQueueHandler(log_queue)
+            _listener = logging.handlers.QueueListener(log_queue, perf_handler, respect_handler_level=True)
+            _listener.start()
+            # Flush queued records on interpreter exit
+            atexit.register(_stop_pipeline)
+        return _queue_handler
+
+def _stop_pipeline():
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    with _pipeline_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 class PerformanceLogger:
-    """Specialized logger for tracking PMID query performance and timing."""
+    """Specialized logger for tracking PMID query performance and timing.
     
-    def __init__(self):
+    Records are structured (event name plus a fields dict) and handed to a
+    bounded queue; a single listener thread writes them as JSON lines, so logging
+    never blocks the caller. When the queue is full, records are dropped and
+    counted rather than waited on. High-volume cache hits are sampled at
+    PERF_LOG_CACHE_HIT_SAMPLE_RATE; sampled records carry their sample rate.
+    """
+    
+    def __init__(self, cache_hit_sample_rate: Optional[float] = None):
         self.logger = logging.getLogger('performance')
         self.logger.setLevel(logging.INFO)
         
         # Ensure the performance logger doesn't propagate to root logger
         self.logger.propagate = False
         
-        # Create performance-specific handler
-        from logging.handlers import RotatingFileHandler
-        perf_handler = RotatingFileHandler(
-            'logs/performance.log',
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
+        self.cache_hit_sample_rate = (
+            PERF_LOG_CACHE_HIT_SAMPLE_RATE if cache_hit_sample_rate is None else cache_hit_sample_rate
         )
         
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-        )
-        perf_handler.setFormatter(formatter)
-        self.logger.addHandler(perf_handler)
+        # Attach the shared queue handler once, however many instances are created
+        self._handler = _start_pipeline()
+        if self._handler not in self.logger.handlers:
+            self.logger.addHandler(self._handler)
+    
+    @property
+    def dropped(self) -> int:
+        """Records dropped because the log queue was full."""
+        return self._handler.dropped
+    
+    def _log(self, level: int, event: str, fields: Dict[str, Any]):
+        """Enqueue a structured record (reported as logged by the log_* method).
+        
+        Records logged inside a traced request carry its trace_id, linking them
+        to the request's spans.
+        """
+        if self.logger.isEnabledFor(level):
+            fields["trace_id"] = current_trace_id()
+            self.logger.log(level, event, extra={"fields": fields}, stacklevel=2)
     
     def log_pmid_query_start(self, pmid: str, user_agent: str = None, ip_address: str = None):
         """Log the start of a PMID query."""
-        self.logger.info(
-            f"PMID_QUERY_START - PMID: {pmid} | "
-            f"User-Agent: {user_agent or 'Unknown'} | "
-            f"IP: {ip_address or 'Unknown'} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "PMID_QUERY_START", {
+            "pmid": pmid, "user_agent": user_agent, "ip_address": ip_address
+        })
     
     def log_pmid_query_end(self, pmid: str, duration: float, success: bool, 
                           cached: bool = False, error: str = None):
         """Log the completion of a PMID query."""
-        status = "SUCCESS" if success else "FAILED"
-        cache_status = "CACHED" if cached else "FRESH"
-        
-        self.logger.info(
-            f"PMID_QUERY_END - PMID: {pmid} | "
-            f"Status: {status} | "
-            f"Duration: {duration:.2f}s | "
-            f"Cache: {cache_status} | "
-            f"Error: {error or 'None'} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "PMID_QUERY_END", {
+            "pmid": pmid,
+            "status": "SUCCESS" if success else "FAILED",
+            "duration": duration,
+            "cache": "CACHED" if cached else "FRESH",
+            "error": error
+        })
     
     def log_api_call(self, service: str, operation: str, pmid: str, 
                      duration: float, success: bool, error: str = None):
         """Log external API calls (PubMed, PMC, Gemini)."""
-        status = "SUCCESS" if success else "FAILED"
-        
-        self.logger.info(
-            f"API_CALL - Service: {service} | "
-            f"Operation: {operation} | "
-            f"PMID: {pmid} | "
-            f"Duration: {duration:.2f}s | "
-            f"Status: {status} | "
-            f"Error: {error or 'None'} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "API_CALL", {
+            "service": service,
+            "operation": operation,
+            "pmid": pmid,
+            "duration": duration,
+            "status": "SUCCESS" if success else "FAILED",
+            "error": error
+        })
     
     def log_cache_operation(self, operation: str, pmid: str, 
                            cache_type: str, duration: float, success: bool):
-        """Log cache operations."""
-        status = "SUCCESS" if success else "FAILED"
+        """Log cache operations (successful cache reads are sampled)."""
+        sample_rate = 1.0
+        if operation == "GET" and success and self.cache_hit_sample_rate < 1.0:
+            if random.random() >= self.cache_hit_sample_rate:
+                return
+            sample_rate = self.cache_hit_sample_rate
         
-        self.logger.info(
-            f"CACHE_OP - Operation: {operation} | "
-            f"PMID: {pmid} | "
-            f"Type: {cache_type} | "
-            f"Duration: {duration:.3f}s | "
-            f"Status: {status} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "CACHE_OP", {
+            "operation": operation,
+            "pmid": pmid,
+            "cache_type": cache_type,
+            "duration": duration,
+            "status": "SUCCESS" if success else "FAILED",
+            # Readers weight each record by 1 / sample_rate; omitted when every record is kept
+            "sample_rate": sample_rate if sample_rate < 1.0 else None
+        })
     
     def log_analysis_step(self, pmid: str, step: str, duration: float, 
                          details: Dict[str, Any] = None):
         """Log individual analysis steps."""
-        details_str = f" | Details: {json.dumps(details)}" if details else ""
-        
-        self.logger.info(
-            f"ANALYSIS_STEP - PMID: {pmid} | "
-            f"Step: {step} | "
-            f"Duration: {duration:.2f}s{details_str} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "ANALYSIS_STEP", {
+            "pmid": pmid, "step": step, "duration": duration, "details": details or None
+        })
     
     def log_performance_metrics(self, pmid: str, metrics: Dict[str, Any]):
         """Log detailed performance metrics for a PMID query."""
-        self.logger.info(
-            f"PERFORMANCE_METRICS - PMID: {pmid} | "
-            f"Metrics: {json.dumps(metrics, default=str)} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.INFO, "PERFORMANCE_METRICS", {"pmid": pmid, "metrics": metrics})
     
     def log_error(self, pmid: str, error: Exception, context: str = None):
         """Log errors with full context."""
+        # The traceback must be captured on the thread handling the exception
         error_details = {
             "error_type": type(error).__name__,
             "error_message": str(error),
@@ -115,12 +207,7 @@ class PerformanceLogger:
             "context": context
         }
         
-        self.logger.error(
-            f"ERROR - PMID: {pmid} | "
-            f"Context: {context or 'Unknown'} | "
-            f"Error: {json.dumps(error_details, default=str)} | "
-            f"Timestamp: {datetime.now().isoformat()}"
-        )
+        self._log(logging.ERROR, "ERROR", {"pmid": pmid, "context": context, "error": error_details})
 
 def log_performance(func):
     """Decorator to automatically log function performance."""
@@ -146,7 +233,6 @@ def log_performance(func):
             duration = time.time() - start_time
             
             # Log successful execution
-            perf_logger = PerformanceLogger()
             perf_logger.log_analysis_step(
                 pmid or "Unknown",
                 f"{func.__module__}.{func.__name__}",
@@ -160,7 +246,6 @@ def log_performance(func):
             duration = time.time() - start_time
             
             # Log error
-            perf_logger = PerformanceLogger()
             perf_logger.log_error(
                 pmid or "Unknown",
                 e,
@@ -191,7 +276,6 @@ def log_performance(func):
             duration = time.time() - start_time
             
             # Log successful execution
-            perf_logger = PerformanceLogger()
             perf_logger.log_analysis_step(
                 pmid or "Unknown",
                 f"{func.__module__}.{func.__name__}",
@@ -205,7 +289,6 @@ def log_performance(func):
             duration = time.time() - start_time
             
             # Log error
-            perf_logger = PerformanceLogger()
             perf_logger.log_error(
                 pmid or "Unknown",
                 e,
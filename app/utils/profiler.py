@@ -0,0 +1,179 @@
+"""
+On-demand sampling profiler and asyncio task dumps.
+
+SamplingProfiler records the stacks of every thread (the event loop, executor
+workers, the log and span exporters) from a background thread at a fixed
+interval, using sys._current_frames(), so the profiled code runs unmodified and
+the overhead is one stack walk per thread per sample. Results are collapsed
+stacks ("thread;outer;...;inner count" lines), which flamegraph.pl, speedscope
+and inferno read directly.
+
+dump_tasks lists the pending asyncio tasks with their current stacks, and
+executor_stats the queue depth of a thread pool.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> List[str]:
+    """Labels of a thread's stack, outermost first."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads for a while; one profile at a time."""
+
+    def __init__(self, interval: float = 0.01):
+        """
+        Args:
+            interval: Seconds between samples (0.01 = 100 Hz)
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float) -> Dict:
+        """
+        Sample all other threads for the given time (blocking).
+
+        Args:
+            seconds: Profile duration
+
+        Returns:
+            Dictionary with the collapsed stack counts ("stacks"), the number of
+            samples, the per-thread sample counts and the actual duration
+
+        Raises:
+            RuntimeError: If another profile is running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            own = threading.get_ident()
+            stacks: Counter = Counter()
+            threads: Counter = Counter()
+            samples = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    name = names.get(ident, f"thread-{ident}").replace(";", ":")
+                    stacks[";".join([name] + _collapse(frame))] += 1
+                    threads[name] += 1
+                samples += 1
+                time.sleep(self.interval)
+            return {
+                "stacks": stacks,
+                "samples": samples,
+                "threads": dict(threads),
+                "duration": time.perf_counter() - start
+            }
+        finally:
+            self._lock.release()
+
+    async def profile(self, seconds: float) -> Dict:
+        """Run sample() in a dedicated thread, without blocking the event loop or the executor."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(self.sample(seconds))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        return await asyncio.wrap_future(future)
+
+
+def collapsed_text(stacks: Counter) -> str:
+    """Collapsed stacks in flamegraph.pl format, most frequent first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_frames(stacks: Counter, limit: int = 20) -> List[Dict]:
+    """Innermost frames by number of samples (self time)."""
+    frames: Counter = Counter()
+    for stack, count in stacks.items():
+        frames[stack.rsplit(";", 1)[-1]] += count
+    total = sum(frames.values()) or 1
+    return [{"frame": frame, "samples": count, "share": round(count / total, 4)}
+            for frame, count in frames.most_common(limit)]
+
+
+def executor_stats(executor: Optional[concurrent.futures.Executor]) -> Optional[Dict]:
+    """Worker and queue counts of a ThreadPoolExecutor (None if not created yet)."""
+    if not isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+        return None
+    return {
+        "max_workers": executor._max_workers,
+        "threads": len(executor._threads),
+        "idle_threads": executor._idle_semaphore._value,
+        "queue_depth": executor._work_queue.qsize()
+    }
+
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None, stack_limit: int = 10) -> Dict:
+    """
+    Describe the pending asyncio tasks of a loop.
+
+    Args:
+        loop: Event loop (default: the running loop)
+        stack_limit: Frames reported per task
+
+    Returns:
+        Dictionary with the task count, counts per coroutine and per-task details
+        (name, coroutine, innermost frames), and the default executor's stats
+    """
+    loop = loop or asyncio.get_running_loop()
+    current = asyncio.current_task(loop)
+    tasks = []
+    by_coroutine: Counter = Counter()
+    for task in asyncio.all_tasks(loop):
+        if task is current:
+            continue
+        coro = task.get_coro()
+        coroutine = getattr(coro, "__qualname__", type(coro).__name__)
+        by_coroutine[coroutine] += 1
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": coroutine,
+            "stack": [_frame_label(frame) for frame in task.get_stack(limit=stack_limit)]
+        })
+    tasks.sort(key=lambda task: task["name"])
+    return {
+        "pending_tasks": len(tasks),
+        "by_coroutine": dict(by_coroutine.most_common()),
+        "tasks": tasks,
+        # Created on the first run_in_executor(None, ...) call
+        "default_executor": executor_stats(getattr(loop, "_default_executor", None))
+    }
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
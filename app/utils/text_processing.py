@@ -68,6 +68,12 @@ class AdvancedTextProcessor:
             print(f"Token content: {tokens}")
             return "Error decoding response"
     
+    def count_tokens(self, text: str) -> int:
+        """Number of tiktoken tokens in a text (estimated at 4 characters per token without the tokenizer)"""
+        if not self.tokenizer_available:
+            return (len(text) + 3) // 4
+        return len(self.tokenizer.encode(text, disallowed_special=()))
+    
     def batch_encode(self, texts: List[str], max_length: int = 512, pad: bool = True) -> torch.Tensor:
         """Batch encode texts with optional padding"""
         if not self.tokenizer_available:
@@ -0,0 +1,205 @@
+"""
+Pre-tokenized conversation samples for BugSigConversationDataset.
+
+Every query, context, response and referenced knowledge base entry is cleaned
+and tokenized once. The token sequences are packed back to back into a single
+int32 array with an int64 offsets array (sequence ``i`` is
+``tokens[offsets[i]:offsets[i + 1]]``), and each conversation records the
+sequence ids of its fields plus, CSR-style, the sequence ids of its relevant
+knowledge entries. The arrays are saved as ``.npy`` files and memory-mapped, so
+dataloader workers share them and later runs skip tokenization entirely.
+"""
+
+import hashlib
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+from .text_processing import AdvancedTextProcessor, clean_scientific_text
+
+logger = logging.getLogger(__name__)
+
+# Per-conversation text fields, in column order of PackedConversations.fields
+FIELDS = ("query", "context", "response")
+
+# Sequence id standing for a missing (empty) context
+EMPTY_SEQUENCE = -1
+
+_ARRAYS = ("tokens", "offsets", "fields", "knowledge_indptr", "knowledge_sequences")
+
+
+def conversations_fingerprint(
+    conversations: List[Dict],
+    knowledge_fingerprint: str,
+    tokenizer_name: str,
+    max_length: int
+) -> str:
+    """Hash of everything the packed samples depend on."""
+    digest = hashlib.sha1(f"{knowledge_fingerprint}|{tokenizer_name}|{max_length}".encode())
+    for conversation in conversations:
+        digest.update(json.dumps([conversation.get(field) or "" for field in FIELDS]).encode())
+    return digest.hexdigest()
+
+
+class PackedConversations:
+    """Packed, memory-mapped token sequences of a conversation corpus."""
+
+    def __init__(self, directory: Path):
+        """
+        Open packed samples written by build().
+
+        Args:
+            directory: Directory holding the packed arrays
+        """
+        self.directory = Path(directory)
+        arrays = {name: np.load(self.directory / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.tokens = arrays["tokens"]
+        self.offsets = arrays["offsets"]
+        self.fields = arrays["fields"]
+        self.knowledge_indptr = arrays["knowledge_indptr"]
+        self.knowledge_sequences = arrays["knowledge_sequences"]
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def sequence(self, sequence_id: int) -> torch.Tensor:
+        """Token ids of one packed sequence (empty for EMPTY_SEQUENCE)."""
+        if sequence_id == EMPTY_SEQUENCE:
+            return torch.zeros(0, dtype=torch.long)
+        start, end = self.offsets[sequence_id], self.offsets[sequence_id + 1]
+        return torch.from_numpy(np.asarray(self.tokens[start:end], dtype=np.int64))
+
+    def field(self, idx: int, name: str) -> torch.Tensor:
+        """Token ids of a conversation's query, context or response."""
+        return self.sequence(int(self.fields[idx, FIELDS.index(name)]))
+
+    def knowledge(self, idx: int) -> List[torch.Tensor]:
+        """Token ids of the knowledge entries relevant to a conversation."""
+        start, end = self.knowledge_indptr[idx], self.knowledge_indptr[idx + 1]
+        return [self.sequence(int(sequence_id)) for sequence_id in self.knowledge_sequences[start:end]]
+
+    @classmethod
+    def build(
+        cls,
+        directory: Path,
+        conversations: List[Dict],
+        knowledge_texts: Callable[[int], str],
+        find_knowledge: Callable[[str], List[int]],
+        text_processor: AdvancedTextProcessor,
+        max_length: int
+    ) -> "PackedConversations":
+        """
+        Tokenize a conversation corpus and write the packed arrays.
+
+        Args:
+            directory: Output directory
+            conversations: Conversations with query, response and optional context
+            knowledge_texts: Text of a knowledge base entry by row position
+            find_knowledge: Relevant knowledge row positions for a query
+            text_processor: Tokenizer
+            max_length: Sequences are truncated to this many tokens
+
+        Returns:
+            PackedConversations over the written arrays
+        """
+        sequences: List[np.ndarray] = []
+
+        def add(tokens: torch.Tensor) -> int:
+            sequences.append(tokens[:max_length].numpy().astype(np.int32))
+            return len(sequences) - 1
+
+        knowledge_ids: Dict[int, int] = {}
+        fields = np.empty((len(conversations), len(FIELDS)), dtype=np.int32)
+        knowledge_indptr = np.zeros(len(conversations) + 1, dtype=np.int64)
+        knowledge_sequences: List[int] = []
+
+        for i, conversation in enumerate(conversations):
+            query = conversation["query"]
+            context = conversation.get("context", "")
+            fields[i, 0] = add(text_processor.encode_text(clean_scientific_text(query)))
+            fields[i, 1] = add(text_processor.encode_text(clean_scientific_text(context))) if context else EMPTY_SEQUENCE
+            fields[i, 2] = add(text_processor.encode_text(clean_scientific_text(conversation["response"])))
+
+            # Knowledge entries shared by several conversations are tokenized once
+            for row in find_knowledge(query):
+                if row not in knowledge_ids:
+                    encoded = text_processor.batch_encode([clean_scientific_text(knowledge_texts(row))], pad=False)
+                    knowledge_ids[row] = add(encoded[0])
+                knowledge_sequences.append(knowledge_ids[row])
+            knowledge_indptr[i + 1] = len(knowledge_sequences)
+
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(sequence) for sequence in sequences], out=offsets[1:])
+        arrays = {
+            "tokens": np.concatenate(sequences) if sequences else np.zeros(0, dtype=np.int32),
+            "offsets": offsets,
+            "fields": fields,
+            "knowledge_indptr": knowledge_indptr,
+            "knowledge_sequences": np.asarray(knowledge_sequences, dtype=np.int32)
+        }
+
+        # Write to a temporary directory and rename, so readers never see a partial set
+        directory = Path(directory)
+        partial = directory.with_name(directory.name + ".partial")
+        partial.mkdir(parents=True, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(partial / f"{name}.npy", array)
+        try:
+            partial.rename(directory)
+        except OSError:
+            # Another process finished the same set first
+            shutil.rmtree(partial, ignore_errors=True)
+
+        logger.info(
+            f"Packed {len(conversations)} conversations: {len(sequences)} sequences, "
+            f"{len(arrays['tokens'])} tokens ({len(knowledge_ids)} knowledge entries)"
+        )
+        return cls(directory)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        cache_dir: Path,
+        conversations: List[Dict],
+        knowledge_fingerprint: str,
+        knowledge_texts: Callable[[int], str],
+        find_knowledge: Callable[[str], List[int]],
+        text_processor: AdvancedTextProcessor,
+        max_length: int
+    ) -> "PackedConversations":
+        """
+        Open the packed samples of a corpus, tokenizing it first if needed.
+
+        Samples are stored under a directory named after the fingerprint of the
+        conversations, knowledge base, tokenizer and max_length, so any change to
+        them produces a fresh set.
+
+        Args:
+            cache_dir: Parent directory of packed sample sets
+            conversations: Conversations with query, response and optional context
+            knowledge_fingerprint: Fingerprint of the knowledge base index and of the
+                entry texts returned by knowledge_texts
+            knowledge_texts: Text of a knowledge base entry by row position
+            find_knowledge: Relevant knowledge row positions for a query
+            text_processor: Tokenizer
+            max_length: Sequences are truncated to this many tokens
+
+        Returns:
+            PackedConversations for the corpus
+        """
+        tokenizer_name = text_processor.tokenizer.name if text_processor.tokenizer_available else "characters"
+        key = conversations_fingerprint(conversations, knowledge_fingerprint, tokenizer_name, max_length)
+        directory = Path(cache_dir) / key[:16]
+        if directory.exists():
+            try:
+                return cls(directory)
+            except Exception as e:
+                logger.warning(f"Could not open packed conversations at {directory}: {str(e)}")
+                shutil.rmtree(directory, ignore_errors=True)
+
+        return cls.build(directory, conversations, knowledge_texts, find_knowledge, text_processor, max_length)
@@ -0,0 +1,375 @@
+"""
+Lightweight per-request tracing.
+
+Every HTTP request gets a trace id, and the stages it goes through (cache
+lookups, E-utilities calls, XML extraction, prompt building, Gemini calls,
+validation, cache writes) open nested spans with ``tracer.span(name)``. The
+current span is held in a context variable, so nesting follows asyncio tasks
+automatically; work handed to a thread pool keeps its parent span when it is
+submitted with ``run_in_executor`` from this module, which runs the callable
+in a copy of the caller's context.
+
+Finished spans are queued and exported in batches by a background thread,
+either as JSON lines to a file or as OTLP/HTTP JSON to a collector (e.g. the
+OpenTelemetry Collector or Jaeger on port 4318), selected by TRACE_EXPORTER.
+"""
+
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.utils.config import (
+    TRACE_EXPORTER, TRACE_FILE, OTLP_ENDPOINT, TRACE_SERVICE_NAME, TRACE_QUEUE_SIZE,
+    MAX_LOG_SIZE, MAX_LOG_FILES
+)
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed stage of a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start_time", "end_time", "_start", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self._start = time.perf_counter()
+        self.status = STATUS_UNSET
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.error = str(error) or type(error).__name__
+
+    def end(self):
+        # Wall-clock start plus monotonic duration, so clock adjustments don't skew spans
+        self.end_time = self.start_time + (time.perf_counter() - self._start)
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start_time, 6),
+            "duration": round(self.duration, 6),
+            "status": "ERROR" if self.status == STATUS_ERROR else "OK",
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON lines file, rotated like the other logs."""
+
+    def __init__(self, path: Path, max_bytes: int = MAX_LOG_SIZE, backup_count: int = MAX_LOG_FILES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            self.path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding='utf-8'
+        )
+
+    def export(self, spans: List[Span]):
+        for span in spans:
+            self._handler.handle(logging.makeLogRecord({"msg": json.dumps(span.to_dict(), default=str)}))
+
+
+class OTLPHttpExporter:
+    """Posts finished spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str = "bioanalyzer", timeout: float = 5.0):
+        import requests
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        return {"key": key, "value": encoded}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 2 if span.kind == "server" else 1,
+            "startTimeUnixNano": str(int(span.start_time * 1e9)),
+            "endTimeUnixNano": str(int((span.end_time or span.start_time) * 1e9)),
+            "attributes": [self._attribute(key, value) for key, value in span.attributes.items() if value is not None],
+            "status": {"code": span.status, "message": span.error or ""}
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.utils.tracing"},
+                    "spans": [self._span(span) for span in spans]
+                }]
+            }]
+        }
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class _BatchExporter:
+    """Exports finished spans in batches from a background thread, never blocking the caller."""
+
+    def __init__(self, exporter, max_queue_size: int = 10000, batch_size: int = 512, interval: float = 1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.warning(f"Failed to export {len(batch)} spans: {str(e)}")
+
+    def shutdown(self):
+        """Export queued spans and stop the thread."""
+        if self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=1.0)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=5.0)
+
+
+def _build_exporter(name: str):
+    if name == "file":
+        return FileSpanExporter(TRACE_FILE)
+    if name == "otlp":
+        return OTLPHttpExporter(OTLP_ENDPOINT, TRACE_SERVICE_NAME)
+    if name not in ("", "none"):
+        logger.warning(f"Unknown TRACE_EXPORTER '{name}', spans will not be exported")
+    return None
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter."""
+
+    def __init__(self, exporter_name: str = TRACE_EXPORTER):
+        self.exporter_name = exporter_name
+        self._batcher: Optional[_BatchExporter] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self) -> int:
+        """Spans dropped because the export queue was full or the export failed."""
+        return self._batcher.dropped if self._batcher else 0
+
+    def _export(self, span: Span):
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    exporter = _build_exporter(self.exporter_name)
+                    if exporter is None:
+                        self.exporter_name = "none"
+                        return
+                    self._batcher = _BatchExporter(exporter, TRACE_QUEUE_SIZE)
+        self._batcher.submit(span)
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+             kind: str = "internal", **attributes) -> Iterator[Span]:
+        """
+        Time a block of work as a child of the current span.
+
+        Args:
+            name: Stage name, e.g. "pubmed.efetch"
+            trace_id: Start the span in this trace instead of the current one
+                (with parent_id, continues a trace propagated from a caller)
+            parent_id: Parent span id for trace_id
+            kind: "server" for request root spans, otherwise "internal"
+            **attributes: Span attributes, e.g. pmid
+
+        Yields:
+            The open span; exceptions leaving the block mark it as failed
+        """
+        parent = _current_span.get()
+        if trace_id is None:
+            if parent is not None:
+                trace_id, parent_id = parent.trace_id, parent.span_id
+            else:
+                trace_id = os.urandom(16).hex()
+
+        span = Span(name, trace_id, parent_id, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            span.end()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # An async generator closed from another context (e.g. after a client
+                # disconnect); that context never saw this span as current
+                pass
+            if self.exporter_name != "none":
+                self._export(span)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator running a (synchronous) function inside a span."""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of the current context, if any."""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+async def run_in_executor(func: Callable, *args) -> Any:
+    """
+    Run a blocking callable in the default executor, keeping the current span.
+
+    loop.run_in_executor does not carry context variables into the worker
+    thread, so spans opened by func would otherwise start a new trace.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args))
+
+
+def _parse_traceparent(value: str):
+    """Trace and parent span id of a W3C traceparent header, or (None, None)."""
+    parts = value.strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+            return parts[1], parts[2]
+        except ValueError:
+            pass
+    return None, None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a root span per HTTP request.
+
+    Continues the trace of an incoming W3C ``traceparent`` header, returns the
+    trace id in an ``X-Trace-Id`` response header, and keeps the span open until
+    the response body (including streamed responses) has been sent.
+    """
+
+    # Static assets and API docs are not traced
+    EXCLUDED_PREFIXES = ("/static", "/docs", "/redoc", "/openapi.json")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        route = f"{scope['method']} {scope['path']}"
+
+        with tracer.span(route, trace_id=trace_id, parent_id=parent_id, kind="server",
+                         **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = STATUS_ERROR
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+
+# Global tracer instance
+tracer = Tracer()
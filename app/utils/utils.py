@@ -34,6 +34,45 @@ class Config:
     # Model parameters
     MAX_LENGTH = 512
     
+    # Training data loaders: worker processes (0 loads in the training process, which is
+    # fastest for in-memory tensors on CPU), pinned memory for GPU transfer, batches
+    # prefetched per worker
+    NUM_WORKERS = int(os.getenv("NUM_WORKERS", "0"))
+    PIN_MEMORY = os.getenv("PIN_MEMORY", "true").lower() == "true"
+    PREFETCH_FACTOR = int(os.getenv("PREFETCH_FACTOR", "2"))
+    
+    # Embedding batching: padded tokens per forward pass, rows per pass, texts tokenized at once
+    EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "16384"))
+    EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+    EMBEDDING_CHUNK_SIZE = int(os.getenv("EMBEDDING_CHUNK_SIZE", "2048"))
+    
+    # Long documents: "truncate" embeds the first MAX_LENGTH tokens only; "mean", "max"
+    # or "attention" embed overlapping windows (WINDOW_STRIDE tokens of overlap, at most
+    # MAX_WINDOWS per document) and pool them into one vector
+    EMBEDDING_POOLING = os.getenv("EMBEDDING_POOLING", "truncate")
+    WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "128"))
+    MAX_WINDOWS = int(os.getenv("MAX_WINDOWS", "32"))
+    
+    # Training data acquisition: concurrent fetch workers
+    ACQUISITION_WORKERS = int(os.getenv("ACQUISITION_WORKERS", "4"))
+    
+    # Batch classification: trained classifier weights, micro-batch size and how long
+    # (seconds) to wait for a micro-batch to fill, concurrent retrievals, PMIDs per request
+    CLASSIFIER_MODEL_PATH = Path(os.getenv("CLASSIFIER_MODEL_PATH", "models/microbesig_classifier.pt"))
+    CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "32"))
+    CLASSIFY_BATCH_WINDOW = float(os.getenv("CLASSIFY_BATCH_WINDOW", "0.05"))
+    CLASSIFY_MAX_CONCURRENT = int(os.getenv("CLASSIFY_MAX_CONCURRENT", "3"))
+    CLASSIFY_MAX_PMIDS = int(os.getenv("CLASSIFY_MAX_PMIDS", "5000"))
+    
+    # Curated papers: BugSigDB export and the similarity index built over it
+    CURATED_CSV_PATH = Path(os.getenv("CURATED_CSV_PATH", "data/full_dump.csv"))
+    SIMILARITY_INDEX_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", "cache/similarity_index"))
+    SIMILARITY_BACKEND = os.getenv("SIMILARITY_BACKEND", "auto")  # auto, hnsw or ivf
+    
+    # Embedding store (persistent cache of document embeddings)
+    EMBEDDING_DIR = Path(os.getenv("EMBEDDING_DIR", "cache/embeddings"))
+    EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")  # float32 or float16
+    
     def __post_init__(self):
         """Create necessary directories."""
         for directory in [self.CACHE_DIR, self.MODEL_DIR, self.DATA_DIR]:
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Similarity Index Builder for BioAnalyzer
+========================================
+
+This script embeds every curated paper in the BugSigDB export with SciBERT and
+adds it to the similarity index served by the /similar/{pmid} endpoint. Title,
+abstract and MeSH terms are fetched from PubMed, so indexed papers are embedded
+from the same text as /similar queries. Papers already in the index are
+skipped, so re-running after a new export only embeds the new papers.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.utils import config
+from app.services.curated_papers import CuratedPapers
+from app.services.similarity_index import SimilarityIndex, build_curated_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-curated-papers index")
+    parser.add_argument("--csv", default=str(config.CURATED_CSV_PATH), help="BugSigDB CSV export")
+    parser.add_argument("--index_dir", default=str(config.SIMILARITY_INDEX_DIR), help="Index directory")
+    parser.add_argument("--backend", choices=["auto", "hnsw", "ivf"], default=config.SIMILARITY_BACKEND,
+                        help="Search structure (auto uses HNSW when hnswlib is installed)")
+    parser.add_argument("--batch_size", type=int, default=256, help="Papers embedded per batch")
+    parser.add_argument("--title_only", action="store_true",
+                        help="Embed curated titles without fetching abstracts and MeSH terms from PubMed "
+                             "(fast and offline, but /similar queries embed title, abstract and MeSH terms)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the search structure without adding papers")
+
+    args = parser.parse_args()
+
+    index = SimilarityIndex(Path(args.index_dir), backend=args.backend)
+    print(f"📚 Index at {args.index_dir}: {len(index)} papers ({index.backend})")
+
+    if args.rebuild:
+        start = time.time()
+        index.build()
+        print(f"✅ Rebuilt index in {time.time() - start:.1f}s")
+        return
+
+    curated = CuratedPapers(Path(args.csv))
+    if not curated.pmids():
+        print(f"❌ No curated papers found in {args.csv}")
+        sys.exit(1)
+
+    # Heavy imports only once we know there is work to do
+    from app.services.preprocessing import TextPreprocessor
+
+    retriever = None
+    if not args.title_only:
+        from app.services.data_retrieval import PubMedRetriever
+        retriever = PubMedRetriever()
+
+    start = time.time()
+    added = build_curated_index(index, curated, TextPreprocessor(), retriever, batch_size=args.batch_size)
+    print(f"✅ Added {added} papers in {time.time() - start:.1f}s; index now holds {len(index)} papers")
+
+
+if __name__ == "__main__":
+    main()
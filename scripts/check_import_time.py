@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Import-Time Budget Check for BioAnalyzer
+========================================
+
+This script imports the API module in a fresh interpreter and fails if the
+import takes longer than the budget or pulls in heavy ML libraries that should
+only be loaded on first use (see app/core/registry.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that must not be imported when the API starts
+HEAVY_MODULES = ["torch", "transformers", "tiktoken", "pandas", "sklearn"]
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def measure_import(module, importtime=False):
+    """Import a module in a fresh interpreter and report time and heavy modules loaded."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", PROBE.format(module=module, heavy=HEAVY_MODULES)]
+
+    result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, env=os.environ.copy())
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["importtime"] = result.stderr if importtime else ""
+    return report
+
+
+def slowest_imports(importtime_output, top=15):
+    """Parse `-X importtime` output into the modules with the largest cumulative time."""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        # Skip the header row ("self [us] | cumulative | imported package")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1].strip()), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API import time budget")
+    parser.add_argument("--module", default="app.api.app", help="Module to import")
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of fresh imports (best time is used)")
+    parser.add_argument("--details", action="store_true", help="Show the slowest imports")
+
+    args = parser.parse_args()
+
+    print(f"⏱️  Importing {args.module} ({args.repeat} runs, budget {args.budget:.2f}s)...")
+    reports = [measure_import(args.module) for _ in range(args.repeat)]
+    best = min(report["elapsed"] for report in reports)
+    loaded = reports[0]["loaded"]
+
+    print(f"📊 Best import time: {best:.3f}s")
+
+    if args.details:
+        report = measure_import(args.module, importtime=True)
+        print("\n🐢 Slowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports(report["importtime"]):
+            print(f"   {cumulative_us / 1e6:8.3f}s  {name}")
+        print()
+
+    ok = True
+    if best > args.budget:
+        print(f"❌ Import time {best:.3f}s exceeds budget of {args.budget:.2f}s")
+        ok = False
+    if loaded:
+        print(f"❌ Heavy modules imported at startup: {', '.join(loaded)}")
+        ok = False
+
+    if ok:
+        print("✅ Import time within budget and no heavy modules loaded")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
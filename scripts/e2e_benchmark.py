@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark for BioAnalyzer
+====================================
+
+This script boots the FastAPI app offline against local stand-ins for NCBI
+E-utilities and Gemini, drives its analysis endpoints at a configurable
+concurrency, and reports throughput, latency percentiles and cache hit rate as
+JSON, so performance changes can be compared against a saved baseline:
+
+    python scripts/e2e_benchmark.py --output baseline.json
+    python scripts/e2e_benchmark.py --pmids 40 --concurrency 8 --eutils-latency 0.3 --gemini-latency 2
+
+The fake E-utilities server serves the recorded responses in scripts/fixtures
+(efetch, elink and PMC efetch) with configurable latency and error rate; the
+app's Biopython requests are redirected to it. Gemini is replaced inside the app
+process by a model returning the recorded LLM outputs after a configurable
+delay. The app runs in a subprocess with its own working directory, so its
+cache starts empty and the real cache, logs and API quotas are untouched.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+NCBI_EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+
+# Synthetic PMIDs start here; PMC ids are the PMID with this prefix
+FIRST_PMID = 30000000
+PMCID_PREFIX = "9"
+
+SCENARIOS = ["analyze", "analyze_batch", "enhanced_analysis_batch", "upload_csv"]
+
+# /upload_csv analyzes at most this many PMIDs per file
+UPLOAD_CSV_LIMIT = 10
+
+
+class FixtureCorpus:
+    """Recorded PubMed, PMC and Gemini responses, mapped onto any PMID."""
+
+    def __init__(self, fixtures_dir: Path = FIXTURES_DIR):
+        papers_dir = Path(fixtures_dir) / "papers"
+        self.names = sorted(path.name[:-len(".pubmed.xml")] for path in papers_dir.glob("*.pubmed.xml"))
+        if not self.names:
+            raise FileNotFoundError(f"No *.pubmed.xml fixtures in {papers_dir}")
+
+        def read(name: str, suffix: str) -> Optional[str]:
+            path = papers_dir / f"{name}{suffix}"
+            return path.read_text(encoding="utf-8") if path.exists() else None
+
+        self.pubmed = {name: read(name, ".pubmed.xml") for name in self.names}
+        self.pmc = {name: read(name, ".pmc.xml") for name in self.names}
+        self.gemini = {name: read(name, ".gemini.txt") or "{}" for name in self.names}
+        self.titles = {
+            name: re.search(r"<ArticleTitle>(.*?)</ArticleTitle>", xml, re.S).group(1).strip()
+            for name, xml in self.pubmed.items()
+        }
+        self.elink = (Path(fixtures_dir) / "elink.xml").read_text(encoding="utf-8")
+        self.elink_nolink = (Path(fixtures_dir) / "elink_nolink.xml").read_text(encoding="utf-8")
+
+    def paper(self, pmid: str) -> str:
+        return self.names[int(pmid) % len(self.names)]
+
+    @staticmethod
+    def _fill(template: str, pmid: str) -> str:
+        return template.replace("@PMID@", pmid).replace("@PMCID@", PMCID_PREFIX + pmid)
+
+    def pubmed_xml(self, pmid: str) -> str:
+        return self._fill(self.pubmed[self.paper(pmid)], pmid)
+
+    def elink_xml(self, pmid: str) -> str:
+        template = self.elink if self.pmc[self.paper(pmid)] else self.elink_nolink
+        return self._fill(template, pmid)
+
+    def pmc_xml(self, pmcid: str) -> Optional[str]:
+        pmid = pmcid[len(PMCID_PREFIX):]
+        template = self.pmc[self.paper(pmid)]
+        return self._fill(template, pmid) if template else None
+
+    def gemini_output(self, prompt: str) -> str:
+        """Recorded model output of the paper whose title appears in the prompt."""
+        for name, title in self.titles.items():
+            if title[:60] in prompt:
+                return self.gemini[name]
+        return self.gemini[self.names[0]]
+
+
+def jittered(latency: float, jitter: float) -> float:
+    """Latency scaled by a uniform factor in [1 - jitter, 1 + jitter]."""
+    return max(0.0, latency * random.uniform(1 - jitter, 1 + jitter))
+
+
+class FakeEutilsHandler(BaseHTTPRequestHandler):
+    """Answers efetch and elink requests from the fixture corpus."""
+
+    server: "FakeEutilsServer"
+
+    def do_GET(self):
+        self._respond(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        params = parse_qs(urlparse(self.path).query)
+        params.update(parse_qs(self.rfile.read(length).decode("utf-8")))
+        self._respond(params)
+
+    def _respond(self, params: Dict[str, List[str]]):
+        endpoint = urlparse(self.path).path.rsplit("/", 1)[-1].replace(".fcgi", "")
+        db = params.get("db", [""])[0]
+        pmid = params.get("id", [""])[0].split(",")[0]
+
+        time.sleep(jittered(self.server.latency, self.server.jitter))
+        if random.random() < self.server.error_rate:
+            self.server.record(endpoint, db, error=True)
+            self.send_error(503, "Service temporarily unavailable")
+            return
+
+        body = None
+        if endpoint == "efetch" and db == "pubmed":
+            body = self.server.corpus.pubmed_xml(pmid)
+        elif endpoint == "efetch" and db == "pmc":
+            body = self.server.corpus.pmc_xml(pmid)
+        elif endpoint == "elink":
+            body = self.server.corpus.elink_xml(pmid)
+        self.server.record(endpoint, db, error=body is None)
+
+        if body is None:
+            self.send_error(400, f"Unsupported request: {endpoint} db={db} id={pmid}")
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeEutilsServer(ThreadingHTTPServer):
+    """Local E-utilities stand-in with configurable latency and error rate."""
+
+    daemon_threads = True
+
+    def __init__(self, corpus: FixtureCorpus, latency: float = 0.2, jitter: float = 0.5, error_rate: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FakeEutilsHandler)
+        self.corpus = corpus
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def record(self, endpoint: str, db: str, error: bool):
+        key = f"{endpoint}:{db}" if endpoint == "efetch" else endpoint
+        with self._lock:
+            counts = self.counts.setdefault(key, {"requests": 0, "errors": 0})
+            counts["requests"] += 1
+            counts["errors"] += int(error)
+
+    def start(self) -> "FakeEutilsServer":
+        threading.Thread(target=self.serve_forever, name="fake-eutils", daemon=True).start()
+        return self
+
+
+def install_fake_eutils(url: str):
+    """Send Biopython's E-utilities requests to the fake server."""
+    from Bio import Entrez
+
+    original_urlopen = Entrez.urlopen
+
+    def urlopen(request, *args, **kwargs):
+        if request.full_url.startswith(NCBI_EUTILS_URL):
+            request.full_url = url + request.full_url[len(NCBI_EUTILS_URL):]
+        return original_urlopen(request, *args, **kwargs)
+
+    Entrez.urlopen = urlopen
+
+
+def install_fake_gemini(corpus: FixtureCorpus, latency: float, jitter: float, error_rate: float):
+    """Replace google.generativeai.GenerativeModel with one serving recorded outputs."""
+    import google.generativeai as genai
+
+    class FakeResponse:
+        def __init__(self, text: str):
+            self.text = text
+
+    class FakeStream:
+        def __init__(self, text: str, delay: float, chunk_size: int = 256):
+            self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+            self.delay = delay / len(self.chunks)
+
+        async def __aiter__(self):
+            for chunk in self.chunks:
+                await asyncio.sleep(self.delay)
+                yield FakeResponse(chunk)
+
+    class FakeGenerativeModel:
+        def __init__(self, model_name: str = "", **kwargs):
+            self.model_name = model_name
+
+        def _output(self, prompt) -> str:
+            if random.random() < error_rate:
+                raise RuntimeError("503 The model is overloaded. Please try again later.")
+            return corpus.gemini_output(str(prompt))
+
+        def generate_content(self, prompt, **kwargs):
+            time.sleep(jittered(latency, jitter))
+            return FakeResponse(self._output(prompt))
+
+        async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+            delay = jittered(latency, jitter)
+            if stream:
+                # Time to first chunk, then the rest of the delay spread over the chunks
+                await asyncio.sleep(delay * 0.3)
+                return FakeStream(self._output(prompt), delay * 0.7)
+            await asyncio.sleep(delay)
+            return FakeResponse(self._output(prompt))
+
+    genai.GenerativeModel = FakeGenerativeModel
+
+
+def serve_app(args):
+    """Run the app with the fake backends installed (the benchmark's subprocess)."""
+    corpus = FixtureCorpus(Path(args.fixtures))
+    install_fake_eutils(args.eutils_url)
+    install_fake_gemini(corpus, args.gemini_latency, args.jitter, args.gemini_error_rate)
+
+    import uvicorn
+    from app.api.app import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of pre-sorted values."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def paper_results(body) -> List[Dict]:
+    """Per-paper results of a response: the body itself or the items of its result list."""
+    if isinstance(body, dict):
+        for key in ("results", "batch_results"):
+            if isinstance(body.get(key), list):
+                return paper_results(body[key])
+        return [body] if "pmid" in body else []
+    if isinstance(body, list):
+        return [item for item in body if isinstance(item, dict)]
+    return []
+
+
+# One benchmark request: (HTTP method, path, factory of aiohttp request kwargs)
+RequestSpec = Tuple[str, str, Callable[[], Dict]]
+
+
+async def run_scenario(session, base_url: str, requests: List[RequestSpec], concurrency: int) -> Dict:
+    """
+    Issue the requests with at most `concurrency` in flight and summarize them.
+
+    Returns:
+        Dictionary with request and error counts, throughput, latency percentiles
+        (seconds, successful requests only), status code counts, and the number of
+        papers returned, failed papers and cache hit rate among them
+    """
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses, papers = [], {}, []
+
+    async def issue(method: str, path: str, make_kwargs: Callable[[], Dict]):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, **make_kwargs()) as response:
+                    payload = await response.read()
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                payload, status = b"", type(e).__name__
+            duration = time.perf_counter() - start
+
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "200":
+            latencies.append(duration)
+            try:
+                papers.extend(paper_results(json.loads(payload)))
+            except ValueError:
+                pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(issue(*spec) for spec in requests))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    latency = {
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else None
+    }
+    latency = {key: round(value, 4) if value is not None else None for key, value in latency.items()}
+    # Batch endpoints answer 200 even when single papers fail
+    paper_errors = sum(1 for paper in papers if paper.get("status") == "error")
+    flags = [bool(paper["cached"]) for paper in papers if "cached" in paper]
+    return {
+        "requests": len(requests),
+        "errors": len(requests) - len(latencies),
+        "elapsed": round(elapsed, 4),
+        "throughput_rps": round(len(requests) / elapsed, 4) if elapsed else None,
+        "latency": latency,
+        "status_codes": statuses,
+        "papers": len(papers),
+        "paper_errors": paper_errors,
+        "cache_hit_rate": round(sum(flags) / len(flags), 4) if flags else None
+    }
+
+
+def build_requests(scenario: str, pmids: List[str], batch_size: int, max_concurrent: int) -> List[RequestSpec]:
+    """Requests covering the given PMIDs for one scenario."""
+    if scenario == "analyze":
+        return [("GET", f"/analyze/{pmid}", dict) for pmid in pmids]
+
+    if scenario == "upload_csv":
+        batch_size = min(batch_size, UPLOAD_CSV_LIMIT)
+    batches = [pmids[i:i + batch_size] for i in range(0, len(pmids), batch_size)]
+
+    if scenario == "analyze_batch":
+        return [("POST", f"/analyze_batch?page_size={len(batch)}", lambda batch=batch: {"json": batch})
+                for batch in batches]
+    if scenario == "enhanced_analysis_batch":
+        return [("POST", f"/enhanced_analysis_batch?max_concurrent={max_concurrent}", lambda batch=batch: {"json": batch})
+                for batch in batches]
+    if scenario == "upload_csv":
+        import aiohttp
+
+        def upload(batch: List[str]) -> Dict:
+            form = aiohttp.FormData()
+            form.add_field("file", "pmid\n" + "\n".join(batch) + "\n", filename="pmids.csv", content_type="text/csv")
+            return {"data": form}
+
+        return [("POST", "/upload_csv", lambda batch=batch: upload(batch)) for batch in batches]
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def drive(base_url: str, args) -> Dict[str, Dict]:
+    """Run every selected scenario; each one analyzes its own fresh PMIDs."""
+    import aiohttp
+
+    results = {}
+    next_pmid = FIRST_PMID
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        for scenario in args.scenarios:
+            pmids = [str(pmid) for pmid in range(next_pmid, next_pmid + args.pmids)]
+            next_pmid += args.pmids
+            requests = build_requests(scenario, pmids, args.batch_size, args.max_concurrent)
+
+            # First pass runs against an empty cache, later passes are served from it
+            for repeat in range(args.repeat):
+                name = scenario if args.repeat == 1 else f"{scenario}_{'cold' if repeat == 0 else f'warm{repeat}'}"
+                print(f"🚀 {name}: {len(requests)} requests at concurrency {args.concurrency}", file=sys.stderr)
+                results[name] = await run_scenario(session, base_url, requests, args.concurrency)
+                summary = results[name]
+                print(f"   {summary['throughput_rps']} req/s, p50 {summary['latency']['p50']}, "
+                      f"p95 {summary['latency']['p95']}, errors {summary['errors']} "
+                      f"({summary['paper_errors']} papers), "
+                      f"cache hit rate {summary['cache_hit_rate']}", file=sys.stderr)
+    return results
+
+
+def wait_for_app(base_url: str, process: subprocess.Popen, timeout: float) -> bool:
+    """Poll /health until the app answers, the process exits or the timeout passes."""
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args) -> Dict:
+    corpus = FixtureCorpus(Path(args.fixtures))
+    eutils = FakeEutilsServer(corpus, args.eutils_latency, args.jitter, args.eutils_error_rate).start()
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="bioanalyzer-bench-"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        "NCBI_API_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "EMAIL": "benchmark@example.org",
+        "LOG_LEVEL": "WARNING",
+        "TRACE_EXPORTER": env.get("TRACE_EXPORTER", "none")
+    })
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--serve-app",
+        "--port", str(port),
+        "--eutils-url", eutils.url,
+        "--fixtures", str(Path(args.fixtures).resolve()),
+        "--gemini-latency", str(args.gemini_latency),
+        "--gemini-error-rate", str(args.gemini_error_rate),
+        "--jitter", str(args.jitter)
+    ]
+
+    app_log = open(work_dir / "app.log", "w")
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=app_log, stderr=subprocess.STDOUT)
+    try:
+        print(f"⏳ Starting app on {base_url} (work dir {work_dir})", file=sys.stderr)
+        if not wait_for_app(base_url, process, args.startup_timeout):
+            app_log.flush()
+            tail = (work_dir / "app.log").read_text(errors="replace")[-2000:]
+            raise RuntimeError(f"App did not become healthy within {args.startup_timeout}s:\n{tail}")
+
+        scenarios = asyncio.run(drive(base_url, args))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        app_log.close()
+        eutils.shutdown()
+        if not args.work_dir and not args.keep_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {
+            "pmids": args.pmids,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "max_concurrent": args.max_concurrent,
+            "repeat": args.repeat,
+            "eutils_latency": args.eutils_latency,
+            "eutils_error_rate": args.eutils_error_rate,
+            "gemini_latency": args.gemini_latency,
+            "gemini_error_rate": args.gemini_error_rate,
+            "jitter": args.jitter,
+            "fixture_papers": corpus.names
+        },
+        "scenarios": scenarios,
+        "eutils_requests": eutils.counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against fake NCBI and Gemini backends")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--pmids", type=int, default=20, help="Distinct PMIDs per scenario (default: 20)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=5, help="PMIDs per batch request or CSV file (default: 5)")
+    parser.add_argument("--max-concurrent", type=int, default=5, help="max_concurrent of /enhanced_analysis_batch")
+    parser.add_argument("--repeat", type=int, default=2,
+                        help="Passes over the same PMIDs; passes after the first hit the cache (default: 2)")
+    parser.add_argument("--eutils-latency", type=float, default=0.2, help="Mean E-utilities latency in seconds")
+    parser.add_argument("--eutils-error-rate", type=float, default=0.0, help="Fraction of E-utilities requests failing with 503")
+    parser.add_argument("--gemini-latency", type=float, default=1.5, help="Mean Gemini latency in seconds")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Fraction of Gemini calls raising an error")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latencies vary uniformly by this fraction (default: 0.5)")
+    parser.add_argument("--request-timeout", type=float, default=300.0, help="Client timeout per request in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Seconds to wait for the app to start")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Fixture directory")
+    parser.add_argument("--work-dir", help="Working directory of the app (default: a temporary directory)")
+    parser.add_argument("--keep-work-dir", action="store_true", help="Keep the temporary working directory")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    # Internal: run the app process with the fake backends installed
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--eutils-url", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(args)
+        return
+
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
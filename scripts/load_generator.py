@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Load Generator for BioAnalyzer
+==============================
+
+This script puts concurrent load on a running API to expose contention (the
+SQLite connection pool, executor starvation, E-utilities rate limiting) that
+one-request-at-a-time checks cannot show. Two modes are supported:
+
+- open loop (--rate): requests arrive at a fixed rate, constant or Poisson,
+  whether or not earlier ones have finished, like independent users. Latency is
+  measured from the scheduled arrival time, so a stalled server shows up as
+  queueing instead of silently lowering the request rate (coordinated omission).
+- closed loop (--users): N virtual users each send a request, wait for the
+  response and the think time, and send the next one.
+
+Requests are drawn from a weighted endpoint mix, and the target rate or number
+of users follows a ramp schedule of linear stages:
+
+    python scripts/load_generator.py --rate 5 --duration 2m --ramp-up 30s
+    python scripts/load_generator.py --users 20 --stages 30s:5,1m:20,30s:0 --mix enhanced_analysis=8,health=2
+    python scripts/load_generator.py --rate 10 --duration 1m --output run.json --compare baseline.json
+
+Latencies are recorded in mergeable log-bucketed histograms (1% relative error,
+like HDR histograms) per endpoint. With a fixed --seed the same PMIDs and
+endpoints are requested in the same order, and the JSON report keeps the
+configuration, per-endpoint percentile ladders, a per-interval timeline and the
+histograms themselves, so runs can be compared (--compare) or merged later.
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.utils.latency_sketch import LatencySketch
+
+# name: (method, path template, sends a JSON list of PMIDs)
+ENDPOINTS = {
+    "enhanced_analysis": ("GET", "/enhanced_analysis/{pmid}", False),
+    "analyze": ("GET", "/analyze/{pmid}", False),
+    "analyze_batch": ("POST", "/analyze_batch?page_size={batch_size}", True),
+    "enhanced_analysis_batch": ("POST", "/enhanced_analysis_batch", True),
+    "similar": ("GET", "/similar/{pmid}", False),
+    "health": ("GET", "/health", False),
+    "metrics": ("GET", "/metrics", False),
+    "cache_stats": ("GET", "/cache/stats", False),
+}
+
+PERCENTILES = [50, 75, 90, 95, 99, 99.9]
+
+DEFAULT_PMIDS = ["12345", "67890", "11111"]
+
+Request = Tuple[str, str, str, Optional[List[str]]]
+
+
+def parse_duration(value: str) -> float:
+    """Convert '90', '90s', '5m' or '1h' to seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    value = value.strip()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def parse_stages(value: str) -> List[Tuple[float, float]]:
+    """Parse '30s:10,1m:50,30s:0' into (duration, target) stages."""
+    stages = []
+    for stage in value.split(","):
+        duration, _, target = stage.partition(":")
+        stages.append((parse_duration(duration), float(target)))
+    return stages
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'enhanced_analysis=8,health=2' into endpoint weights."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def target_at(stages: List[Tuple[float, float]], elapsed: float) -> float:
+    """
+    Target rate or number of users at a point of the schedule.
+
+    Each stage ramps linearly from the previous stage's target (0 before the
+    first stage) to its own over its duration.
+    """
+    previous, start = 0.0, 0.0
+    for duration, target in stages:
+        if elapsed < start + duration:
+            if not duration or math.isinf(duration):
+                return target
+            return previous + (target - previous) * (elapsed - start) / duration
+        previous, start = target, start + duration
+    return previous
+
+
+def arrival_times(stages: List[Tuple[float, float]], arrival: str, rng: random.Random,
+                  step: float = 0.001) -> Iterator[float]:
+    """
+    Offsets (seconds from the start) of open-loop arrivals following the schedule.
+
+    Constant arrivals are evenly spaced at the current rate; Poisson arrivals are
+    drawn by thinning a process at the peak rate.
+    """
+    total = sum(duration for duration, _ in stages)
+    if arrival == "poisson":
+        peak = max(target for _, target in stages)
+        if peak <= 0:
+            return
+        t = 0.0
+        while True:
+            t += rng.expovariate(peak)
+            if t >= total:
+                return
+            if rng.random() * peak < target_at(stages, t):
+                yield t
+    else:
+        due, t = 0.0, 0.0
+        while t < total:
+            due += target_at(stages, t) * step
+            while due >= 1.0:
+                yield t
+                due -= 1.0
+            t += step
+
+
+class Workload:
+    """Deterministic stream of requests drawn from a weighted endpoint mix."""
+
+    def __init__(self, mix: Dict[str, float], pmids: List[str], batch_size: int = 5,
+                 order: str = "random", seed: int = 0, max_requests: Optional[int] = None):
+        """
+        Args:
+            mix: Endpoint name to relative weight
+            pmids: PMIDs requested by the per-paper endpoints
+            batch_size: PMIDs per batch request
+            order: "random" draws PMIDs with replacement, "sequential" cycles through them
+            seed: Seed of the endpoint and PMID choices
+            max_requests: Stop after this many requests (unlimited if None)
+        """
+        self.names = list(mix)
+        self.cum_weights = []
+        total = 0.0
+        for name in self.names:
+            total += mix[name]
+            self.cum_weights.append(total)
+        self.pmids = pmids
+        self.batch_size = batch_size
+        self.order = order
+        self.rng = random.Random(seed)
+        self.max_requests = max_requests
+        self.issued = 0
+        self._next_pmid = 0
+
+    def _pmid(self) -> str:
+        if self.order == "sequential":
+            pmid = self.pmids[self._next_pmid % len(self.pmids)]
+            self._next_pmid += 1
+            return pmid
+        return self.rng.choice(self.pmids)
+
+    def next_request(self) -> Optional[Request]:
+        """The next (endpoint, method, path, JSON body) to send, or None when done."""
+        if self.max_requests is not None and self.issued >= self.max_requests:
+            return None
+        self.issued += 1
+        name = self.rng.choices(self.names, cum_weights=self.cum_weights)[0]
+        method, template, batch = ENDPOINTS[name]
+        if batch:
+            body = [self._pmid() for _ in range(self.batch_size)]
+            return name, method, template.format(batch_size=self.batch_size), body
+        return name, method, template.format(pmid=self._pmid()), None
+
+
+def ladder(sketch: LatencySketch) -> Dict[str, Optional[float]]:
+    """Percentile ladder of a histogram, in seconds."""
+    values = {f"p{p:g}": sketch.quantile(p / 100) for p in PERCENTILES}
+    values["max"] = sketch.max if sketch.count else None
+    values["mean"] = sketch.mean if sketch.count else None
+    return {key: round(value, 4) if value is not None else None for key, value in values.items()}
+
+
+class EndpointStats:
+    """Counts and latency histograms of one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.status_codes: Dict[str, int] = {}
+        self.latency = LatencySketch()
+        self.service_time = LatencySketch()
+
+    def record(self, status: str, latency: float, service_time: float):
+        self.requests += 1
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if status.startswith("2"):
+            self.latency.add(latency)
+            self.service_time.add(service_time)
+        else:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throughput_rps": round(self.requests / elapsed, 4) if elapsed else None,
+            "status_codes": self.status_codes,
+            "latency": ladder(self.latency),
+            "service_time": ladder(self.service_time)
+        }
+
+
+class LoadGenerator:
+    """Sends a workload to the API in open or closed loop and records the results."""
+
+    def __init__(self, session, base_url: str, workload: Workload, stages: List[Tuple[float, float]],
+                 think_time: float = 0.0, max_in_flight: int = 1000, seed: int = 0):
+        """
+        Args:
+            session: aiohttp ClientSession
+            base_url: Base URL of the API
+            workload: Requests to send
+            stages: Ramp schedule of (duration, target rate or users)
+            think_time: Mean pause of a closed-loop user between requests (exponential)
+            max_in_flight: Open-loop arrivals beyond this many outstanding requests are dropped
+            seed: Seed of the arrival times and think times
+        """
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.stages = stages
+        self.think_time = think_time
+        self.max_in_flight = max_in_flight
+        self.rng = random.Random(seed + 1)
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.total = EndpointStats()
+        self.dropped = 0
+        self.in_flight = 0
+        self.start = 0.0
+        self._interval = EndpointStats()
+
+    async def issue(self, request: Request, scheduled: Optional[float] = None):
+        """Send one request; latency counts from its scheduled time if given."""
+        import aiohttp
+
+        name, method, path, body = request
+        self.in_flight += 1
+        sent = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, json=body) as response:
+                await response.read()
+                status = str(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        done = time.perf_counter()
+
+        latency = done - (scheduled if scheduled is not None else sent)
+        for stats in (self.endpoints.setdefault(name, EndpointStats()), self.total, self._interval):
+            stats.record(status, latency, done - sent)
+
+    async def open_loop(self, arrival: str):
+        tasks = set()
+        for offset in arrival_times(self.stages, arrival, self.rng):
+            delay = self.start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            request = self.workload.next_request()
+            if request is None:
+                break
+            if self.in_flight >= self.max_in_flight:
+                self.dropped += 1
+                continue
+            task = asyncio.create_task(self.issue(request, scheduled=self.start + offset))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def closed_loop(self, duration: Optional[float]):
+        """Run virtual users; user i is active while the target is above i."""
+        end = self.start + duration if duration is not None else math.inf
+        users: Dict[int, asyncio.Task] = {}
+
+        def active(index: int) -> bool:
+            now = time.perf_counter()
+            return now < end and index < round(target_at(self.stages, now - self.start))
+
+        async def user(index: int):
+            while active(index):
+                request = self.workload.next_request()
+                if request is None:
+                    return
+                await self.issue(request)
+                if self.think_time:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+        while time.perf_counter() < end:
+            target = round(target_at(self.stages, time.perf_counter() - self.start))
+            for index in range(target):
+                if index not in users or users[index].done():
+                    users[index] = asyncio.create_task(user(index))
+            if self.workload.max_requests is not None and self.workload.issued >= self.workload.max_requests:
+                break
+            await asyncio.sleep(0.1)
+        await asyncio.gather(*users.values())
+
+    async def report_progress(self, interval: float, timeline: List[Dict], quiet: bool = False):
+        while True:
+            await asyncio.sleep(interval)
+            stats, self._interval = self._interval, EndpointStats()
+            elapsed = time.perf_counter() - self.start
+            entry = {
+                "t": round(elapsed, 1),
+                "target": round(target_at(self.stages, elapsed), 2),
+                "completed": stats.requests,
+                "errors": stats.errors,
+                "throughput_rps": round(stats.requests / interval, 2),
+                "in_flight": self.in_flight,
+                "p50": ladder(stats.latency)["p50"],
+                "p99": ladder(stats.latency)["p99"]
+            }
+            timeline.append(entry)
+            if not quiet:
+                print(f"   {entry['t']:7.1f}s | target {entry['target']:7.2f} | {entry['throughput_rps']:7.2f} req/s | "
+                      f"in flight {entry['in_flight']:4d} | errors {entry['errors']:4d} | "
+                      f"p50 {entry['p50']} | p99 {entry['p99']}", file=sys.stderr)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def schedule(args) -> List[Tuple[float, float]]:
+    """Ramp schedule from --stages, or from --duration and --ramp-up at --rate / --users."""
+    if args.stages:
+        return parse_stages(args.stages)
+    target = args.rate if args.rate is not None else args.users
+    # The ramp stage is kept even when empty: (0, target) makes the target hold from t=0
+    duration = args.duration - args.ramp_up if args.duration is not None else math.inf
+    return [(args.ramp_up, target), (max(duration, 0.0), target)]
+
+
+async def run(args) -> Dict:
+    """Run a load test as configured by parse_args and return its report."""
+    import aiohttp
+
+    stages = schedule(args)
+    duration = sum(d for d, _ in stages)
+    mode = "open" if args.rate is not None else "closed"
+    workload = Workload(args.mix, args.pmids, args.batch_size, args.order, args.seed, args.max_requests)
+
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    timeline: List[Dict] = []
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        generator = LoadGenerator(session, args.url, workload, stages, args.think_time,
+                                  args.max_in_flight, args.seed)
+        if not args.quiet:
+            load = f"{args.rate} req/s ({args.arrival})" if mode == "open" else f"{args.users} users"
+            print(f"🚀 {mode}-loop load on {args.url}: {load}, "
+                  f"{'until done' if math.isinf(duration) else f'{duration:g}s'}", file=sys.stderr)
+        generator.start = time.perf_counter()
+        reporter = asyncio.create_task(generator.report_progress(args.report_interval, timeline, args.quiet))
+        try:
+            if mode == "open":
+                await generator.open_loop(args.arrival)
+            else:
+                await generator.closed_loop(None if math.isinf(duration) else duration)
+        finally:
+            reporter.cancel()
+        elapsed = time.perf_counter() - generator.start
+
+    summary = generator.total.summary(elapsed)
+    summary.update({"dropped": generator.dropped, "elapsed": round(elapsed, 4)})
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {
+            "url": args.url,
+            "mode": mode,
+            "rate": args.rate,
+            "users": args.users,
+            "arrival": args.arrival if mode == "open" else None,
+            "stages": stages if not math.isinf(duration) else None,
+            "mix": args.mix,
+            "pmids": len(args.pmids),
+            "order": args.order,
+            "batch_size": args.batch_size,
+            "think_time": args.think_time,
+            "max_requests": args.max_requests,
+            "seed": args.seed
+        },
+        "summary": summary,
+        "endpoints": {name: stats.summary(elapsed) for name, stats in sorted(generator.endpoints.items())},
+        "timeline": timeline,
+        "histograms": {name: stats.latency.to_dict() for name, stats in sorted(generator.endpoints.items())}
+    }
+
+
+def print_summary(report: Dict):
+    summary = report["summary"]
+    print(f"\n📊 {summary['requests']} requests in {summary['elapsed']:.1f}s "
+          f"({summary['throughput_rps']} req/s), {summary['errors']} errors, {summary['dropped']} dropped",
+          file=sys.stderr)
+    columns = ["p50", "p90", "p99", "p99.9", "max"]
+    print(f"{'endpoint':25} | {'requests':>8} | {'errors':>6} | " + " | ".join(f"{c:>8}" for c in columns),
+          file=sys.stderr)
+    rows = list(report["endpoints"].items()) + [("total", summary)]
+    for name, stats in rows:
+        values = " | ".join(f"{stats['latency'][c]:7.3f}s" if stats["latency"][c] is not None else f"{'-':>8}"
+                            for c in columns)
+        print(f"{name:25} | {stats['requests']:8d} | {stats['errors']:6d} | {values}", file=sys.stderr)
+
+
+def print_comparison(report: Dict, baseline: Dict):
+    """Print throughput and latency changes against an earlier report."""
+    keys = ["mode", "rate", "users", "arrival", "stages", "mix", "order", "batch_size", "think_time", "seed"]
+    differences = [key for key in keys if report["config"].get(key) != baseline["config"].get(key)]
+    print(f"\n📊 Compared with {baseline.get('timestamp')} ({baseline.get('git_commit') or 'unknown commit'})",
+          file=sys.stderr)
+    if differences:
+        print(f"⚠️  Configurations differ ({', '.join(differences)}); results are not directly comparable",
+              file=sys.stderr)
+
+    def change(current, previous) -> str:
+        if current is None or not previous:
+            return f"{'-':>8}"
+        return f"{(current / previous - 1) * 100:+7.1f}%"
+
+    rows = [(name, stats, baseline["endpoints"].get(name)) for name, stats in report["endpoints"].items()]
+    rows.append(("total", report["summary"], baseline["summary"]))
+    print(f"{'endpoint':25} | {'req/s':>8} | {'p50':>8} | {'p99':>8} | {'errors':>13}", file=sys.stderr)
+    for name, current, previous in rows:
+        if previous is None:
+            print(f"{name:25} | new", file=sys.stderr)
+            continue
+        print(f"{name:25} | {change(current['throughput_rps'], previous['throughput_rps'])} | "
+              f"{change(current['latency']['p50'], previous['latency']['p50'])} | "
+              f"{change(current['latency']['p99'], previous['latency']['p99'])} | "
+              f"{previous['errors']:5d} → {current['errors']:5d}", file=sys.stderr)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the BioAnalyzer API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="Open loop: requests per second")
+    load.add_argument("--users", type=int, help="Closed loop: concurrent virtual users (default: 10)")
+    parser.add_argument("--arrival", choices=["constant", "poisson"], default="poisson",
+                        help="Open-loop arrival process (default: poisson)")
+    parser.add_argument("--duration", type=parse_duration,
+                        help="Test duration, e.g. 90s or 5m (default: 60s, or until --max-requests)")
+    parser.add_argument("--ramp-up", type=parse_duration, default=0.0,
+                        help="Ramp linearly up to the rate or users over this long")
+    parser.add_argument("--stages", help="Ramp schedule of duration:target stages, e.g. 30s:5,2m:20,30s:0 "
+                                         "(targets are rates or user counts)")
+    parser.add_argument("--mix", default="enhanced_analysis=1",
+                        help="Weighted endpoint mix, e.g. enhanced_analysis=7,analyze=2,health=1 "
+                             f"(endpoints: {', '.join(ENDPOINTS)})")
+    parser.add_argument("--pmids", nargs="+", help="PMIDs to request")
+    parser.add_argument("--file", help="File containing PMIDs (one per line)")
+    parser.add_argument("--order", choices=["random", "sequential"], default="random",
+                        help="Draw PMIDs at random or cycle through them in order")
+    parser.add_argument("--batch-size", type=int, default=5, help="PMIDs per batch request (default: 5)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: mean pause between requests")
+    parser.add_argument("--max-requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Open loop: drop arrivals beyond this many outstanding requests")
+    parser.add_argument("--request-timeout", type=float, default=300.0, help="Client timeout per request in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request sequence (default: 0)")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare with")
+
+    args = parser.parse_args(argv)
+    try:
+        args.mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.file:
+        with open(args.file, "r") as f:
+            args.pmids = [line.strip() for line in f if line.strip()]
+    args.pmids = args.pmids or DEFAULT_PMIDS
+    if args.rate is None and args.users is None:
+        args.users = 10
+    if args.duration is None and args.max_requests is None and not args.stages:
+        args.duration = 60.0
+    if args.rate is not None and args.duration is None and not args.stages:
+        parser.error("--rate needs --duration or --stages")
+    return args
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.compare:
+        print_comparison(report, json.loads(Path(args.compare).read_text()))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Performance Log Compactor for BioAnalyzer
+=========================================
+
+This script loads rotated JSON-lines performance logs (performance.log.N, their
+.gz compressed versions and manual performance_<timestamp>.log backups) into an
+indexed SQLite store, and answers aggregate queries over it, such as the p95
+Gemini latency per hour:
+
+    python scripts/log_compactor.py
+    python scripts/log_compactor.py --query latency --event API_CALL --service Gemini --percentile 95 --bucket hour
+
+Each file is identified by a hash of its first 64 KB, so re-running (or gzipping
+a rotated file, or rotation renaming it to .2) never imports a file twice.
+"""
+
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    level TEXT,
+    pmid TEXT,
+    service TEXT,
+    operation TEXT,
+    step TEXT,
+    status TEXT,
+    cache TEXT,
+    duration REAL,
+    weight REAL NOT NULL DEFAULT 1,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_event_ts ON events(event, ts);
+CREATE INDEX IF NOT EXISTS idx_events_service_ts ON events(service, ts);
+CREATE TABLE IF NOT EXISTS compacted_files (
+    fingerprint TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    compacted_at REAL NOT NULL
+);
+"""
+
+# Record fields stored as columns; everything else goes to the extra JSON column
+COLUMNS = ["ts", "event", "level", "pmid", "service", "operation", "step", "status", "cache", "duration"]
+_SKIPPED = set(COLUMNS) | {"timestamp", "sample_rate"}
+
+BUCKETS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Nearest-rank percentile per time bucket, using window functions (SQLite >= 3.25)
+LATENCY_QUERY = """
+WITH ranked AS (
+    SELECT
+        CAST(ts / :bucket AS INTEGER) * :bucket AS bucket,
+        duration,
+        ROW_NUMBER() OVER (PARTITION BY CAST(ts / :bucket AS INTEGER) ORDER BY duration) AS rn,
+        COUNT(*) OVER (PARTITION BY CAST(ts / :bucket AS INTEGER)) AS n
+    FROM events
+    WHERE event = :event AND duration IS NOT NULL AND ts >= :since {filters}
+)
+SELECT
+    bucket,
+    n,
+    -- Rank ceil(quantile * n); CAST truncates, so add one when there is a fraction
+    MIN(CASE WHEN rn >= MAX(1, CAST(:quantile * n AS INTEGER) + (:quantile * n > CAST(:quantile * n AS INTEGER)))
+        THEN duration END) AS value,
+    AVG(duration) AS mean
+FROM ranked
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+COUNT_QUERY = """
+SELECT CAST(ts / :bucket AS INTEGER) * :bucket AS bucket, event, status, SUM(weight) AS count
+FROM events
+WHERE ts >= :since {filters}
+GROUP BY bucket, event, status
+ORDER BY bucket, event, status
+"""
+
+
+def open_log(path: Path):
+    """Open a plain or gzip-compressed log file for reading text."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def fingerprint(path: Path) -> str:
+    """Hash of the first 64 KB of a log file's (decompressed) content."""
+    with open_log(path) as f:
+        return hashlib.sha1(f.read(65536).encode("utf-8")).hexdigest()
+
+
+def rotated_logs(log_dir: Path) -> List[Path]:
+    """Rotated performance logs, oldest first (the active performance.log is still growing)."""
+    files = list(log_dir.glob("performance.log.*")) + list(log_dir.glob("performance_*.log"))
+    return sorted(files, key=lambda path: path.stat().st_mtime)
+
+
+def parse_records(path: Path) -> Iterator[tuple]:
+    """Rows for the events table from a JSON-lines log (non-JSON lines are skipped)."""
+    with open_log(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or "ts" not in record or "event" not in record:
+                continue
+            extra = {key: value for key, value in record.items() if key not in _SKIPPED}
+            sample_rate = record.get("sample_rate") or 1.0
+            yield tuple(
+                [record.get(column) for column in COLUMNS]
+                + [1.0 / sample_rate, json.dumps(extra, default=str) if extra else None]
+            )
+
+
+class LogCompactor:
+    """Loads rotated performance logs into SQLite and queries them."""
+
+    def __init__(self, log_dir="logs", db_path: Optional[Path] = None):
+        self.log_dir = Path(log_dir)
+        self.db_path = Path(db_path) if db_path else self.log_dir / "performance.db"
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Import every rotated log not imported before.
+
+        Returns:
+            Mapping of imported file name to number of records
+        """
+        imported = {}
+        for path in rotated_logs(self.log_dir):
+            key = fingerprint(path)
+            if self.conn.execute("SELECT 1 FROM compacted_files WHERE fingerprint = ?", (key,)).fetchone():
+                continue
+
+            placeholders = ", ".join("?" * (len(COLUMNS) + 2))
+            with self.conn:  # one transaction per file
+                cursor = self.conn.executemany(
+                    f"INSERT INTO events ({', '.join(COLUMNS)}, weight, extra) VALUES ({placeholders})",
+                    parse_records(path)
+                )
+                self.conn.execute(
+                    "INSERT INTO compacted_files VALUES (?, ?, ?, ?)",
+                    (key, path.name, cursor.rowcount, time.time())
+                )
+            imported[path.name] = cursor.rowcount
+        return imported
+
+    @staticmethod
+    def _filters(service: Optional[str], operation: Optional[str]) -> str:
+        filters = ""
+        if service:
+            filters += " AND service = :service"
+        if operation:
+            filters += " AND operation = :operation"
+        return filters
+
+    def latency(self, event: str, percentile: float, bucket: str = "hour", since: float = 0.0,
+                service: Optional[str] = None, operation: Optional[str] = None) -> List[tuple]:
+        """
+        Latency percentile per time bucket.
+
+        Args:
+            event: Event name, e.g. API_CALL or PMID_QUERY_END
+            percentile: Percentile in (0, 100]
+            bucket: minute, hour or day
+            since: Only records at or after this time (seconds since the epoch)
+            service: Optional service filter (API_CALL), e.g. Gemini
+            operation: Optional operation filter
+
+        Returns:
+            Rows of (bucket start, samples, percentile value, mean)
+        """
+        query = LATENCY_QUERY.format(filters=self._filters(service, operation))
+        return self.conn.execute(query, {
+            "bucket": BUCKETS[bucket], "event": event, "since": since,
+            "quantile": percentile / 100.0, "service": service, "operation": operation
+        }).fetchall()
+
+    def counts(self, bucket: str = "hour", since: float = 0.0,
+               service: Optional[str] = None, operation: Optional[str] = None) -> List[tuple]:
+        """Event counts per time bucket, event and status (sampled records weighted)."""
+        query = COUNT_QUERY.format(filters=self._filters(service, operation))
+        return self.conn.execute(query, {
+            "bucket": BUCKETS[bucket], "since": since, "service": service, "operation": operation
+        }).fetchall()
+
+
+def parse_since(value: str) -> float:
+    """Convert '24h', '7d', '30m' (relative) or an ISO date to seconds since the epoch."""
+    units = {"m": 60, "h": 3600, "d": 86400}
+    if value and value[-1] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact rotated performance logs into SQLite and query them")
+    parser.add_argument("--logs", default="logs", help="Log directory path (default: logs)")
+    parser.add_argument("--db", help="SQLite database (default: <logs>/performance.db)")
+    parser.add_argument("--query", choices=["latency", "counts"],
+                        help="Query the store instead of compacting")
+    parser.add_argument("--event", default="PMID_QUERY_END", help="Event for latency queries")
+    parser.add_argument("--service", help="Service filter, e.g. Gemini, PubMed, PMC")
+    parser.add_argument("--operation", help="Operation filter, e.g. efetch")
+    parser.add_argument("--percentile", type=float, default=95, help="Percentile for latency queries")
+    parser.add_argument("--bucket", choices=list(BUCKETS), default="hour", help="Time bucket")
+    parser.add_argument("--since", help="Start time: relative (24h, 7d) or ISO date")
+
+    args = parser.parse_args()
+
+    compactor = LogCompactor(args.logs, args.db)
+    since = parse_since(args.since) if args.since else 0.0
+
+    if args.query == "latency":
+        rows = compactor.latency(args.event, args.percentile, args.bucket, since, args.service, args.operation)
+        label = " ".join(filter(None, [args.event, args.service, args.operation]))
+        print(f"📊 p{args.percentile:g} latency per {args.bucket}: {label}")
+        print(f"{'bucket':20} | {'samples':>8} | {'p' + format(args.percentile, 'g'):>8} | {'mean':>8}")
+        for bucket, samples, value, mean in rows:
+            print(f"{datetime.fromtimestamp(bucket).strftime('%Y-%m-%d %H:%M'):20} | {samples:8d} | {value:7.2f}s | {mean:7.2f}s")
+    elif args.query == "counts":
+        rows = compactor.counts(args.bucket, since, args.service, args.operation)
+        print(f"📊 Events per {args.bucket}")
+        for bucket, event, status, count in rows:
+            print(f"{datetime.fromtimestamp(bucket).strftime('%Y-%m-%d %H:%M'):20} | {event:20} | {status or '-':8} | {count:8.0f}")
+    else:
+        imported = compactor.compact()
+        for name, records in imported.items():
+            print(f"✅ {name}: {records} records")
+        print(f"🗜️  Compacted {len(imported)} files into {compactor.db_path}")
+
+
+if __name__ == "__main__":
+    main()
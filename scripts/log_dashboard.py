@@ -4,25 +4,84 @@ Log Dashboard for BioAnalyzer
 ==============================
 
 A simple dashboard to monitor logs in real-time with performance metrics.
+
+Each refresh reads only the lines appended since the previous one (following log
+rotation), so refreshing costs O(new lines) however large the logs grow. Latency
+percentiles over the last few minutes are kept in memory as quantile sketches.
 """
 
 import os
 import sys
 import time
 import json
+from collections import deque, defaultdict
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import List
 import argparse
 import re # Added missing import for regex
 
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.latency_sketch import LatencySketch, RollingSketch
+
+class LogTail:
+    """Reads the lines appended to a log file since the last read.
+    
+    Rotation is detected by the file's inode changing (or the file shrinking);
+    the unread remainder of the rotated file (name.1) is read before starting on
+    the new file, so no lines are skipped.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.inode = None
+        self.offset = 0
+        self._partial = b""
+    
+    def _read_from(self, path: Path, offset: int) -> bytes:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read()
+    
+    def read_new_lines(self) -> List[str]:
+        """Complete lines appended since the last call."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return []
+        
+        data = b""
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            rotated = self.path.with_name(self.path.name + ".1")
+            try:
+                if self.inode is not None and rotated.stat().st_ino == self.inode:
+                    data = self._read_from(rotated, self.offset)
+            except FileNotFoundError:
+                pass
+            self.inode = stat.st_ino
+            self.offset = 0
+        
+        if stat.st_size > self.offset:
+            new_data = self._read_from(self.path, self.offset)
+            self.offset += len(new_data)
+            data += new_data
+        
+        # Keep an unterminated last line for the next read
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        return [line.decode('utf-8', errors='replace') for line in lines if line.strip()]
+
 class LogDashboard:
     """Simple log monitoring dashboard."""
     
-    def __init__(self, log_dir="logs"):
+    def __init__(self, log_dir="logs", window=300):
         self.log_dir = Path(log_dir)
         self.performance_log = self.log_dir / "performance.log"
         self.error_log = self.log_dir / "errors.log"
         self.main_log = self.log_dir / "bioanalyzer.log"
+        self.window = window
         
         # Statistics
         self.stats = {
@@ -31,117 +90,84 @@ class LogDashboard:
             "failed_queries": 0,
             "cached_queries": 0,
             "avg_response_time": 0,
-            "errors": [],
-            "recent_activity": []
+            "errors": deque(maxlen=5),
+            "recent_activity": deque(maxlen=10)
         }
         
+        # Latency sketches: all queries so far, queries and external API calls in the window
+        self.query_latency = LatencySketch()
+        self.recent_query_latency = RollingSketch(window=window)
+        self.recent_api_latency = defaultdict(lambda: RollingSketch(window=window))
+        
         # Track file positions
-        self.file_positions = {}
-        for log_file in [self.performance_log, self.error_log, self.main_log]:
-            if log_file.exists():
-                self.file_positions[log_file] = log_file.stat().st_size
-            else:
-                self.file_positions[log_file] = 0
+        self.tails = {log_file: LogTail(log_file) for log_file in [self.performance_log, self.main_log]}
     
     def update_stats(self):
-        """Update statistics from log files."""
+        """Update statistics from the lines appended to the log files."""
         self._update_performance_stats()
-        self._update_error_stats()
         self._update_recent_activity()
     
     def _update_performance_stats(self):
-        """Update performance statistics."""
-        if not self.performance_log.exists():
-            return
-        
+        """Update performance statistics and errors from new performance log records."""
         try:
-            with open(self.performance_log, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # Reset counters
-            self.stats["total_queries"] = 0
-            self.stats["successful_queries"] = 0
-            self.stats["failed_queries"] = 0
-            self.stats["cached_queries"] = 0
-            response_times = []
-            
-            for line in lines:
-                if "PMID_QUERY_END" in line:
-                    self.stats["total_queries"] += 1
-                    
-                    # Parse status
-                    if "Status: SUCCESS" in line:
-                        self.stats["successful_queries"] += 1
-                    elif "Status: FAILED" in line:
-                        self.stats["failed_queries"] += 1
-                    
-                    # Parse cache status
-                    if "Cache: CACHED" in line:
-                        self.stats["cached_queries"] += 1
-                    
-                    # Parse duration
-                    duration_match = re.search(r'Duration: ([\d.]+)s', line)
-                    if duration_match:
-                        response_times.append(float(duration_match.group(1)))
+            for line in self.tails[self.performance_log].read_new_lines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Lines written before the log switched to JSON
+                self._add_performance_record(record)
             
-            # Calculate average response time
-            if response_times:
-                self.stats["avg_response_time"] = sum(response_times) / len(response_times)
+            if self.query_latency.count:
+                self.stats["avg_response_time"] = self.query_latency.mean
                 
         except Exception as e:
             print(f"Error updating performance stats: {e}")
     
-    def _update_error_stats(self):
-        """Update error statistics."""
-        if not self.error_log.exists():
-            return
-        
-        try:
-            with open(self.error_log, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+    def _add_performance_record(self, record: dict):
+        """Fold one performance log record into the statistics."""
+        event = record.get("event")
+        if event == "PMID_QUERY_END":
+            self.stats["total_queries"] += 1
+            if record.get("status") == "SUCCESS":
+                self.stats["successful_queries"] += 1
+            elif record.get("status") == "FAILED":
+                self.stats["failed_queries"] += 1
+            if record.get("cache") == "CACHED":
+                self.stats["cached_queries"] += 1
             
-            # Get last 10 errors
-            recent_errors = []
-            for line in lines[-10:]:
-                if line.strip():
-                    # Extract error summary
-                    error_match = re.search(r'ERROR - PMID: (\d+) \| Context: (.+?) \|', line)
-                    if error_match:
-                        pmid = error_match.group(1)
-                        context = error_match.group(2)
-                        recent_errors.append(f"PMID {pmid}: {context}")
-            
-            self.stats["errors"] = recent_errors[-5:]  # Keep last 5 errors
-            
-        except Exception as e:
-            print(f"Error updating error stats: {e}")
+            duration = record.get("duration")
+            if duration is not None:
+                self.query_latency.add(duration)
+                self.recent_query_latency.add(duration, record.get("ts", time.time()))
+        
+        elif event == "API_CALL" and record.get("duration") is not None:
+            self.recent_api_latency[record.get("service", "Unknown")].add(
+                record["duration"], record.get("ts", time.time())
+            )
+        
+        elif event == "ERROR":
+            self.stats["errors"].append(f"PMID {record.get('pmid', 'Unknown')}: {record.get('context', 'Unknown')}")
     
     def _update_recent_activity(self):
         """Update recent activity."""
-        if not self.main_log.exists():
-            return
-        
         try:
-            with open(self.main_log, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # Get last 10 log entries
-            recent_lines = lines[-10:]
-            self.stats["recent_activity"] = []
-            
-            for line in recent_lines:
-                if line.strip():
-                    # Extract timestamp and message
-                    timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
-                    if timestamp_match:
-                        timestamp = timestamp_match.group(1)
-                        # Extract meaningful part of the message
-                        message = line.split(' - ', 2)[-1] if ' - ' in line else line.strip()
-                        self.stats["recent_activity"].append(f"{timestamp}: {message}")
+            for line in self.tails[self.main_log].read_new_lines():
+                # Extract timestamp and message
+                timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
+                if timestamp_match:
+                    timestamp = timestamp_match.group(1)
+                    # Extract meaningful part of the message
+                    message = line.split(' - ', 2)[-1] if ' - ' in line else line.strip()
+                    self.stats["recent_activity"].append(f"{timestamp}: {message}")
             
         except Exception as e:
             print(f"Error updating recent activity: {e}")
     
+    @staticmethod
+    def _format_percentiles(sketch: LatencySketch) -> str:
+        p50, p95, p99 = (sketch.quantile(q) for q in (0.5, 0.95, 0.99))
+        return f"p50 {p50:.2f}s | p95 {p95:.2f}s | p99 {p99:.2f}s ({sketch.count:.0f} samples)"
+    
     def display_dashboard(self):
         """Display the dashboard."""
         os.system('clear' if os.name == 'posix' else 'cls')
@@ -159,6 +185,13 @@ class LogDashboard:
         print(f"Failed: {self.stats['failed_queries']} ❌")
         print(f"Cached Results: {self.stats['cached_queries']} 📋")
         print(f"Avg Response Time: {self.stats['avg_response_time']:.2f}s")
+        if self.query_latency.count:
+            print(f"Response Times (all): {self._format_percentiles(self.query_latency)}")
+        
+        now = time.time()
+        recent = self.recent_query_latency.snapshot(now)
+        if recent.count:
+            print(f"Response Times (last {self.window // 60}m): {self._format_percentiles(recent)}")
         
         # Success rate
         if self.stats['total_queries'] > 0:
@@ -166,6 +199,16 @@ class LogDashboard:
             print(f"Success Rate: {success_rate:.1f}%")
         print()
         
+        # External API latency in the window
+        api_latency = {service: sketch.snapshot(now) for service, sketch in self.recent_api_latency.items()}
+        api_latency = {service: sketch for service, sketch in api_latency.items() if sketch.count}
+        if api_latency:
+            print(f"🌐 API LATENCY (last {self.window // 60}m)")
+            print("-" * 30)
+            for service, sketch in sorted(api_latency.items()):
+                print(f"{service}: {self._format_percentiles(sketch)}")
+            print()
+        
         # Recent Errors
         if self.stats['errors']:
             print("❌ RECENT ERRORS")
@@ -178,7 +221,7 @@ class LogDashboard:
         if self.stats['recent_activity']:
             print("📝 RECENT ACTIVITY")
             print("-" * 20)
-            for activity in self.stats['recent_activity'][-5:]:  # Show last 5
+            for activity in list(self.stats['recent_activity'])[-5:]:  # Show last 5
                 print(f"• {activity}")
             print()
         
@@ -216,10 +259,12 @@ def main():
                        help="Refresh interval in seconds (default: 5)")
     parser.add_argument("--logs", default="logs",
                        help="Log directory path (default: logs)")
+    parser.add_argument("--window", "-w", type=int, default=300,
+                       help="Window for recent latency percentiles in seconds (default: 300)")
     
     args = parser.parse_args()
     
-    dashboard = LogDashboard(args.logs)
+    dashboard = LogDashboard(args.logs, window=args.window)
     dashboard.monitor(args.refresh)
 
 if __name__ == "__main__":
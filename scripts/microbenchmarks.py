@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for BioAnalyzer
+===============================
+
+This script times the CPU-bound code that runs on every analysis request (PMC
+XML text extraction, field validation and enhancement, methods scoring, LLM
+JSON normalization, cache reads and writes, curated CSV lookups) over the
+recorded papers in scripts/fixtures, and reports per-call timings with
+confidence intervals and peak memory. Results can be saved as a baseline and
+later runs compared against it:
+
+    python scripts/microbenchmarks.py --save main
+    python scripts/microbenchmarks.py --compare main --threshold 0.10
+    python scripts/microbenchmarks.py --filter validate_field --repeat 30
+
+Each benchmark is calibrated so one sample runs for at least --min-time
+seconds, then sampled --repeat times with garbage collection disabled; the
+median and its 95% confidence interval (from order statistics, so no normality
+is assumed) are reported. Peak memory is measured with tracemalloc in a
+separate call, since tracing slows the timed code down. In compare mode a
+benchmark is a regression when its median is more than --threshold slower than
+the baseline and the two confidence intervals do not overlap; the script then
+exits with status 1, so it can gate CI.
+"""
+
+import gc
+import re
+import csv
+import sys
+import copy
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import warnings
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+BASELINE_DIR = ROOT / ".benchmarks"
+
+FIELDS = ["host_species", "body_site", "condition", "sequencing_type", "taxa_level", "sample_size"]
+
+# Copies of the body sections in the "large" document; a full PMC article is ~100 KB
+LARGE_DOCUMENT_COPIES = 20
+
+# Rows in the synthetic curated CSV, about the size of the BugSigDB export
+CURATED_ROWS = 5000
+
+
+class Benchmark:
+    """A named callable and how to build its arguments."""
+
+    def __init__(self, name: str, func: Callable, args: Callable[[], tuple] = tuple, fresh: bool = False):
+        """
+        Args:
+            name: Benchmark name, e.g. "validate_field/host_species"
+            func: Code under test, called as func(*args())
+            args: Builds the arguments; not timed
+            fresh: Build new arguments for every call (for code that mutates
+                its input), otherwise they are built once and reused
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.fresh = fresh
+
+    def _arguments(self, loops: int) -> List[tuple]:
+        if self.fresh:
+            return [self.args() for _ in range(loops)]
+        return [self.args()] * loops
+
+    def time(self, loops: int) -> float:
+        """Seconds per call over a run of loops calls."""
+        arguments = self._arguments(loops)
+        func = self.func
+        gc.collect()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for args in arguments:
+                func(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return elapsed / loops
+
+    def calibrate(self, min_time: float) -> int:
+        """Smallest power-of-two number of calls that runs for at least min_time."""
+        loops = 1
+        while True:
+            if self.time(loops) * loops >= min_time or loops >= 1 << 20:
+                return loops
+            loops *= 2
+
+    def peak_memory(self) -> int:
+        """Peak bytes allocated by one call."""
+        args = self.args()
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            self.func(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return max(peak - before, 0)
+
+
+def median_confidence_interval(sorted_values: List[float], z: float = 1.96) -> Tuple[float, float]:
+    """
+    Distribution-free confidence interval of the median.
+
+    The ranks bounding the median follow a binomial(n, 0.5) distribution, which
+    is approximated by a normal one (95% for the default z).
+    """
+    n = len(sorted_values)
+    half_width = z * math.sqrt(n) / 2
+    lower = max(int(math.floor(n / 2 - half_width)), 0)
+    upper = min(int(math.ceil(n / 2 + half_width)), n - 1)
+    return sorted_values[lower], sorted_values[upper]
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Statistics of per-call times (seconds)."""
+    values = sorted(samples)
+    q1, _, q3 = statistics.quantiles(values, n=4) if len(values) > 1 else (values[0],) * 3
+    iqr = q3 - q1
+    ci_low, ci_high = median_confidence_interval(values)
+    return {
+        "median": statistics.median(values),
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "mean": statistics.fmean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "min": values[0],
+        "max": values[-1],
+        "iqr": iqr,
+        # Tukey fences; many outliers point at a noisy machine
+        "outliers": sum(1 for v in values if v < q1 - 1.5 * iqr or v > q3 + 1.5 * iqr),
+        "samples": values,
+    }
+
+
+def run(benchmark: Benchmark, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Calibrate, sample and measure the memory of a benchmark."""
+    loops = benchmark.calibrate(min_time)  # also warms up caches and lazy imports
+    samples = [benchmark.time(loops) for _ in range(repeat)]
+    result = summarize(samples)
+    result["loops"] = loops
+    result["peak_memory"] = benchmark.peak_memory()
+    return result
+
+
+def scaled_pmc_xml(xml: str, copies: int) -> str:
+    """PMC article with its body sections repeated, to stand in for a full-length paper."""
+    match = re.search(r"<body>(.*)</body>", xml, re.S)
+    if not match:
+        return xml
+    return xml[:match.start(1)] + match.group(1) * copies + xml[match.end(1):]
+
+
+def write_curated_csv(path: Path, rows: int, pmids: List[str]):
+    """Synthetic BugSigDB export with the given PMIDs spread through it."""
+    columns = ["Study", "PMID", "Title", "Authors list", "Journal", "Year", "DOI", "Host species",
+               "Body site", "Condition", "Sequencing type", "Taxa Level", "Statistical test",
+               "Group 0 sample size", "Group 1 sample size", "In BugSigDB"]
+    spread = {i * rows // max(len(pmids), 1): pmid for i, pmid in enumerate(pmids)}
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("# BugSigDB export (synthetic)\n")
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for i in range(rows):
+            pmid = spread.get(i, str(20000000 + i))
+            writer.writerow({
+                "Study": f"Study {i}", "PMID": pmid, "Title": f"Gut microbiome study {i}",
+                "Authors list": "Smith J, Doe A, Lee K", "Journal": "Microbiome", "Year": str(2010 + i % 14),
+                "DOI": f"10.1000/example.{i}", "Host species": "Homo sapiens", "Body site": "Feces",
+                "Condition": "Inflammatory bowel disease", "Sequencing type": "16S",
+                "Taxa Level": "genus", "Statistical test": "LEfSe",
+                "Group 0 sample size": str(20 + i % 50), "Group 1 sample size": str(25 + i % 40),
+                "In BugSigDB": "Yes",
+            })
+
+
+def build_benchmarks(fixtures_dir: Path, work_dir: Path) -> List[Benchmark]:
+    """Benchmarks over the recorded papers in fixtures_dir; work_dir holds the cache and CSV."""
+    from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+    from app.models.gemini_qa import GeminiQA
+    from app.services.cache_manager import CacheManager
+    from app.services.curated_papers import CuratedPapers
+    from app.services.data_retrieval import PubMedRetriever
+    from app.utils.field_validator import EnhancedFieldValidator, FieldExtractionEnhancer
+    from app.utils.json_stream import parse_llm_json
+    from app.utils.methods_scorer import MethodsScorer
+
+    # The app parses PMC XML with the lxml HTML parser; benchmark what it runs
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+    papers_dir = Path(fixtures_dir) / "papers"
+    names = sorted(path.name[:-len(".gemini.txt")] for path in papers_dir.glob("*.gemini.txt"))
+    if not names:
+        raise FileNotFoundError(f"No *.gemini.txt fixtures in {papers_dir}")
+
+    retriever = PubMedRetriever()
+    qa = GeminiQA(results_dir=work_dir / "results")
+    validator = EnhancedFieldValidator()
+    enhancer = FieldExtractionEnhancer()
+    scorer = MethodsScorer()
+
+    # PMC XML per document; papers without full text only get the LLM benchmarks
+    documents: Dict[str, str] = {}
+    for name in names:
+        pmc_path = papers_dir / f"{name}.pmc.xml"
+        if pmc_path.exists():
+            documents[name] = pmc_path.read_text(encoding="utf-8")
+    largest = max(documents, key=lambda name: len(documents[name]))
+    documents["large"] = scaled_pmc_xml(documents[largest], LARGE_DOCUMENT_COPIES)
+    soups = {name: BeautifulSoup(xml, "lxml") for name, xml in documents.items()}
+    texts = {name: retriever._extract_text_from_pmc_xml(soup) for name, soup in soups.items()}
+
+    raw_outputs = {name: (papers_dir / f"{name}.gemini.txt").read_text(encoding="utf-8") for name in names}
+    parsed_outputs = {name: parse_llm_json(raw) for name, raw in raw_outputs.items()}
+    normalized = {name: qa._validate_and_normalize_json(copy.deepcopy(parsed)) for name, parsed in parsed_outputs.items()}
+
+    benchmarks = []
+    for name, xml in documents.items():
+        benchmarks.append(Benchmark(f"pmc_parse/{name}", lambda xml=xml: BeautifulSoup(xml, "lxml")))
+        benchmarks.append(Benchmark(f"pmc_extract_text/{name}", retriever._extract_text_from_pmc_xml,
+                                    lambda soup=soups[name]: (soup,)))
+        benchmarks.append(Benchmark(f"methods_score/{name}", scorer.score_paper, lambda text=texts[name]: (text,)))
+
+    # Field validation against the full-length text, with the LLM output of the largest paper;
+    # as in enhance_extraction, the text is scanned once and the scan shared by the fields
+    large_text, extracted = texts["large"], normalized[largest]
+    large_scan = validator.scan_text(large_text)
+    benchmarks.append(Benchmark("scan_text/large", validator.scan_text, lambda: (large_text,)))
+    for field in FIELDS:
+        benchmarks.append(Benchmark(f"validate_field/{field}", validator.validate_field,
+                                    lambda field=field: (field, large_text, extracted[field], large_scan)))
+
+    for name in names:
+        text = texts.get(name, "")
+        benchmarks.append(Benchmark(f"parse_llm_json/{name}", parse_llm_json, lambda raw=raw_outputs[name]: (raw,)))
+        benchmarks.append(Benchmark(f"normalize_llm_json/{name}", qa._validate_and_normalize_json,
+                                    lambda parsed=parsed_outputs[name]: (copy.deepcopy(parsed),), fresh=True))
+        benchmarks.append(Benchmark(f"enhance_extraction/{name}", enhancer.enhance_extraction,
+                                    lambda data=normalized[name], text=text: (data, text)))
+    benchmarks.append(Benchmark("enhance_extraction/large", enhancer.enhance_extraction,
+                                lambda: (extracted, large_text)))
+
+    # Cache round trips against a fresh SQLite database
+    cache = CacheManager(cache_dir=str(work_dir / "cache"), db_path=str(work_dir / "cache" / "analysis_cache.db"))
+    analysis = dict(normalized[largest], pmid="30000000")
+    metadata = {"title": "Benchmark paper", "journal": "Microbiome", "year": "2024"}
+    cache.store_analysis_result("30000000", analysis, metadata)
+    cache.store_fulltext("30000000", large_text)
+    benchmarks.append(Benchmark("cache_store_analysis", cache.store_analysis_result,
+                                lambda: ("30000001", analysis, metadata)))
+    benchmarks.append(Benchmark("cache_get_analysis/hit", cache.get_analysis_result, lambda: ("30000000",)))
+    benchmarks.append(Benchmark("cache_get_analysis/miss", cache.get_analysis_result, lambda: ("1",)))
+    benchmarks.append(Benchmark("cache_get_fulltext/hit", cache.get_fulltext, lambda: ("30000000",)))
+
+    # Curated metadata: the app keeps a loaded index, other CSV paths are parsed per call
+    csv_path = work_dir / "full_dump.csv"
+    write_curated_csv(csv_path, CURATED_ROWS, ["30000000", "30000001"])
+    curated = CuratedPapers(csv_path)
+    curated.get("30000000")
+    benchmarks.append(Benchmark("curated_lookup/hit", curated.get, lambda: ("30000000",)))
+    benchmarks.append(Benchmark("curated_lookup/miss", curated.get, lambda: ("1",)))
+    benchmarks.append(Benchmark("curated_load", lambda: CuratedPapers(csv_path).get("30000001")))
+
+    return benchmarks
+
+
+def baseline_path(value: str) -> Path:
+    """A baseline given as a file path, or by name under .benchmarks/."""
+    if value.endswith(".json") or "/" in value:
+        return Path(value)
+    return BASELINE_DIR / f"{value}.json"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> Dict[str, Dict]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: Benchmark name to statistics of this run
+        baseline: Benchmark name to statistics of the baseline run
+        threshold: Relative change of the median that counts, e.g. 0.10
+
+    Returns:
+        Benchmark name to {"ratio", "verdict"}, verdict being "regression",
+        "improvement", "unchanged" or "new"
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            comparison[name] = {"ratio": None, "verdict": "new"}
+            continue
+        ratio = current["median"] / previous["median"] if previous["median"] else math.inf
+        # Medians within each other's noise are not a change, however large the ratio
+        separated = current["ci_low"] > previous["ci_high"] or current["ci_high"] < previous["ci_low"]
+        if separated and ratio > 1 + threshold:
+            verdict = "regression"
+        elif separated and ratio < 1 / (1 + threshold):
+            verdict = "improvement"
+        else:
+            verdict = "unchanged"
+        comparison[name] = {"ratio": ratio, "verdict": verdict}
+    return comparison
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the CPU-bound analysis hot paths")
+    parser.add_argument("--filter", help="Only run benchmarks whose name matches this regular expression")
+    parser.add_argument("--repeat", type=int, default=15, help="Timed samples per benchmark (default: 15)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum duration of one sample in seconds (default: 0.05)")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Fixtures directory")
+    parser.add_argument("--save", metavar="BASELINE", help="Save results as a baseline (name or .json path)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Slowdown of the median that counts as a regression (default: 0.10)")
+    parser.add_argument("--output", help="Write the full results as JSON to this file")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        path = baseline_path(args.compare)
+        if not path.exists():
+            parser.error(f"Baseline not found: {path}")
+        baseline = json.loads(path.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory(prefix="bioanalyzer-microbench-") as work_dir:
+        benchmarks = build_benchmarks(Path(args.fixtures), Path(work_dir))
+        if args.filter:
+            pattern = re.compile(args.filter)
+            benchmarks = [b for b in benchmarks if pattern.search(b.name)]
+        if args.list:
+            for benchmark in benchmarks:
+                print(benchmark.name)
+            return
+
+        print(f"⏱️  Running {len(benchmarks)} benchmarks ({args.repeat} samples of ≥{args.min_time:g}s each)")
+        print(f"{'benchmark':40} | {'median':>9} | {'95% CI':>19} | {'IQR':>9} | {'loops':>6} | {'peak mem':>8}")
+        results = {}
+        for benchmark in benchmarks:
+            result = run(benchmark, args.repeat, args.min_time)
+            results[benchmark.name] = result
+            ci = f"{format_time(result['ci_low'])}-{format_time(result['ci_high'])}"
+            noisy = " ⚠️" if result["outliers"] > args.repeat // 4 else ""
+            print(f"{benchmark.name:40} | {format_time(result['median']):>9} | {ci:>19} | "
+                  f"{format_time(result['iqr']):>9} | {result['loops']:6d} | "
+                  f"{format_bytes(result['peak_memory']):>8}{noisy}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"repeat": args.repeat, "min_time": args.min_time},
+        "results": results,
+    }
+
+    regressions = []
+    if baseline is not None:
+        comparison = compare(results, baseline.get("results", {}), args.threshold)
+        report["comparison"] = {"baseline_commit": baseline.get("git_commit"),
+                                "threshold": args.threshold, "benchmarks": comparison}
+        print(f"\n📊 Compared with baseline {args.compare} ({baseline.get('git_commit') or 'unknown commit'})")
+        icons = {"regression": "🔴", "improvement": "🟢", "unchanged": "⚪", "new": "🆕"}
+        for name, entry in comparison.items():
+            change = f"{(entry['ratio'] - 1) * 100:+.1f}%" if entry["ratio"] is not None else "-"
+            print(f"{icons[entry['verdict']]} {name:40} | {change:>8} | {entry['verdict']}")
+        regressions = [name for name, entry in comparison.items() if entry["verdict"] == "regression"]
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
+    if args.save:
+        path = baseline_path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"💾 Baseline saved to {path}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
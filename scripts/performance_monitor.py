@@ -4,14 +4,19 @@ Performance Monitor for BioAnalyzer
 ===================================
 
 This script monitors the performance of PMID queries and helps identify bottlenecks.
+Multiple PMIDs are queried concurrently with scripts/load_generator.py, which also
+supports sustained open- and closed-loop load tests.
 """
 
 import requests
 import time
 import json
+import asyncio
 from datetime import datetime
 import argparse
 
+import load_generator
+
 def test_pmid_query(pmid, base_url="http://localhost:8000"):
     """Test a single PMID query and measure performance."""
     print(f"Testing PMID: {pmid}")
@@ -64,52 +69,40 @@ def test_pmid_query(pmid, base_url="http://localhost:8000"):
         print(f"❌ Error: {str(e)}")
         return False
 
-def test_multiple_pmids(pmids, base_url="http://localhost:8000"):
-    """Test multiple PMIDs and provide performance summary."""
-    print(f"Testing {len(pmids)} PMIDs...")
+def test_multiple_pmids(pmids, base_url="http://localhost:8000", concurrency=4):
+    """Test multiple PMIDs concurrently and provide performance summary."""
+    print(f"Testing {len(pmids)} PMIDs with {concurrency} concurrent users...")
     print("=" * 50)
     
-    results = []
-    total_time = 0
-    
-    for i, pmid in enumerate(pmids, 1):
-        print(f"\n[{i}/{len(pmids)}] ", end="")
-        start_time = time.time()
-        
-        success = test_pmid_query(pmid, base_url)
-        query_time = time.time() - start_time
-        
-        results.append({
-            "pmid": pmid,
-            "success": success,
-            "time": query_time
-        })
-        
-        total_time += query_time
-        
-        # Add delay between requests to avoid overwhelming the server
-        if i < len(pmids):
-            time.sleep(1)
+    # Each PMID is requested once by a pool of closed-loop virtual users
+    args = load_generator.parse_args([
+        "--url", base_url, "--users", str(concurrency), "--mix", "enhanced_analysis=1",
+        "--pmids", *pmids, "--order", "sequential", "--max-requests", str(len(pmids)),
+        "--report-interval", "10"
+    ])
+    report = asyncio.run(load_generator.run(args))
+    summary = report["summary"]
+    latency = summary["latency"]
     
     # Print summary
     print("\n" + "=" * 50)
     print("PERFORMANCE SUMMARY")
     print("=" * 50)
     
-    successful = sum(1 for r in results if r["success"])
-    failed = len(results) - successful
+    successful = summary["requests"] - summary["errors"]
     
     print(f"Total PMIDs tested: {len(pmids)}")
     print(f"Successful: {successful}")
-    print(f"Failed: {failed}")
+    print(f"Failed: {summary['errors']}")
     print(f"Success rate: {(successful/len(pmids)*100):.1f}%")
-    print(f"Total time: {total_time:.2f}s")
-    print(f"Average time per PMID: {(total_time/len(pmids)):.2f}s")
+    print(f"Status codes: {summary['status_codes']}")
+    print(f"Total time: {summary['elapsed']:.2f}s")
+    print(f"Throughput: {summary['throughput_rps']:.2f} PMIDs/s")
     
     if successful > 0:
-        successful_times = [r["time"] for r in results if r["success"]]
-        print(f"Fastest query: {min(successful_times):.2f}s")
-        print(f"Slowest query: {max(successful_times):.2f}s")
+        print(f"Latency p50: {latency['p50']:.2f}s, p90: {latency['p90']:.2f}s, p99: {latency['p99']:.2f}s")
+        print(f"Mean time per PMID: {latency['mean']:.2f}s")
+        print(f"Slowest query: {latency['max']:.2f}s")
     
     # Check cache performance
     try:
@@ -130,18 +123,19 @@ def main():
     parser.add_argument("--pmids", nargs="+", help="Multiple PMIDs to test")
     parser.add_argument("--file", help="File containing PMIDs (one per line)")
     parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests for multiple PMIDs (default: 4)")
     
     args = parser.parse_args()
     
     if args.pmid:
         test_pmid_query(args.pmid, args.url)
     elif args.pmids:
-        test_multiple_pmids(args.pmids, args.url)
+        test_multiple_pmids(args.pmids, args.url, args.concurrency)
     elif args.file:
         try:
             with open(args.file, 'r') as f:
                 pmids = [line.strip() for line in f if line.strip()]
-            test_multiple_pmids(pmids, args.url)
+            test_multiple_pmids(pmids, args.url, args.concurrency)
         except FileNotFoundError:
             print(f"File not found: {args.file}")
         except Exception as e:
@@ -150,7 +144,7 @@ def main():
         # Test with some sample PMIDs
         sample_pmids = ["12345", "67890", "11111"]
         print("No PMIDs specified. Testing with sample PMIDs...")
-        test_multiple_pmids(sample_pmids, args.url)
+        test_multiple_pmids(sample_pmids, args.url, args.concurrency)
 
 if __name__ == "__main__":
     main()
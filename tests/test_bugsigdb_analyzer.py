@@ -0,0 +1,29 @@
+from app.utils.bugsigdb_analyzer import BugSigDBAnalyzer, EsummaryCache, _analyze_texts
+
+RELEVANT = "Gut microbiome dysbiosis: 16S rRNA amplicon sequencing showed enriched bacteria in IBD"
+
+
+def test_one_malformed_paper_does_not_fail_the_batch():
+    analyses = _analyze_texts([("1", RELEVANT), ("2", None), ("3", "Soil survey")])
+    assert analyses[1] is None
+    assert analyses[0] == BugSigDBAnalyzer.analyze_paper(RELEVANT)
+    assert analyses[2] == BugSigDBAnalyzer.analyze_paper("Soil survey")
+
+
+def test_suggestions_skip_malformed_records(tmp_path, monkeypatch):
+    analyzer = BugSigDBAnalyzer(data_path=tmp_path / "missing.csv", cache_dir=tmp_path / "cache")
+    metadata = {
+        "1": {"title": RELEVANT, "abstract": "Microbiota differential abundance."},
+        "2": ["not", "a", "record"],
+        "3": {"title": None, "abstract": None},
+    }
+    monkeypatch.setattr(analyzer, "fetch_papers_metadata", lambda pmids: metadata)
+
+    suggestions = analyzer.suggest_papers_for_review(["1", "2", "3"], max_workers=1)
+    assert [suggestion["pmid"] for suggestion in suggestions] == ["1"]
+
+
+def test_esummary_cache_round_trip(tmp_path):
+    cache = EsummaryCache(tmp_path)
+    cache.store_many({"1": {"title": "a", "fetch_date": "2024-01-01"}})
+    assert EsummaryCache(tmp_path).get_many(["1", "2"]) == {"1": {"title": "a", "fetch_date": "2024-01-01"}}
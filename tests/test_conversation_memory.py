@@ -0,0 +1,71 @@
+from app.utils.conversation_memory import ConversationMemory, approximate_tokens
+
+
+def fill(memory, turns, words=20):
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        memory.add_message(role, f"Turn {i} question. " + "word " * words)
+
+
+def test_recent_messages_stay_within_the_token_budget():
+    memory = ConversationMemory(max_tokens=100, summary_max_tokens=40)
+    fill(memory, 50)
+
+    assert memory.total_tokens <= 100
+    assert memory.total_tokens == sum(message.tokens for message in memory.messages)
+    assert memory.evicted + len(memory) == 50
+    assert memory.messages[-1].content.startswith("Turn 49")
+
+
+def test_summary_stays_within_its_budget_and_keeps_the_latest_turns():
+    memory = ConversationMemory(max_tokens=100, summary_max_tokens=40)
+    fill(memory, 50)
+
+    assert 0 < memory.summary_tokens <= 40
+    assert memory.summary_tokens == sum(approximate_tokens(line) + 1 for line in memory.summary.splitlines())
+    # Each summary line is the first sentence of an evicted turn, newest last
+    last_line = memory.summary.splitlines()[-1]
+    assert last_line == f"- {'User' if memory.evicted % 2 else 'Assistant'}: Turn {memory.evicted - 1} question."
+
+
+def test_formatted_context_size_is_bounded_however_long_the_conversation():
+    header = approximate_tokens("Summary of the earlier conversation:\n\n\nRecent messages:\n")
+    for turns in (20, 500):
+        memory = ConversationMemory(max_tokens=100, summary_max_tokens=40)
+        fill(memory, turns)
+        assert approximate_tokens(memory.get_formatted_context()) <= 100 + 40 + header
+
+        recent = memory.get_formatted_context(max_tokens=70).split("Recent messages:\n", 1)[1].splitlines()
+        assert len(recent) == 2
+        assert sum(approximate_tokens(line) + 1 for line in recent) <= 70
+        assert recent[-1].startswith(f"Assistant: Turn {turns - 1}")
+
+
+def test_context_cache_is_invalidated_on_change():
+    memory = ConversationMemory()
+    memory.add_message("user", "First.")
+    assert memory.get_formatted_context() == "User: First."
+    memory.add_message("assistant", "Second.")
+    assert memory.get_formatted_context() == "User: First.\nAssistant: Second."
+    memory.clear()
+    assert memory.get_formatted_context() == ""
+
+
+def test_oversized_message_and_history_limit():
+    memory = ConversationMemory(max_history=3, max_tokens=10, summary_max_tokens=0)
+    memory.add_message("user", "x " * 100)
+    assert len(memory) == 1  # the newest message is always kept
+    fill(memory, 5, words=0)
+    assert len(memory) <= 3
+    assert memory.summary == ""
+
+
+def test_save_and_load(tmp_path):
+    memory = ConversationMemory(max_tokens=100, summary_max_tokens=40)
+    fill(memory, 10)
+    path = tmp_path / "history.json"
+    memory.save_to_file(str(path))
+
+    restored = ConversationMemory(max_tokens=100, summary_max_tokens=40)
+    restored.load_from_file(str(path))
+    assert restored.get_conversation_history() == memory.get_conversation_history()
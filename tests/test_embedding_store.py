@@ -0,0 +1,103 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from app.services.embedding_store import EmbeddingStore, fcntl
+
+
+def vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def test_put_get_and_reload(tmp_path):
+    store = EmbeddingStore(tmp_path, "model/a")
+    store.put_many(["a", "b"], np.stack([vector(1), vector(2)]))
+
+    vectors, found = store.get_many(["b", "missing", "a"])
+    assert found == [True, False, True]
+    np.testing.assert_array_equal(vectors[0], vector(2))
+    np.testing.assert_array_equal(vectors[1], 0.0)
+    np.testing.assert_array_equal(vectors[2], vector(1))
+
+    reopened = EmbeddingStore(tmp_path, "model/a")
+    assert len(reopened) == 2
+    np.testing.assert_array_equal(reopened.get_many(["a"])[0][0], vector(1))
+
+
+def test_empty_store_lookup(tmp_path):
+    vectors, found = EmbeddingStore(tmp_path, "m").get_many(["a"])
+    assert vectors is None
+    assert found == [False]
+
+
+def test_dimension_mismatch_raises(tmp_path):
+    store = EmbeddingStore(tmp_path, "m")
+    store.put_many(["a"], vector(1)[None])
+    with pytest.raises(ValueError):
+        store.put_many(["b"], vector(2, dim=4)[None])
+
+
+def test_superseded_rows_are_compacted(tmp_path):
+    store = EmbeddingStore(tmp_path, "m")
+    store.put_many(["a", "b"], np.stack([vector(1), vector(2)]))
+    store.put_many(["a"], vector(3)[None])
+
+    assert store.compact() == 1
+    assert store.compact() == 0
+    np.testing.assert_array_equal(store.get_many(["a"])[0][0], vector(3))
+
+    reopened = EmbeddingStore(tmp_path, "m")
+    assert reopened.vectors_path.stat().st_size == 2 * 8 * 4
+    np.testing.assert_array_equal(reopened.get_many(["a", "b"])[0], np.stack([vector(3), vector(2)]))
+
+
+def test_partial_trailing_row_is_discarded(tmp_path):
+    store = EmbeddingStore(tmp_path, "m")
+    store.put_many(["a"], vector(1)[None])
+    # Crash after the vector was written but before its key
+    with open(store.vectors_path, "ab") as f:
+        f.write(vector(2).tobytes()[:10])
+
+    reopened = EmbeddingStore(tmp_path, "m")
+    assert len(reopened) == 1
+    reopened.put_many(["b"], vector(2)[None])
+    np.testing.assert_array_equal(EmbeddingStore(tmp_path, "m").get_many(["b"])[0][0], vector(2))
+
+
+def test_rows_from_another_instance_are_picked_up(tmp_path):
+    first = EmbeddingStore(tmp_path, "m")
+    second = EmbeddingStore(tmp_path, "m")
+    first.put_many(["a"], vector(1)[None])
+    second.put_many(["b"], vector(2)[None])
+
+    # Each sees the other's row, at the row it was actually written to
+    np.testing.assert_array_equal(first.get_many(["b"])[0][0], vector(2))
+    np.testing.assert_array_equal(second.get_many(["a"])[0][0], vector(1))
+
+    second.put_many(["a"], vector(3)[None])
+    second.compact()
+    np.testing.assert_array_equal(first.get_many(["a", "b", "c"])[0][:2], np.stack([vector(3), vector(2)]))
+
+
+def _writer(root, worker):
+    store = EmbeddingStore(root, "m")
+    for i in range(50):
+        store.put_many([f"{worker}-{i}"], vector(worker * 1000 + i)[None])
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs fcntl file locks")
+def test_concurrent_processes_keep_keys_and_rows_aligned(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_writer, args=(tmp_path, worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    store = EmbeddingStore(tmp_path, "m")
+    keys = [f"{worker}-{i}" for worker in range(4) for i in range(50)]
+    vectors, found = store.get_many(keys)
+    assert all(found)
+    np.testing.assert_array_equal(vectors, np.stack([vector(w * 1000 + i) for w in range(4) for i in range(50)]))
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import IncrementalJSONParser, parse_llm_json, strip_code_fences
+
+
+def test_strip_code_fences():
+    assert strip_code_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert strip_code_fences('  {"a": 1} ') == '{"a": 1}'
+
+
+def test_valid_json_is_parsed_unchanged():
+    assert parse_llm_json('{"a": [1, 2], "b": "x"}') == {"a": [1, 2], "b": "x"}
+
+
+def test_prose_fences_and_trailing_commas_are_repaired():
+    text = 'Here is the result:\n```json\n{"a": [1, 2,], "b": {"c": 3,},}\n```\nHope this helps.'
+    assert parse_llm_json(text) == {"a": [1, 2], "b": {"c": 3}}
+    assert parse_llm_json('Sure! {"a": 1} Let me know.') == {"a": 1}
+
+
+def test_truncated_document_keeps_only_complete_values():
+    assert parse_llm_json('{"a": 1, "b": [1, 2') == {"a": 1, "b": [1, 2]}
+    # A string cut mid-value is dropped rather than guessed at
+    assert parse_llm_json('{"a": 1, "b": "unfinis') == {"a": 1}
+    assert parse_llm_json('{"a": {"x": 1, "y": "cut') == {"a": {"x": 1}}
+
+
+def test_brackets_and_quotes_inside_strings_are_ignored():
+    assert parse_llm_json('{"a": "} ] , \\" {", "b": 2,}') == {"a": '} ] , " {', "b": 2}
+
+
+@pytest.mark.parametrize("text", [
+    "no json here",
+    "{",
+    '{"host_species": "Hum',
+    '{"host_species": {"status": "PRES',
+    '```json\n[{"a": ',
+])
+def test_unrecoverable_input_raises(text):
+    # Truncated before the first complete member: must not read as an empty result
+    with pytest.raises(json.JSONDecodeError):
+        parse_llm_json(text)
+
+
+def test_incremental_parser_close_raises_when_nothing_completed():
+    parser = IncrementalJSONParser()
+    parser.feed('{"host_species": "Hum')
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+
+
+def test_incremental_parser_emits_members_as_they_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('```json\n{"a": 1') == []
+    assert parser.feed(', "b": {"c": [1, ') == [("a", 1)]
+    assert parser.feed('2]}, "d": "x,}"') == [("b", {"c": [1, 2]})]
+    assert parser.feed("}\n```") == [("d", "x,}")]
+    assert parser.feed(', "e": 5}') == []
+    assert parser.fields == {"a": 1, "b": {"c": [1, 2]}, "d": "x,}"}
+    assert parser.close() == parser.fields
+
+
+def test_incremental_parser_matches_one_shot_parse_for_any_chunking():
+    document = json.dumps({"a": [1, {"b": "q\\"}], "c": None, "d": {"e": "x, y"}, "f": 2.5})
+    for size in (1, 2, 3, 7, len(document)):
+        parser = IncrementalJSONParser()
+        emitted = {}
+        for i in range(0, len(document), size):
+            emitted.update(parser.feed(document[i:i + size]))
+        assert emitted == json.loads(document)
+
+
+def test_incremental_parser_close_repairs_truncated_stream():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": 1, "b": [2, 3')
+    assert parser.fields == {"a": 1}
+    assert parser.close() == {"a": 1, "b": [2, 3]}
@@ -0,0 +1,63 @@
+import re
+
+from app.utils.keyword_index import KeywordIndex
+
+DOCUMENTS = [
+    "Gut microbiome of IBD patients: 16S rRNA sequencing of stool.",
+    "Oral and gut samples; the gut-brain axis in mice.",
+    "",
+    "No registered terms in this one.",
+]
+
+
+def make_index():
+    index = KeywordIndex()
+    index.register("sites", {"gut": ["gut", "stool"], "oral": ["oral", "saliva"]})
+    index.register("methods", {"sequencing": ["16s", "16s rrna", "sequencing"], "disease": ["ibd"]})
+    return index
+
+
+def expected_positions(index, text):
+    text = text.lower()
+    found = {
+        term: [m.start() for m in re.finditer(f"(?={re.escape(term)})", text)]
+        for term in index.terms
+    }
+    return {term: offsets for term, offsets in found.items() if offsets}
+
+
+def test_scan_finds_every_term_of_every_dictionary():
+    index = make_index()
+    for document in DOCUMENTS:
+        assert index.scan(document).positions == expected_positions(index, document)
+
+    hits = index.scan(DOCUMENTS[0])
+    assert "16s rrna" in hits and "16s" in hits
+    assert hits.found(["oral", "stool", "gut"]) == ["stool", "gut"]
+    assert hits.first(["saliva", "ibd", "gut"]) == "ibd"
+    assert hits.any(["saliva", "oral"]) is False
+
+
+def test_scan_batch_matches_single_scans():
+    index = make_index()
+    batch = index.scan_batch(DOCUMENTS + ["sep\x00gut"])
+    assert [hits.positions for hits in batch] == [
+        index.scan(document).positions for document in DOCUMENTS + ["sep gut"]
+    ]
+    assert index.scan_batch([]) == []
+
+
+def test_whole_words():
+    index = KeywordIndex()
+    index.register("t", {"t": ["gut"]})
+    hits = index.scan("Gut, gutter, the gut_x and gut")
+    assert hits.positions["gut"] == [0, 5, 17, 27]
+    assert hits.whole_words("gut") == [0, 27]
+
+
+def test_register_replaces_a_dictionary():
+    index = make_index()
+    assert "saliva" in index.terms
+    index.register("sites", {"skin": ["skin"]})
+    assert "saliva" not in index.terms
+    assert "skin" in index.scan("Skin swabs")
@@ -0,0 +1,73 @@
+import math
+import re
+
+import pandas as pd
+import pytest
+
+from app.utils.knowledge_index import KnowledgeIndex
+
+KNOWLEDGE_BASE = pd.DataFrame({
+    "title": [
+        "Gut microbiome in IBD",
+        "Oral microbiome of children",
+        "Soil bacteria diversity",
+        "Gut-brain axis: gut bacteria and mood",
+        None,
+    ],
+    "keywords": ["ibd, crohn, gut", "oral, saliva", "soil, environment", "gut, brain", "empty"],
+})
+
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def reference_scores(knowledge_base, query, k1=1.2, b=0.75):
+    """Textbook BM25 over the same keywords + title text."""
+    documents = [
+        tokenize(" ".join(str(row[c]) for c in ("keywords", "title") if pd.notna(row[c])))
+        for _, row in knowledge_base.iterrows()
+    ]
+    avg_length = sum(map(len, documents)) / len(documents)
+    scores = []
+    for document in documents:
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in d for d in documents)
+            tf = document.count(term)
+            if tf:
+                idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(document) / avg_length))
+        scores.append(score)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["gut bacteria", "microbiome", "IBD crohn", "saliva", "unknown words"])
+def test_search_matches_reference_bm25(query):
+    index = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    scores = reference_scores(KNOWLEDGE_BASE, query)
+    expected = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: (-scores[i], i))
+    assert index.search(query, k=10) == expected
+    assert index.search(query, k=2) == expected[:2]
+
+
+def test_search_edge_cases():
+    index = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    assert index.search("gut", k=0) == []
+    assert index.search("") == []
+    assert len(KnowledgeIndex.build(KNOWLEDGE_BASE.iloc[:0])) == 0
+
+
+def test_load_or_build_reuses_saved_index_until_the_knowledge_base_changes(tmp_path):
+    path = tmp_path / "index.npz"
+    built = KnowledgeIndex.load_or_build(KNOWLEDGE_BASE, path)
+    assert path.exists()
+
+    loaded = KnowledgeIndex.load(path)
+    assert loaded.fingerprint == built.fingerprint
+    assert loaded.search("gut bacteria") == built.search("gut bacteria")
+
+    changed = KNOWLEDGE_BASE.assign(title=KNOWLEDGE_BASE["title"].fillna("soil survey"))
+    rebuilt = KnowledgeIndex.load_or_build(changed, path)
+    assert rebuilt.fingerprint != built.fingerprint
+    assert 4 in rebuilt.search("soil")
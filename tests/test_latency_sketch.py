@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from app.utils.latency_sketch import LatencySketch, RollingSketch
+
+QUANTILES = (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 1.0)
+
+
+def exact_quantile(values, q):
+    """The value at rank q * (n - 1), the rank LatencySketch.quantile estimates."""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_quantiles_within_relative_error(accuracy):
+    rng = random.Random(0)
+    # Latencies spanning several orders of magnitude
+    values = [rng.lognormvariate(-3, 1.5) for _ in range(20000)]
+    sketch = LatencySketch(accuracy)
+    for value in values:
+        sketch.add(value)
+
+    for q in QUANTILES:
+        exact = exact_quantile(values, q)
+        assert sketch.quantile(q) == pytest.approx(exact, rel=accuracy)
+    assert sketch.count == len(values)
+    assert sketch.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_merge_equals_one_sketch_of_all_values():
+    rng = random.Random(1)
+    values = [rng.expovariate(10) for _ in range(5000)]
+    whole, first, second = LatencySketch(), LatencySketch(), LatencySketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+    assert first.buckets == whole.buckets
+    assert first.count == whole.count
+    for q in QUANTILES:
+        assert first.quantile(q) == whole.quantile(q)
+
+    with pytest.raises(ValueError):
+        first.merge(LatencySketch(0.05))
+
+
+def test_weights_and_zero_bucket():
+    sketch = LatencySketch()
+    sketch.add(0.0, weight=3)
+    sketch.add(1.0, weight=1)
+    assert sketch.count == 4
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(1.0, rel=0.01)
+    assert LatencySketch().quantile(0.5) is None
+
+
+def test_round_trip_through_dict():
+    sketch = LatencySketch()
+    for value in (0.01, 0.2, 3.0):
+        sketch.add(value)
+    restored = LatencySketch.from_dict(sketch.to_dict())
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_rolling_sketch_drops_slots_outside_the_window():
+    rolling = RollingSketch(window=60.0, slots=6)
+    for t in range(120):
+        rolling.add(1.0 if t < 60 else 2.0, timestamp=1000.0 + t)
+
+    snapshot = rolling.snapshot(now=1119.5)
+    assert snapshot.count == 60
+    assert snapshot.quantile(0.0) == pytest.approx(2.0, rel=0.01)
+
+    # A late record lands in a held slot, not a new one after the newest
+    rolling.add(5.0, timestamp=1065.0)
+    assert rolling.snapshot(now=1119.5).count == 61
+    assert rolling.snapshot(now=1200.0).count == 0
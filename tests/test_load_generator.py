@@ -0,0 +1,47 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import load_generator
+
+
+def count_arrivals(argv, arrival="constant"):
+    stages = load_generator.schedule(load_generator.parse_args(argv))
+    return sum(1 for _ in load_generator.arrival_times(stages, arrival, random.Random(0)))
+
+
+def test_flat_rate_holds_from_start():
+    assert count_arrivals(["--rate", "50", "--duration", "3s"]) == 150
+
+
+def test_ramp_up_then_flat():
+    # 1s ramp from 0 to 50/s delivers 25, then 2s at 50/s
+    assert count_arrivals(["--rate", "50", "--duration", "3s", "--ramp-up", "1s"]) == 125
+
+
+def test_poisson_flat_rate_is_close_to_requested():
+    assert count_arrivals(["--rate", "50", "--duration", "20s"], "poisson") == pytest.approx(1000, rel=0.1)
+
+
+def test_closed_loop_users_start_at_target():
+    stages = load_generator.schedule(load_generator.parse_args(["--users", "10"]))
+    assert load_generator.target_at(stages, 0.0) == 10
+    assert load_generator.target_at(stages, 30.0) == 10
+
+
+def test_stages_ramp_linearly():
+    stages = load_generator.parse_stages("10s:10,10s:20,10s:0")
+    assert load_generator.target_at(stages, 5.0) == pytest.approx(5.0)
+    assert load_generator.target_at(stages, 15.0) == pytest.approx(15.0)
+    assert load_generator.target_at(stages, 25.0) == pytest.approx(10.0)
+    assert load_generator.target_at(stages, 40.0) == 0.0
+
+
+def test_parse_duration_units():
+    assert load_generator.parse_duration("90") == 90
+    assert load_generator.parse_duration("1.5m") == 90
+    assert load_generator.parse_duration("1h") == 3600
@@ -0,0 +1,38 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import e2e_benchmark
+import log_compactor
+
+HOUR = 3600.0
+
+
+def write_log(path, durations, start):
+    with open(path, "w") as f:
+        for i, duration in enumerate(durations):
+            f.write(json.dumps({"ts": start + i, "event": "PMID_QUERY_END", "duration": duration}) + "\n")
+
+
+@pytest.mark.parametrize("percentile", [50, 90, 95, 99, 100])
+def test_latency_matches_nearest_rank_percentile(tmp_path, percentile):
+    buckets = {
+        0.0: [i / 10 for i in range(100)],
+        HOUR: [3.0, 1.0, 2.0],
+        2 * HOUR: [0.5] * 43 + [7.0],
+    }
+    for i, (start, durations) in enumerate(buckets.items()):
+        write_log(tmp_path / f"performance.log.{i + 1}", durations, start)
+
+    compactor = log_compactor.LogCompactor(tmp_path)
+    assert sum(compactor.compact().values()) == 147
+    rows = compactor.latency("PMID_QUERY_END", percentile)
+
+    assert [(bucket, n) for bucket, n, _, _ in rows] == [(start, len(d)) for start, d in buckets.items()]
+    for (_, _, value, mean), durations in zip(rows, buckets.values()):
+        assert value == e2e_benchmark.percentile(sorted(durations), percentile / 100)
+        assert mean == pytest.approx(sum(durations) / len(durations))
@@ -0,0 +1,111 @@
+import random
+import re
+
+import pytest
+
+from app.utils import pattern_matcher
+from app.utils.field_validator import EnhancedFieldValidator
+from app.utils.pattern_matcher import LiteralMatcher, PatternTableMatcher, first_chars, literal_from_pattern
+
+TEXTS = [
+    "Stool samples from 120 participants (n = 45 mice) were sequenced with 16S rRNA amplicon "
+    "sequencing on Illumina; E. coli and B. fragilis were more abundant in IBD patients.",
+    "Shotgun metagenomics of indoor air in the hospital restroom; several time points.",
+    "The rats' oral microbiome (saliva, tongue) vs. soil water surface samples, mixed environment.",
+    "",
+    "no matches here",
+]
+
+
+@pytest.fixture(params=["automaton", "regex"])
+def literal_backend(request, monkeypatch):
+    if request.param == "automaton":
+        if not pattern_matcher.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick is not installed")
+    else:
+        monkeypatch.setattr(pattern_matcher, "AHOCORASICK_AVAILABLE", False)
+    return request.param
+
+
+def expected_offsets(pattern, text):
+    """Every start offset at which re.search would find the pattern."""
+    return [m.start() for m in re.finditer(f"(?=(?:{pattern}))", text, re.IGNORECASE)]
+
+
+def test_literal_from_pattern():
+    assert literal_from_pattern(r"16s rrna") == "16s rrna"
+    assert literal_from_pattern(r"e\. coli") == "e. coli"
+    assert literal_from_pattern(r"patients?") is None
+    assert literal_from_pattern(r"n\s*=\s*\d+") is None
+    assert literal_from_pattern("") is None
+
+
+def test_field_table_matches_per_pattern_search(literal_backend):
+    table = EnhancedFieldValidator().field_patterns
+    matcher = PatternTableMatcher(table)
+    for text in TEXTS:
+        lowered = text.lower()
+        scan = matcher.scan(lowered)
+        for field_name, categories in table.items():
+            for category, patterns in categories.items():
+                expected = [p for p in patterns if re.search(p, lowered, re.IGNORECASE)]
+                assert scan.matched_patterns(field_name, category) == expected
+                assert scan.category_counts(field_name)[category] == len(expected)
+                for pattern, offsets in scan.category_hits(field_name)[category].items():
+                    assert offsets == expected_offsets(pattern, lowered)
+
+
+def test_overlapping_literals_and_regexes(literal_backend):
+    table = {"f": {"a": ["ab", "abc", "b", "bc", "c"], "b": [r"a\w", r"\wc", r"b+"]}}
+    matcher = PatternTableMatcher(table)
+    scan = matcher.scan("abcabbc")
+    for pattern in table["f"]["a"] + table["f"]["b"]:
+        assert scan.offsets.get(pattern, []) == expected_offsets(pattern, "abcabbc")
+
+
+def test_literal_matcher_on_random_text(literal_backend):
+    rng = random.Random(0)
+    literals = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 4))) for _ in range(12)]
+    matcher = LiteralMatcher(literals)
+    text = "".join(rng.choice("abc") for _ in range(300))
+    expected = {
+        literal: [m.start() for m in re.finditer(f"(?={re.escape(literal)})", text)]
+        for literal in set(literals)
+    }
+    assert matcher.positions(text) == {literal: offsets for literal, offsets in expected.items() if offsets}
+
+
+def test_empty_matcher(literal_backend):
+    assert LiteralMatcher([]).positions("anything") == {}
+    assert PatternTableMatcher({}).scan("anything").offsets == {}
+
+
+def test_first_chars():
+    chars, tests = first_chars(r"patients?")
+    assert chars == {"p"} and tests == []
+    chars, tests = first_chars(r"(?:\s*)n|x?y[a-c]")
+    assert chars == {"n", "x", "y"}
+    assert any(test(" ") for test in tests)
+    chars, tests = first_chars(r"\d+\s*samples?")
+    assert chars == set() and any(test("7") for test in tests) and not any(test("s") for test in tests)
+    assert first_chars(r"\bgut") == ({"g"}, [])
+    # Any character, or an empty match, may start these
+    for pattern in (r".*x", r"[^a]b", r"a?", r"(?=a)b", r"a|"):
+        assert first_chars(pattern) is None
+
+
+REGEX_PIECES = [r"a", r"b", r"ab?", r"[bc]a", r"\d+a?", r"(?:a|bc)+", r"\bb", r"c*a", r"[a-b]{2}",
+                r"[^a]c", r"\s*b", r"A", r"(?i:c)b", r".a", r"b|\d"]
+
+
+def test_regex_patterns_match_per_pattern_search_on_random_text(literal_backend):
+    rng = random.Random(1)
+    for _ in range(20):
+        patterns = rng.sample(REGEX_PIECES, 8) + ["ba", "a b"]
+        table = {"f": {"x": patterns[:5], "y": patterns[5:]}}
+        matcher = PatternTableMatcher(table)
+        # Lowercase, as scan() expects for case-insensitive tables
+        text = "".join(rng.choice("abc1 ") for _ in range(200))
+        scan = matcher.scan(text)
+        for pattern in dict.fromkeys(patterns):
+            assert scan.offsets.get(pattern, []) == expected_offsets(pattern, text), pattern
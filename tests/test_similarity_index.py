@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.services.similarity_index import SimilarityIndex
+
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def ivf_index(directory, vectors, num_lists=8):
+    index = SimilarityIndex(directory, backend="ivf", nprobe=2)
+    index.EXACT_SEARCH_THRESHOLD = 0  # always search through the IVF lists
+    index.add([str(i) for i in range(len(vectors))], vectors)
+    index.build(num_lists=num_lists)
+    return index
+
+
+def test_exact_search_ranks_by_cosine(tmp_path):
+    vectors = random_vectors(50)
+    index = SimilarityIndex(tmp_path, backend="ivf")
+    index.add([str(i) for i in range(50)], vectors)
+
+    results = index.search(vectors[7] * 3.0, k=5)
+    assert results[0][0] == "7"
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert "7" not in [key for key, _ in index.search(vectors[7], k=5, exclude="7")]
+
+
+def test_ivf_search_finds_the_query_vector(tmp_path):
+    vectors = random_vectors(400)
+    index = ivf_index(tmp_path, vectors)
+    for i in (0, 123, 399):
+        assert index.search(vectors[i], k=3)[0][0] == str(i)
+
+
+def test_ivf_search_probes_further_when_nearby_lists_are_empty(tmp_path):
+    vectors = random_vectors(200)
+    index = ivf_index(tmp_path, vectors)
+    query = random_vectors(1, seed=1)[0]
+    # Move every vector to the list farthest from the query, so the probed lists are empty
+    farthest = int(np.argmin(index._centroids @ query))
+    index._assignments = np.full(len(vectors), farthest, dtype=np.int32)
+    index._list_offsets = None
+
+    assert len(index.search(query, k=5)) == 5
+
+
+def test_added_vectors_survive_reload(tmp_path):
+    vectors = random_vectors(300)
+    index = ivf_index(tmp_path, vectors[:250])
+    index.add([str(i) for i in range(250, 300)], vectors[250:])
+    index.add(["0"], vectors[1:2])  # existing keys are skipped
+
+    reopened = SimilarityIndex(tmp_path, backend="ivf", nprobe=2)
+    reopened.EXACT_SEARCH_THRESHOLD = 0
+    assert len(reopened) == 300
+    assert len(reopened._assignments) == 300
+    np.testing.assert_allclose(reopened.vector("0"), vectors[0] / np.linalg.norm(vectors[0]), rtol=1e-6)
+    assert reopened.search(vectors[280], k=1)[0][0] == "280"
+
+
+def test_empty_index_returns_no_results(tmp_path):
+    assert SimilarityIndex(tmp_path, backend="ivf").search(random_vectors(1)[0]) == []